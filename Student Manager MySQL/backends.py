@@ -0,0 +1,174 @@
+"""Database engines the repository runs on, each with its own connections and SQL dialect."""
+import os
+import sqlite3
+import threading
+import time
+
+# Schema file of every backend, next to this module
+SCHEMA_FILES = {'mysql': "schema.sql", 'sqlite': "schema_sqlite.sql"}
+
+
+def loadConfig():
+    # Connection settings, each one can be overridden with an environment variable
+    return {
+        'host': os.environ.get('STUDENT_DB_HOST', 'localhost'),
+        'port': int(os.environ.get('STUDENT_DB_PORT', '3306')),
+        'database': os.environ.get('STUDENT_DB_NAME', 'database'),
+        'user': os.environ.get('STUDENT_DB_USER', 'root'),
+        'password': os.environ.get('STUDENT_DB_PASSWORD', 'password'),
+        'pool_name': 'student_manager',
+        'pool_size': int(os.environ.get('STUDENT_DB_POOL_SIZE', '5')),
+    }
+
+
+def createBackend():
+    # STUDENT_DB_BACKEND=sqlite runs on a local file instead of a MySQL server
+    if os.environ.get('STUDENT_DB_BACKEND', 'mysql') == 'sqlite':
+        return SQLiteBackend(os.environ.get('STUDENT_DB_PATH', 'students.db'))
+    return MySQLBackend(loadConfig())
+
+
+def readSchema(name):
+    # Statements of a schema file, whole-line comments dropped. A statement ends with the first line ending
+    # in ';', or for a trigger body opened by BEGIN with its END line
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), SCHEMA_FILES[name])
+    statements, lines, body = [], [], False
+    with open(path) as file:
+        for line in file.read().splitlines():
+            stripped = line.strip()
+            if not stripped or stripped.startswith('--'):
+                continue
+            lines.append(line)
+            body = body or stripped.upper().endswith('BEGIN')
+            if stripped.endswith(';') and (not body or stripped.upper().startswith('END')):
+                statements.append('\n'.join(lines).strip()[:-1])
+                lines, body = [], False
+    if lines:
+        statements.append('\n'.join(lines).strip())
+    return statements
+
+
+class MySQLBackend:
+    """MySQL server reached through a mysql-connector connection pool"""
+    name = 'mysql'
+    # The server owns the schema, the app does not create it on start
+    embedded = False
+    # Rows per executemany so one multi-row INSERT stays under max_allowed_packet
+    insert_batch_size = 1000
+    # Server clock expression written to updated_at
+    now = "CURRENT_TIMESTAMP(6)"
+    # Appended to the SELECT a save checks versions with, InnoDB locks just the rows it reads
+    lock = " FOR UPDATE"
+
+    def __init__(self, config, pool_timeout=10.0):
+        # mysql-connector is only needed when this backend is used
+        from mysql.connector import Error, pooling
+        from mysql.connector.errors import PoolError
+        self.Error = Error
+        self.pooling = pooling
+        self.PoolError = PoolError
+        self.config = config
+        self.pool_timeout = pool_timeout
+        self.pool = None
+        self.pool_lock = threading.Lock()
+
+    def identity(self):
+        return f"mysql://{self.config.get('user')}@{self.config.get('host')}:{self.config.get('port')}/" \
+               f"{self.config.get('database')}"
+
+    def getPool(self):
+        # Create the pool on first use so the app can start without a server
+        with self.pool_lock:
+            if self.pool is None:
+                self.pool = self.pooling.MySQLConnectionPool(**self.config)
+            return self.pool
+
+    def connect(self):
+        # Borrow a pooled connection, waiting for one to be returned if all are in use
+        start = time.perf_counter()
+        pool = self.getPool()
+        while True:
+            try:
+                return pool.get_connection()
+            except self.PoolError:
+                if time.perf_counter() - start > self.pool_timeout:
+                    raise
+                time.sleep(0.01)
+
+    def release(self, connection):
+        connection.close()
+
+    def cursor(self, connection, prepared=False, streaming=False):
+        # Streaming cursors are unbuffered so rows arrive as they are fetched
+        if streaming:
+            return connection.cursor(buffered=False)
+        return connection.cursor(prepared=prepared)
+
+    def finishStream(self, connection):
+        # Drain rows left behind by a cancelled stream before the connection is reused
+        connection.consume_results()
+
+    def sql(self, statement):
+        return statement
+
+    def beginWrite(self, cursor):
+        # The connector opens a transaction with the first statement, the locking reads do the rest
+        pass
+
+    def schema(self):
+        return readSchema(self.name)
+
+
+class SQLiteBackend:
+    """Embedded SQLite file in WAL mode, one connection per thread"""
+    name = 'sqlite'
+    # Embedded databases are created on first start
+    embedded = True
+    # No packet limit, one executemany loads every row through a single prepared statement
+    insert_batch_size = None
+    now = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+    # No row locks, beginWrite takes the database's single write lock instead
+    lock = ""
+    Error = sqlite3.Error
+
+    def __init__(self, path, timeout=10.0):
+        self.path = path
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def identity(self):
+        return f"sqlite://{os.path.abspath(self.path)}"
+
+    def connect(self):
+        # sqlite3 connections belong to the thread that opened them, so each pool thread keeps its own
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout)
+            # WAL lets the save write while page and lookup queries keep reading
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            self.local.connection = connection
+        return connection
+
+    def release(self, connection):
+        # The connection stays open for the thread, anything left uncommitted is dropped
+        if connection.in_transaction:
+            connection.rollback()
+
+    def cursor(self, connection, prepared=False, streaming=False):
+        # sqlite3 caches prepared statements and always steps through rows lazily
+        return connection.cursor()
+
+    def finishStream(self, connection):
+        pass
+
+    def sql(self, statement):
+        return statement.replace('%s', '?')
+
+    def beginWrite(self, cursor):
+        # Versions read after BEGIN IMMEDIATE cannot change before the commit, readers carry on under WAL
+        cursor.execute("BEGIN IMMEDIATE")
+
+    def schema(self):
+        return readSchema(self.name)
@@ -0,0 +1,409 @@
+"""Headless benchmarks of the load, browse, render, edit and save paths.
+
+For example:
+
+    python benchmark.py --rows 1000 10000 100000 --output benchmark.json
+    python benchmark.py --rows 100000 --compare benchmark.json
+
+The memory backend keeps both tables in process and the sqlite backend loads them
+into a temporary database file, so neither needs a server. The mysql
+backend replaces the students and courses tables of the database configured by the
+STUDENT_DB_* variables, so point those at a scratch database. The windows journal and
+snapshot into the same temporary folder as the sqlite database, it is removed once the run ends.
+Results are written relative to the folder the benchmark is run from.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+# Windows are created without a display
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+import pandas as pd
+from PyQt5.QtCore import QThreadPool
+from PyQt5.QtWidgets import QApplication, QMessageBox
+
+from backends import SQLiteBackend
+from repository import Repository, SaveResult, REFERENCES, STUDENT_COLUMNS, COURSE_COLUMNS, STUDENT_DTYPES, \
+    ENROLLMENT_COLUMNS, FETCH_CHUNK_SIZE, PAGE_SIZE, VERSION_COLUMN, chunkFrame
+
+FIRST_NAMES = ["Ana", "Ben", "Carla", "Dan", "Ella", "Felix", "Gina", "Hugo", "Ivy", "Jon", "Kim", "Luis"]
+LAST_NAMES = ["Santos", "Reyes", "Cruz", "Garcia", "Lopez", "Torres", "Flores", "Ramos", "Mendoza", "Rivera"]
+
+
+def syntheticCourses(count):
+    # "No Course" is always there since students without a course point at it
+    codes = [f"C{number:04d}" for number in range(count)]
+    return pd.DataFrame({'course_code': ["No Course"] + codes,
+                         'course_description': ["Not enrolled"] + [f"Course {code}" for code in codes]},
+                        columns=COURSE_COLUMNS)
+
+
+def syntheticStudents(count, course_codes, seed=0):
+    rng = np.random.default_rng(seed)
+    first = np.array(FIRST_NAMES, dtype=object)[rng.integers(0, len(FIRST_NAMES), count)]
+    last = np.array(LAST_NAMES, dtype=object)[rng.integers(0, len(LAST_NAMES), count)]
+    course = np.array(course_codes, dtype=object)[rng.integers(0, len(course_codes), count)]
+    return pd.DataFrame({
+        'name': first + " " + last,
+        'id_number': [f"S{number:07d}" for number in range(count)],
+        'course': course,
+        'year': rng.integers(1, 5, count),
+        'sex': np.where(rng.integers(0, 2, count) == 1, "Male", "Female").astype(object),
+        'status': np.where(course == "No Course", "No", "Yes").astype(object),
+    }, columns=STUDENT_COLUMNS)
+
+
+class MemoryRepository(Repository):
+    """In-process stand-in for the MySQL repository with the same read and write methods"""
+
+    TABLES = {'students': ("id_number", STUDENT_COLUMNS, STUDENT_DTYPES),
+              'courses': ("course_code", COURSE_COLUMNS, {})}
+
+    def __init__(self, students, courses):
+        # No database backend, every read and write below is served from memory
+        self.backend = None
+        self.metrics = {}
+        # Table name -> key -> row tuple in column order
+        self.tables = {}
+        self.frames = {}
+        self.orders = {}
+        for table_name, dataframe in (("students", students), ("courses", courses)):
+            key, columns, dtypes = self.TABLES[table_name]
+            self.tables[table_name] = dict(zip(dataframe[key], dataframe[columns].itertuples(index=False, name=None)))
+
+    def frame(self, table_name):
+        # Typed dataframe of a table, rebuilt after every write
+        if table_name not in self.frames:
+            key, columns, dtypes = self.TABLES[table_name]
+            rows = list(self.tables[table_name].values())
+            frame = chunkFrame(rows, columns, dtypes) if rows else pd.DataFrame(columns=columns)
+            # Only one client writes here, so every row stays at its first version
+            self.frames[table_name] = frame.assign(**{VERSION_COLUMN: 1})
+        return self.frames[table_name]
+
+    def changed(self):
+        self.frames.clear()
+        self.orders.clear()
+
+    def ensureSchema(self):
+        pass
+
+    def serverTime(self, overlap=0.0):
+        return (pd.Timestamp.now() - pd.Timedelta(seconds=overlap)).strftime('%Y-%m-%d %H:%M:%S.%f')
+
+    def fetchEnrollmentCounts(self, progress=None, cancelled=None):
+        return self.frame("students").groupby(ENROLLMENT_COLUMNS).size().reset_index(name='count')
+
+    def latestChange(self):
+        return 0
+
+    def fetchChanges(self, after, missing=(), limit=0):
+        # Nobody else writes to memory, the change feed has nothing to read
+        return []
+
+    def pruneChanges(self, retention):
+        pass
+
+    def fetchTable(self, table_name, columns):
+        return self.frame(table_name)[columns].copy()
+
+    def streamTable(self, table_name, columns, dtypes, chunk_size=FETCH_CHUNK_SIZE):
+        frame = self.frame(table_name)[columns]
+        for start in range(0, len(frame), chunk_size):
+            yield frame.iloc[start:start + chunk_size].reset_index(drop=True)
+
+    def fetchStudentPage(self, query, after=None, limit=PAGE_SIZE):
+        # Same rows the SQL returns, sorted orders are kept until the next write
+        order = (query.sort_column, query.descending)
+        if order not in self.orders:
+            columns = list(dict.fromkeys([query.sort_column, 'id_number']))
+            self.orders[order] = self.frame("students").sort_values(columns, ascending=not query.descending,
+                                                                    ignore_index=True)
+        frame = self.orders[order]
+        mask = np.ones(len(frame), dtype=bool)
+        if query.name_prefix:
+            mask &= frame['name'].str.startswith(query.name_prefix).to_numpy()
+        for column, value in query.filters.items():
+            mask &= (frame[column] == value).to_numpy()
+        if after is not None:
+            sort_value, key = after
+            column = frame[query.sort_column]
+            if query.descending:
+                past = (column < sort_value) | ((column == sort_value) & (frame['id_number'] < key))
+            else:
+                past = (column > sort_value) | ((column == sort_value) & (frame['id_number'] > key))
+            mask &= past.to_numpy()
+        return frame[mask].head(limit).reset_index(drop=True)
+
+    def fetchRows(self, table_name, key, columns, dtypes, keys):
+        frame = self.frame(table_name)
+        return frame.loc[frame[key].isin(list(keys)), columns].reset_index(drop=True)
+
+    def insertRows(self, table_name, dataframe):
+        key, columns, dtypes = self.TABLES[table_name]
+        self.tables[table_name].update(zip(dataframe[key], dataframe[columns].itertuples(index=False, name=None)))
+        self.changed()
+
+    def saveChanges(self, changes, progress=None, cancelled=None):
+        # Same order as the SQL save: parent upserts, child cascades, then deletes children first
+        for table in changes:
+            key, columns, dtypes = self.TABLES[table.table_name]
+            rows = table.upsert_rows
+            if len(rows):
+                self.tables[table.table_name].update(zip(rows[key], rows[columns].itertuples(index=False, name=None)))
+        for table in changes:
+            if table.table_name not in REFERENCES:
+                continue
+            child_table, column, cleared = REFERENCES[table.table_name]
+            key, columns, dtypes = self.TABLES[child_table]
+            position = columns.index(column)
+            renamed = {old_key: new_key for new_key, old_key in table.renamed.items()}
+            deleted = set(table.deleted_keys) - set(renamed)
+            children = self.tables[child_table]
+            for child_key, row in list(children.items()):
+                if row[position] in renamed:
+                    children[child_key] = row[:position] + (renamed[row[position]],) + row[position + 1:]
+                elif row[position] in deleted:
+                    values = list(row)
+                    for name, value in cleared.items():
+                        values[columns.index(name)] = value
+                    children[child_key] = tuple(values)
+        for table in reversed(changes):
+            for deleted_key in table.deleted_keys:
+                self.tables[table.table_name].pop(deleted_key, None)
+        self.changed()
+        return SaveResult()
+
+
+def memoryBackend(students, courses, folder):
+    return MemoryRepository(students, courses)
+
+
+def mysqlBackend(students, courses, folder):
+    # Replace both tables of the configured database with the synthetic rows, nothing goes in the folder
+    repository = Repository()
+    with repository.transaction("benchmark reset") as cursor:
+        cursor.execute("DELETE FROM students")
+        cursor.execute("DELETE FROM courses")
+    repository.insertRows("courses", courses)
+    repository.insertRows("students", students)
+    return repository
+
+
+def sqliteBackend(students, courses, folder):
+    # Fresh database file in the run's temporary folder, the schema already holds "No Course"
+    path = os.path.join(tempfile.mkdtemp(prefix="sqlite-", dir=folder), "students.db")
+    repository = Repository(SQLiteBackend(path))
+    repository.bootstrap()
+    repository.insertRows("courses", courses[courses['course_code'] != "No Course"])
+    repository.insertRows("students", students)
+    return repository
+
+
+BACKENDS = {'memory': memoryBackend, 'mysql': mysqlBackend, 'sqlite': sqliteBackend}
+
+
+class Benchmark:
+    """Run every benchmark for one table size and collect the timings"""
+
+    def __init__(self, app, backend, rows, operations, pages, frames, folder):
+        self.app = app
+        self.backend = backend
+        # Temporary folder of the run for database files
+        self.folder = folder
+        self.rows = rows
+        self.operations = operations
+        self.pages = pages
+        self.frames = frames
+        self.results = []
+
+    def settle(self):
+        # Wait for background tasks and deliver the signals they queued, a slot may start another task
+        pool = QThreadPool.globalInstance()
+        while True:
+            pool.waitForDone()
+            self.app.processEvents()
+            if pool.activeThreadCount() == 0:
+                return
+
+    def record(self, name, seconds, operations):
+        result = {'benchmark': name, 'rows': self.rows, 'seconds': seconds, 'operations': operations,
+                  'per_second': operations / seconds if seconds else 0.0}
+        self.results.append(result)
+        print(f"{self.rows:>8} rows  {name:<16} {seconds:9.4f} s  {result['per_second']:12.0f} ops/s")
+
+    def timed(self, name, operations, function, *args):
+        start = time.perf_counter()
+        result = function(*args)
+        self.record(name, time.perf_counter() - start, operations)
+        return result
+
+    def run(self):
+        # Imported here, importing main compiles every window form
+        import main
+
+        start = time.perf_counter()
+        courses = syntheticCourses(max(self.rows // 1000, 10))
+        students = syntheticStudents(self.rows, courses['course_code'].tolist())
+        self.record("generate", time.perf_counter() - start, self.rows)
+        repository = self.timed("backend_load", self.rows, BACKENDS[self.backend], students, courses,
+                                self.folder)
+
+        self.timed("fetch_students", self.rows, repository.fetchStudents)
+        window = self.timed("startup", 1, self.startWindow, main, repository)
+        loaded = len(window.students)
+        pages = self.timed("scroll_pages", self.pages, self.scroll, window)
+        self.results[-1]['operations'] = pages
+        self.results[-1]['rows_loaded'] = len(window.students) - loaded
+        self.results[-1]['store_bytes'] = window.students.nbytes()
+        self.timed("render", self.frames, self.render, window)
+
+        rng = np.random.default_rng(1)
+        picked = rng.choice(self.rows, min(self.operations * 2, self.rows), replace=False)
+        ids = students['id_number'].to_numpy()[picked]
+        edited, deleted = ids[:len(ids) // 2], ids[len(ids) // 2:]
+        self.timed("add", self.operations, self.add, window)
+        self.timed("edit", len(edited), self.edit, window, edited)
+        self.timed("delete", len(deleted), self.delete, window, deleted)
+        changed = self.operations + len(edited) + len(deleted)
+        self.timed("save", changed, self.save, window)
+
+        stats = repository.stats()
+        window.close()
+        self.app.processEvents()
+        return self.results, stats
+
+    def startWindow(self, main, repository):
+        # Until the courses and the first page of students are in
+        window = main.mainWindow(repository)
+        self.settle()
+        return window
+
+    def scroll(self, window):
+        pages = 0
+        while pages < self.pages and window.model.canFetchMore():
+            window.model.fetchMore()
+            self.settle()
+            pages += 1
+        return pages
+
+    def render(self, window):
+        # Paint the visible rows at evenly spread scroll positions
+        scroll_bar = window.textOutput.verticalScrollBar()
+        for frame in range(self.frames):
+            scroll_bar.setValue(scroll_bar.maximum() * frame // max(self.frames - 1, 1))
+            window.textOutput.viewport().grab()
+
+    def add(self, window):
+        for number in range(self.operations):
+            window.addClicked()
+            add_window = window.addWindow
+            add_window.nameInput.setText(f"Added {number}")
+            add_window.idNumberInput.setText(f"N{number:07d}")
+            add_window.courseInput.setCurrentIndex(number % add_window.courseInput.count())
+            # Students that are not loaded are looked up in the background before the change is made
+            add_window.submitClicked()
+            self.settle()
+
+    def edit(self, window, ids):
+        for id_number in ids:
+            window.editClicked()
+            edit_window = window.editWindow
+            edit_window.editInput.setText(id_number)
+            edit_window.submitClicked()
+            self.settle()
+            edit_window.nameInput.setText(f"Edited {id_number}")
+            edit_window.editSubmitClicked()
+            self.settle()
+
+    def delete(self, window, ids):
+        for id_number in ids:
+            window.deleteClicked()
+            window.deleteWindow.deleteInput.setText(id_number)
+            window.deleteWindow.submitClicked()
+            self.settle()
+
+    def save(self, window):
+        window.saveDataframe()
+        self.settle()
+
+
+def compareResults(results, previous, tolerance):
+    # Benchmarks that got slower than the previous run by more than the tolerance
+    before = {(result['benchmark'], result['rows']): result['seconds'] for result in previous['results']}
+    regressions = []
+    for result in results:
+        seconds = before.get((result['benchmark'], result['rows']))
+        if seconds and result['seconds'] > seconds * (1 + tolerance):
+            regressions.append(f"{result['benchmark']} at {result['rows']} rows: "
+                               f"{seconds:.4f} s -> {result['seconds']:.4f} s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless Student Manager benchmarks")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="memory")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="table sizes to run, up to 1000000")
+    parser.add_argument("--operations", type=int, default=100, help="adds, edits and deletes per size")
+    parser.add_argument("--pages", type=int, default=20, help="pages scrolled in after startup")
+    parser.add_argument("--frames", type=int, default=20, help="viewport repaints timed")
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--compare", help="previous JSON output to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before it is a regression")
+    args = parser.parse_args()
+
+    # Paths given are relative to where the benchmark was run, the forms are found relative to this folder
+    output = os.path.abspath(args.output)
+    compare = os.path.abspath(args.compare) if args.compare else None
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    app = QApplication(sys.argv)
+    # Confirmation dialogs would block a headless run
+    QMessageBox.question = staticmethod(lambda *args, **kwargs: QMessageBox.Yes)
+
+    # Read before running so the output may overwrite the file it is compared with
+    previous = None
+    if compare:
+        with open(compare) as file:
+            previous = json.load(file)
+
+    results = []
+    stats = {}
+    with tempfile.TemporaryDirectory() as scratch:
+        # Read by the journal and the snapshot cache each time a window opens
+        os.environ["STUDENT_JOURNAL_DIR"] = os.path.join(scratch, "journal")
+        os.environ["STUDENT_CACHE_DIR"] = os.path.join(scratch, "cache")
+        for rows in args.rows:
+            size_results, size_stats = Benchmark(app, args.backend, rows, args.operations, args.pages,
+                                                 args.frames, scratch).run()
+            results.extend(size_results)
+            stats[str(rows)] = size_stats
+
+    report = {
+        'started': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'backend': args.backend,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+        'database_calls': stats,
+    }
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {output}")
+
+    if previous is not None:
+        regressions = compareResults(results, previous, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Polling of the changelog table so open windows pick up the rows other clients write."""
+import time
+
+from PyQt5.QtCore import QTimer
+
+from communicate import Communicate
+from repository import STUDENT_FETCH_COLUMNS, STUDENT_FETCH_DTYPES, COURSE_FETCH_COLUMNS, CHANGE_BATCH_SIZE
+from workers import DatabaseTask
+
+# Milliseconds between two polls of the changelog
+POLL_INTERVAL_MS = 2000
+# Seconds a skipped sequence number is asked for again, the transaction holding it may commit late
+GAP_TIMEOUT = 60.0
+# Skipped numbers remembered at most, a bigger jump is an auto-increment gap rather than a pending commit
+MAX_GAPS = 1000
+# Changelog rows older than this many seconds are pruned every PRUNE_EVERY polls
+CHANGELOG_RETENTION = 86400.0
+PRUNE_EVERY = 300
+
+
+class ChangeFeed:
+    """Patch the loaded rows that changed in the database, read from the changelog every few seconds"""
+
+    def __init__(self, repository, students, courses, pager, interval=POLL_INTERVAL_MS):
+        self.repository = repository
+        self.students = students
+        self.courses = courses
+        # The pager knows which part of the listing is loaded, only new rows inside it are added
+        self.pager = pager
+        # Sequence number of the newest changelog row read, and skipped number -> when it was first missed
+        self.seq = None
+        self.gaps = {}
+        self.polls = 0
+        self.failing = False
+        # Poll in flight, kept until it reports back since the thread pool does not own it
+        self.task = None
+        # Signals taskFinished with the number of rows patched and taskFailed with the error
+        self.communicate = Communicate()
+        self.timer = QTimer()
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.poll)
+
+    def start(self, seq):
+        # Follow the changelog from seq on, it is read before the rows it covers so nothing is missed
+        self.seq = seq
+        self.gaps = {}
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    def poll(self):
+        if self.task is not None or self.seq is None:
+            return
+        self.polls += 1
+        until = None if self.pager.exhausted else self.pager.after
+        task = DatabaseTask(self.readChanges, Communicate(), self.seq, sorted(self.gaps),
+                            self.pager.databaseQuery(), until, self.polls % PRUNE_EVERY == 0)
+        task.communicate.taskFinished.connect(lambda result: self.changesSlot(task, result))
+        task.communicate.taskFailed.connect(lambda error: self.changesFailedSlot(task, error))
+        self.task = task.start()
+
+    def readChanges(self, seq, missing, query, until, prune, progress, cancelled):
+        # Runs on the thread pool, reads the changelog past seq and the rows it names as they are now
+        if prune:
+            self.repository.pruneChanges(CHANGELOG_RETENTION)
+        entries = self.repository.fetchChanges(seq, missing)
+        keys = {'students': set(), 'courses': set()}
+        for entry_seq, table_name, key in entries:
+            keys.setdefault(table_name, set()).add(key)
+        students = list(keys['students'])
+        return {
+            'entries': entries,
+            'student_keys': keys['students'],
+            'students': self.repository.fetchRows("students", "id_number", STUDENT_FETCH_COLUMNS,
+                                                  STUDENT_FETCH_DTYPES, students),
+            # Students not loaded yet are only added where the loaded part of the listing has them
+            'listed': self.repository.fetchListingKeys(query, until, students) if students else set(),
+            'course_keys': keys['courses'],
+            'courses': self.repository.fetchRows("courses", "course_code", COURSE_FETCH_COLUMNS, {}, keys['courses']),
+        }
+
+    def changesSlot(self, task, result):
+        if task is not self.task:
+            return
+        self.task = None
+        self.failing = False
+        self.advance([entry[0] for entry in result['entries']])
+
+        # Courses first so patched students never point at a course the window does not know yet
+        courses = result['courses']
+        self.courses.merge(courses, result['course_keys'] - set(courses['course_code']))
+        students = self.pager.applyCourseChanges(result['students'])
+        keep = [self.students.isLoaded(key) or key in result['listed'] for key in students['id_number']]
+        removed = {key for key in result['student_keys'] if self.students.isLoaded(key)} \
+            - set(students['id_number'])
+        self.students.merge(students[keep], removed)
+
+        if len(result['entries']) == CHANGE_BATCH_SIZE:
+            # More rows are waiting, read them without waiting for the timer
+            QTimer.singleShot(0, self.poll)
+        if result['entries']:
+            self.communicate.taskFinished.emit(len(result['student_keys']) + len(result['course_keys']))
+
+    def changesFailedSlot(self, task, error):
+        if task is not self.task:
+            return
+        self.task = None
+        # Polling carries on, a server that stays down is only reported once
+        if not self.failing:
+            self.failing = True
+            self.communicate.taskFailed.emit(error)
+
+    def advance(self, seqs):
+        # Move past the numbers read, the ones skipped on the way are asked for again until GAP_TIMEOUT
+        now = time.monotonic()
+        for seq in seqs:
+            self.gaps.pop(seq, None)
+        latest = max(seqs, default=self.seq)
+        if latest > self.seq:
+            skipped = set(range(self.seq + 1, latest)) - set(seqs) if latest - self.seq <= MAX_GAPS else ()
+            for seq in skipped:
+                self.gaps.setdefault(seq, now)
+            self.seq = latest
+        recent = [seq for seq, missed in self.gaps.items() if now - missed < GAP_TIMEOUT]
+        self.gaps = {seq: self.gaps[seq] for seq in sorted(recent)[-MAX_GAPS:]}
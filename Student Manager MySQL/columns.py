@@ -0,0 +1,176 @@
+"""Column storage for the stores: Python objects, small integers, or codes into the distinct values."""
+import sys
+from array import array
+
+import numpy as np
+import pandas as pd
+
+# Code widths tried in order as a coded column sees more distinct values
+CODE_TYPES = ('b', 'h', 'i')
+# Code of a missing value, what pandas uses for NaN in a categorical
+MISSING = -1
+
+
+class ObjectColumn(list):
+    """Column of Python objects, one reference per row"""
+
+    def extend(self, values):
+        super(ObjectColumn, self).extend(pd.Series(values, dtype=object).tolist())
+
+    def assign(self, positions, value):
+        for position in positions:
+            self[position] = value
+
+    def take(self, positions):
+        return ObjectColumn(self[position] for position in positions)
+
+    def array(self, positions):
+        return np.array(self, dtype=object)[positions]
+
+    def matches(self, value):
+        return np.fromiter((found == value for found in self), dtype=bool, count=len(self))
+
+    def nbytes(self):
+        # The list itself and every distinct object it points at
+        distinct = {id(value): value for value in self}
+        return sys.getsizeof(self) + sum(sys.getsizeof(value) for value in distinct.values())
+
+
+class IntColumn:
+    """Column of integers packed into a fixed width array"""
+
+    def __init__(self, dtype, values=()):
+        self.dtype = np.dtype(dtype)
+        self.data = array(self.dtype.char, values)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __getitem__(self, position):
+        return self.data[position]
+
+    def __setitem__(self, position, value):
+        # Every path stores the same type, "2" from a combo box becomes 2
+        self.data[position] = int(value)
+
+    def append(self, value):
+        self.data.append(int(value))
+
+    def extend(self, values):
+        series = pd.Series(values)
+        if series.dtype != object:
+            self.data.frombytes(series.to_numpy().astype(self.dtype).tobytes())
+        else:
+            self.data.extend(int(value) for value in series)
+
+    def assign(self, positions, value):
+        # One numpy write for every row, through a view of the array's buffer
+        self.numbers()[positions] = int(value)
+
+    def take(self, positions):
+        column = IntColumn(self.dtype)
+        column.data.frombytes(self.numbers()[positions].tobytes())
+        return column
+
+    def numbers(self):
+        return np.frombuffer(self.data, dtype=self.dtype) if len(self.data) else np.empty(0, self.dtype)
+
+    def array(self, positions):
+        return self.numbers()[positions]
+
+    def matches(self, value):
+        return self.numbers() == int(value)
+
+    def nbytes(self):
+        return self.data.itemsize * len(self.data)
+
+
+class CodedColumn:
+    """Column of repeated values kept once each, every row holds the code of its value"""
+
+    def __init__(self, categories=()):
+        self.categories = []
+        self.codes_of = {}
+        self.codes = array(CODE_TYPES[0])
+        for category in categories:
+            self.code(category)
+
+    def code(self, value):
+        # Code of a value, new values get the next code and widen the codes when they run out
+        if value is None:
+            return MISSING
+        code = self.codes_of.get(value)
+        if code is None:
+            code = len(self.categories)
+            if code > np.iinfo(self.codes.typecode).max:
+                self.codes = array(CODE_TYPES[CODE_TYPES.index(self.codes.typecode) + 1], self.codes)
+            self.categories.append(value)
+            self.codes_of[value] = code
+        return code
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __iter__(self):
+        return (self.decode(code) for code in self.codes)
+
+    def decode(self, code):
+        return None if code == MISSING else self.categories[code]
+
+    def __getitem__(self, position):
+        return self.decode(self.codes[position])
+
+    def __setitem__(self, position, value):
+        # The code is made first, it may widen the codes array
+        code = self.code(value)
+        self.codes[position] = code
+
+    def append(self, value):
+        code = self.code(value)
+        self.codes.append(code)
+
+    def extend(self, values):
+        # Factorized by pandas, only the distinct values are looked up one by one
+        found, distinct = pd.factorize(pd.Series(values, dtype=object))
+        codes = np.array([self.code(value) for value in distinct] + [MISSING], dtype=np.int64)
+        self.codes.frombytes(codes[found].astype(self.codes.typecode).tobytes())
+
+    def assign(self, positions, value):
+        # The code is made before the view is taken, a new value may widen the codes array
+        code = self.code(value)
+        self.numbers()[positions] = code
+
+    def take(self, positions):
+        column = CodedColumn()
+        column.categories = self.categories
+        column.codes_of = self.codes_of
+        column.codes = array(self.codes.typecode, self.numbers()[positions].tobytes())
+        return column
+
+    def numbers(self):
+        dtype = np.dtype(self.codes.typecode)
+        return np.frombuffer(self.codes, dtype=dtype) if len(self.codes) else np.empty(0, dtype)
+
+    def array(self, positions):
+        return pd.Categorical.from_codes(self.numbers()[positions], categories=list(self.categories))
+
+    def matches(self, value):
+        code = self.codes_of.get(value, MISSING if value is None else len(self.categories))
+        return self.numbers() == code
+
+    def nbytes(self):
+        return self.codes.itemsize * len(self.codes) + sum(sys.getsizeof(value) for value in self.categories)
+
+
+def createColumn(dtype=None):
+    # Storage for a pandas dtype: "category" or a CategoricalDtype are coded, integer dtypes packed
+    if dtype is None:
+        return ObjectColumn()
+    if isinstance(dtype, pd.CategoricalDtype):
+        return CodedColumn(dtype.categories)
+    if dtype == 'category':
+        return CodedColumn()
+    return IntColumn(dtype)
@@ -0,0 +1,22 @@
+"""Signals shared by the windows, the stores and the background tasks."""
+from PyQt5.QtCore import pyqtSignal, QObject
+
+
+class Communicate(QObject):
+    """Communicate with signal to update dataframe"""
+    deletedCourse = pyqtSignal(str)
+    taskFinished = pyqtSignal(object)
+    taskFailed = pyqtSignal(str)
+    taskCancelled = pyqtSignal()
+    taskProgress = pyqtSignal(int, int)
+    taskPartial = pyqtSignal(object)
+    rowsAppended = pyqtSignal(int, int)
+    rowUpdated = pyqtSignal(int)
+    rowRemoved = pyqtSignal(int)
+    rowsUpdated = pyqtSignal(object)
+    rowsRemoved = pyqtSignal(object)
+    storeCompacted = pyqtSignal()
+    storeReset = pyqtSignal()
+    storeSaved = pyqtSignal()
+    statsChanged = pyqtSignal()
+    historyChanged = pyqtSignal()
@@ -0,0 +1,77 @@
+"""Unique keys, required values and course references, checked in memory before a change reaches the database."""
+from repository import REFERENCES, REQUIRED_COLUMNS
+
+# Names the error messages give the columns
+COLUMN_LABELS = {'name': "Name", 'id_number': "ID Number", 'course': "Course", 'course_code': "Course Code"}
+
+
+def parentOf(table_name):
+    # (parent table, referencing column) of a child table, None for a table without a parent
+    for parent_table, (child_table, column, values) in REFERENCES.items():
+        if child_table == table_name:
+            return parent_table, column
+    return None
+
+
+def frameChecks(table_name, key, frame, existing_keys, parent_keys=None):
+    # (failed rows, reason) of the table rules for rows added in bulk, every rule checked for the whole frame at
+    # once against sets of the keys that exist
+    required = list(REQUIRED_COLUMNS[table_name])
+    checks = [
+        (frame[required].eq("").any(axis=1), f"missing {' or '.join(required)}"),
+        (frame[key].isin(existing_keys), f"{key} already exists"),
+        (frame[key].duplicated(keep="first"), f"duplicate {key} in file"),
+    ]
+    parent = parentOf(table_name)
+    if parent is not None and parent_keys is not None:
+        checks.append((~frame[parent[1]].isin(parent_keys), f"unknown {parent[1]}"))
+    return checks
+
+
+class Constraints:
+    """Rules of the stores checked on each change through their key indexes, so the database never sees a
+    row that breaks one"""
+
+    def __init__(self, stores):
+        # Table name -> store
+        self.stores = stores
+
+    def checkRow(self, store, record, key=None):
+        # Reason a row cannot be added, or the row under key changed to record, empty if it can
+        for column in REQUIRED_COLUMNS.get(store.table_name, ()):
+            if column in record and not str(record[column] or "").strip():
+                return f"Missing {COLUMN_LABELS[column]}"
+        new_key = record.get(store.key, key)
+        # Only loaded rows are looked at, the windows page in a saved row with the key first
+        if new_key != key and store.isLoaded(new_key):
+            return f"Duplicate {COLUMN_LABELS[store.key]}: {new_key}"
+        if key is not None and new_key != key and self.protected(store, key):
+            return f"{key} is where the students of a deleted course go, it cannot be renamed"
+        parent = parentOf(store.table_name)
+        if parent is not None and parent[1] in record:
+            value = record[parent[1]]
+            if not self.stores[parent[0]].isLoaded(value):
+                return f"Unknown {COLUMN_LABELS[parent[1]]}: {value}"
+        return ""
+
+    def checkDelete(self, store, key):
+        if self.protected(store, key):
+            return f"{key} is where the students of a deleted course go, it cannot be deleted"
+        return ""
+
+    def protected(self, store, key):
+        # The row a parent delete moves children to has to stay
+        if store.table_name not in REFERENCES:
+            return False
+        child_table, column, values = REFERENCES[store.table_name]
+        return values[column] == key
+
+    def orphans(self, store):
+        # Keys of the unsaved rows of a child store whose parent is gone, like a course another client deleted.
+        # The save would fail on the foreign key, so it is not started
+        parent = parentOf(store.table_name)
+        if parent is None or not store.tracker.upserts():
+            return []
+        frame = store.frame(store.tracker.upserts())
+        missing = ~frame[parent[1]].isin(set(self.stores[parent[0]].index))
+        return frame.loc[missing, store.key].tolist()
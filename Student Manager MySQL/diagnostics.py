@@ -0,0 +1,119 @@
+"""Timing spans around database calls, store mutations, signals and table paints, plus an optional profiler."""
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+# Most recent durations kept per span, the percentiles describe these
+SAMPLE_LIMIT = 4096
+PERCENTILES = (50, 90, 99)
+
+
+class SpanMetrics:
+    """Durations of one kind of span, totals over the session and the recent samples"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=SAMPLE_LIMIT)
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+
+    def summary(self):
+        # Totals and percentiles in milliseconds
+        percentiles = np.percentile(np.fromiter(self.samples, dtype=float), PERCENTILES) * 1000
+        summary = {'count': self.count, 'total_ms': self.total * 1000}
+        summary.update({f"p{percentile}_ms": value for percentile, value in zip(PERCENTILES, percentiles)})
+        summary['max_ms'] = self.max * 1000
+        return summary
+
+
+class Diagnostics:
+    """Span timings of the whole session and the profiler switched on for it, shared by every module"""
+
+    def __init__(self):
+        self.spans = {}
+        # Spans are recorded from the thread pool as well as the event loop
+        self.lock = threading.Lock()
+        self.profiler = None
+        self.profile_path = None
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        with self.lock:
+            metrics = self.spans.get(name)
+            if metrics is None:
+                metrics = self.spans[name] = SpanMetrics()
+            metrics.record(seconds)
+
+    def summary(self):
+        # Span name -> totals and percentiles, the spans that took the most time first
+        with self.lock:
+            summaries = {name: metrics.summary() for name, metrics in self.spans.items()}
+        return dict(sorted(summaries.items(), key=lambda item: -item[1]['total_ms']))
+
+    def reset(self):
+        with self.lock:
+            self.spans = {}
+
+    def profiling(self):
+        return self.profiler is not None
+
+    def startProfile(self, path):
+        # cProfile only follows the thread that enables it, the event loop thread here
+        self.profiler = cProfile.Profile()
+        self.profile_path = path
+        self.profiler.enable()
+
+    def stopProfile(self):
+        # Writes the profile for pstats or snakeviz and the span summary next to it as JSON
+        self.profiler.disable()
+        self.profiler.dump_stats(self.profile_path)
+        with open(os.path.splitext(self.profile_path)[0] + ".spans.json", "w") as file:
+            json.dump(self.summary(), file, indent=2)
+        path = self.profile_path
+        self.profiler = None
+        self.profile_path = None
+        return path
+
+
+diagnostics = Diagnostics()
+
+
+def timed(category):
+    # Method decorator timing each call as "<category>: <table name>.<method>"
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(self, *args, **kwargs):
+            with diagnostics.span(f"{category}: {self.table_name}.{function.__name__}"):
+                return function(self, *args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def timePaints(view, name):
+    # A table view paints its viewport through its own paintEvent, so the wrapper sees every repaint
+    paint = view.paintEvent
+
+    def paintEvent(event):
+        with diagnostics.span(f"render: {name}"):
+            paint(event)
+    view.paintEvent = paintEvent
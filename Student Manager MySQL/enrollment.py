@@ -0,0 +1,124 @@
+"""Student counts per course, year, sex and status, kept current as rows change."""
+from collections import Counter
+
+from communicate import Communicate
+from repository import ENROLLMENT_COLUMNS, REFERENCES
+from workers import DatabaseTask
+
+
+class EnrollmentStats:
+    """Enrollment counts counted once in the database, then moved by every change without rescanning"""
+
+    def __init__(self, repository, students, courses):
+        self.repository = repository
+        self.students = students
+        self.courses = courses
+        # Course -> Counter of (year, sex, status), a course cascade moves one small bucket
+        self.joint = {}
+        # Column -> value -> count, what the statistics window shows
+        self.totals = {column: Counter() for column in ENROLLMENT_COLUMNS}
+        self.loaded = False
+        # Set when the database has changes the counts are missing, they are read again when possible
+        self.stale = False
+        self.task = None
+        # Changes made while the database counts are read, replayed on top of them when they arrive
+        self.replay = []
+        # Signals statsChanged after every change, taskFailed when counting fails
+        self.communicate = Communicate()
+        students.observers.append(self.studentChanged)
+        courses.observers.append(self.courseChanged)
+        for store in (students, courses):
+            store.communicate.storeSaved.connect(self.storeSavedSlot)
+
+    def refresh(self):
+        # Count in the database, only right once every change is saved so it is deferred until then
+        if self.task is not None or any(store.saving or store.tracker.hasChanges()
+                                        for store in (self.students, self.courses)):
+            self.stale = True
+            return
+        self.stale = False
+        self.replay = []
+        task = DatabaseTask(self.repository.fetchEnrollmentCounts, Communicate())
+        task.communicate.taskFinished.connect(self.countsSlot)
+        task.communicate.taskFailed.connect(self.countsFailedSlot)
+        self.task = task.start()
+
+    def countsSlot(self, counts):
+        self.task = None
+        self.load(counts)
+        for operation, args in self.replay:
+            operation(*args)
+        self.replay = []
+        self.loaded = True
+        self.communicate.statsChanged.emit()
+        if self.stale:
+            self.refresh()
+
+    def countsFailedSlot(self, error):
+        self.task = None
+        self.replay = []
+        self.communicate.taskFailed.emit(error)
+
+    def storeSavedSlot(self):
+        if self.stale:
+            self.refresh()
+
+    def load(self, counts):
+        # Grouped rows from the database, the per column totals are summed vectorized
+        self.joint = {}
+        for course, year, sex, status, count in counts.itertuples(index=False, name=None):
+            self.joint.setdefault(course, Counter())[(year, sex, status)] += int(count)
+        self.totals = {column: Counter({value: int(count) for value, count in
+                                        counts.groupby(column)['count'].sum().items()})
+                       for column in ENROLLMENT_COLUMNS}
+
+    def apply(self, operation, *args):
+        # Changes made while counting are replayed on the database counts once they arrive
+        if self.task is not None:
+            self.replay.append((operation, args))
+        operation(*args)
+        self.communicate.statsChanged.emit()
+
+    def studentChanged(self, old, new):
+        if old is not None:
+            self.apply(self.count, old, -1)
+        if new is not None:
+            self.apply(self.count, new, 1)
+
+    def courseChanged(self, old, new):
+        # A renamed or deleted course takes its students along, like the save's cascade does
+        if old is None:
+            return
+        if new is None:
+            self.apply(self.move, old['course_code'], REFERENCES['courses'][2])
+        elif new['course_code'] != old['course_code']:
+            self.apply(self.move, old['course_code'], {'course': new['course_code']})
+
+    def count(self, row, delta):
+        key = (row['year'], row['sex'], row['status'])
+        self.joint.setdefault(row['course'], Counter())[key] += delta
+        for column in ENROLLMENT_COLUMNS:
+            self.totals[column][row[column]] += delta
+
+    def move(self, course, values):
+        # Every student of a course gets the given values, only the course's bucket is visited
+        bucket = self.joint.pop(course, None)
+        if not bucket:
+            return
+        target = self.joint.setdefault(values['course'], Counter())
+        for (year, sex, status), count in bucket.items():
+            new_status = values.get('status', status)
+            target[(year, sex, new_status)] += count
+            self.totals['status'][status] -= count
+            self.totals['status'][new_status] += count
+        total = sum(bucket.values())
+        self.totals['course'][course] -= total
+        self.totals['course'][values['course']] += total
+
+    def counts(self, column):
+        # (value, count) pairs of one column, most students first
+        return sorted(((value, count) for value, count in self.totals[column].items() if count),
+                      key=lambda item: (-item[1], str(item[0])))
+
+    def total(self):
+        return sum(self.totals['course'].values())
@@ -0,0 +1,219 @@
+"""Undo and redo of the changes made to the stores, kept as the changed values rather than table copies."""
+from collections import deque
+
+from PyQt5.QtCore import QTimer
+
+from communicate import Communicate
+from repository import REFERENCES
+
+# Actions kept for undo, the oldest are forgotten first
+UNDO_LIMIT = 100
+
+
+class Change:
+    """One row of a store going from old to new values, None where the row does not exist"""
+    # A batch change keeps one of these per row, slots keep each one small
+    __slots__ = ('store', 'old_key', 'new_key', 'old', 'new')
+
+    def __init__(self, store, old_key, new_key, old, new):
+        self.store = store
+        self.old_key = old_key
+        self.new_key = new_key
+        # Whole rows for an add or delete, only the columns that changed for an update
+        self.old = old
+        self.new = new
+
+
+class History:
+    """Undo and redo stacks of user actions, every change made in one pass of the event loop is one action"""
+
+    def __init__(self, stores):
+        # Table name -> store, children of a changed parent are found through it
+        self.stores = stores
+        self.undo_stack = deque(maxlen=UNDO_LIMIT)
+        self.redo_stack = []
+        # Changes of the action still being made
+        self.action = []
+        # Set while an undo or redo changes the stores, those changes are not new actions
+        self.applying = False
+        # Set while the rows of an undo or redo are paged in, it is applied once they are
+        self.fetching = False
+        self.actionTimer = QTimer()
+        self.actionTimer.setSingleShot(True)
+        self.actionTimer.setInterval(0)
+        self.actionTimer.timeout.connect(self.endAction)
+        # Signals historyChanged when what can be undone or redone changes
+        self.communicate = Communicate()
+        for store in stores.values():
+            store.observers.append(lambda old, new, store=store: self.record(store, old, new))
+
+    def record(self, store, old, new):
+        if self.applying:
+            return
+        old_key = old[store.key] if old is not None else None
+        new_key = new[store.key] if new is not None else None
+        if old is not None and new is not None:
+            changed = [column for column in store.column_names if old[column] != new[column]]
+            if not changed:
+                return
+            self.action.append(Change(store, old_key, new_key, {column: old[column] for column in changed},
+                                      {column: new[column] for column in changed}))
+        else:
+            self.action.append(Change(store, old_key, new_key, old, new))
+        if old_key is not None and old_key != new_key:
+            self.recordChildren(store, old_key, new_key)
+        if not self.actionTimer.isActive():
+            self.actionTimer.start()
+
+    def recordChildren(self, store, old_key, new_key):
+        # Loaded children of a renamed or deleted parent are moved untracked right after, by the window
+        # or the journal replay, their values are noted now so undo moves them back
+        if store.table_name not in REFERENCES:
+            return
+        child_table, column, values = REFERENCES[store.table_name]
+        if new_key is not None:
+            values = {column: new_key}
+        child = self.stores[child_table]
+        for key in child.find(column, old_key):
+            position = child.index[key]
+            self.action.append(Change(child, key, key, {name: child.value(position, name) for name in values},
+                                      dict(values)))
+
+    def restoreChildren(self, store, key):
+        # A parent brought back by undo gets back the children a saved delete moved off it, in the database with
+        # the next save and here untracked for the loaded ones still cleared, like the cascade moved them
+        if store.table_name not in REFERENCES or not store.isLoaded(key):
+            return
+        store.tracker.recordUndelete(key)
+        child_table, column, cleared = REFERENCES[store.table_name]
+        child = self.stores[child_table]
+        changed = child.tracker.unsavedUpserts()
+        groups = {}
+        for child_key, values in store.tracker.restored.get(key, {}).items():
+            position = child.index.get(child_key)
+            if position is None or child_key in changed \
+                    or any(child.value(position, name) != value for name, value in cleared.items()):
+                continue
+            groups.setdefault(tuple(sorted(values.items())), []).append(child_key)
+        for values, keys in groups.items():
+            child.updateMany(keys, dict(values, **{column: key}), track=False)
+
+    def clearChildren(self, store, key):
+        # Redoing a parent delete lets go of every loaded child, those restored untracked by its undo included
+        if store.table_name not in REFERENCES:
+            return
+        child_table, column, cleared = REFERENCES[store.table_name]
+        child = self.stores[child_table]
+        child.updateMany(child.find(column, key), cleared, track=False)
+
+    def endAction(self):
+        self.actionTimer.stop()
+        if not self.action:
+            return
+        self.undo_stack.append(self.action)
+        self.action = []
+        self.redo_stack = []
+        self.communicate.historyChanged.emit()
+
+    def canUndo(self):
+        return bool(self.undo_stack or self.action) and not self.fetching
+
+    def canRedo(self):
+        return bool(self.redo_stack) and not self.action and not self.fetching
+
+    def undo(self):
+        # Rows go back to their old values, newest change first. Returns the number of rows changed
+        self.endAction()
+        if not self.undo_stack or self.fetching:
+            return 0
+        action = self.undo_stack.pop()
+        self.fetch(action, lambda: self.finishUndo(action))
+        return len(action)
+
+    def finishUndo(self, action):
+        self.apply([(change.store, change.new_key, change.old) for change in reversed(action)])
+        for change in action:
+            if change.new is None and change.old is not None:
+                self.restoreChildren(change.store, change.old_key)
+        self.redo_stack.append(action)
+        self.communicate.historyChanged.emit()
+
+    def redo(self):
+        if not self.redo_stack or self.fetching:
+            return 0
+        action = self.redo_stack.pop()
+        self.fetch(action, lambda: self.finishRedo(action))
+        return len(action)
+
+    def finishRedo(self, action):
+        self.apply([(change.store, change.old_key, change.new) for change in action])
+        for change in action:
+            if change.new is None and change.old is not None:
+                self.clearChildren(change.store, change.old_key)
+        self.undo_stack.append(action)
+        self.communicate.historyChanged.emit()
+
+    def fetch(self, action, then):
+        # Rows of the action saved and dropped from memory since are paged in first, one lookup per store
+        keys = {}
+        for change in action:
+            for key in (change.old_key, change.new_key):
+                if key is not None:
+                    keys.setdefault(change.store, set()).add(key)
+        stores = list(keys)
+        self.fetching = True
+        self.communicate.historyChanged.emit()
+
+        def fetchNext():
+            if stores:
+                store = stores.pop()
+                store.fetch(keys[store], fetchNext)
+            else:
+                self.fetching = False
+                then()
+
+        fetchNext()
+
+    def apply(self, moves):
+        # Each move takes the row under key to values as a tracked change, so the next save writes it.
+        # Updates giving many rows the same values, like undoing a batch, go through one updateMany
+        self.applying = True
+        try:
+            batches, batched = {}, set()
+            for store, key, values in moves:
+                # A row changed twice in one action is batched once, its second change waits for the first
+                if key is not None and values is not None and store.key not in values \
+                        and (store, key) not in batched:
+                    batches.setdefault((store, tuple(sorted(values.items()))), []).append(key)
+                    batched.add((store, key))
+                    continue
+                self.applyBatches(batches)
+                batches, batched = {}, set()
+                self.move(store, key, values)
+            self.applyBatches(batches)
+        finally:
+            self.applying = False
+
+    def applyBatches(self, batches):
+        for (store, values), keys in batches.items():
+            # Rows deleted since are skipped
+            store.updateMany([key for key in keys if store.isLoaded(key)], dict(values))
+
+    def move(self, store, key, values):
+        if values is None:
+            if store.isLoaded(key):
+                store.delete(key)
+        elif key is None:
+            if store.isLoaded(values[store.key]):
+                store.update(values[store.key], values)
+            else:
+                store.add(values)
+        elif store.isLoaded(key):
+            store.update(key, values)
+
+    def clear(self):
+        self.actionTimer.stop()
+        self.action = []
+        self.undo_stack.clear()
+        self.redo_stack = []
+        self.communicate.historyChanged.emit()
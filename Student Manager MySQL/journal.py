@@ -0,0 +1,202 @@
+"""Append-only journal of the unsaved changes, so a crash or a failed save never loses an edit."""
+import glob
+import hashlib
+import json
+import os
+
+from PyQt5.QtCore import QTimer
+
+from repository import REFERENCES
+
+# Milliseconds changes may wait in the file buffer, every change within them shares one fsync
+JOURNAL_SYNC_MS = 100
+
+
+def journalDirectory():
+    return os.environ.get('STUDENT_JOURNAL_DIR',
+                          os.path.join(os.path.expanduser("~"), ".student_manager", "journal"))
+
+
+def lockFile(file):
+    # Locks held by a process are let go by the system when it ends, a crashed one included.
+    # Raises OSError if another process or window holds the lock
+    try:
+        import fcntl
+    except ImportError:
+        import msvcrt
+        msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+    else:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+
+class Journal:
+    """Every tracked change of the stores as one JSON line, kept until a save commits it"""
+
+    def __init__(self, directory, identity):
+        self.directory = directory
+        # One journal per database so changes are never replayed against another server
+        self.prefix = hashlib.sha1(identity.encode()).hexdigest()[:16]
+        # Changes go to numbered segments per table, a save starts new ones and a commit deletes the old ones
+        numbers = [self.segmentNumber(path) for path in self.segments()]
+        self.segment = max(numbers, default=0) + 1
+        # Segments below this one are the last session's, they are only dropped once replayed
+        self.first = self.segment
+        self.recovered = False
+        # Segments of the last session whose last line a crash cut off
+        self.cut = []
+        self.files = {}
+        # Order of the changes across tables, continued from the segments left by the last session
+        self.seq = 0
+        self.replaying = False
+        self.lock = None
+        self.syncTimer = QTimer()
+        self.syncTimer.setSingleShot(True)
+        self.syncTimer.setInterval(JOURNAL_SYNC_MS)
+        self.syncTimer.timeout.connect(self.sync)
+
+    @classmethod
+    def forBackend(cls, backend):
+        # Only one window journals a database at a time, the others would replay and drop its changes.
+        # Raises OSError if the journal cannot be locked
+        if backend is None:
+            return None
+        journal = cls(journalDirectory(), backend.identity())
+        journal.acquire()
+        return journal
+
+    def acquire(self):
+        # The lock file is held open for as long as the journal is used
+        os.makedirs(self.directory, exist_ok=True)
+        self.lock = open(os.path.join(self.directory, f"{self.prefix}.lock"), "a")
+        try:
+            lockFile(self.lock)
+        except OSError:
+            self.lock.close()
+            raise
+
+    def segments(self, table_name="*"):
+        return sorted(glob.glob(os.path.join(glob.escape(self.directory), f"{self.prefix}.{table_name}.*.jsonl")))
+
+    def segmentNumber(self, path):
+        return int(path.rsplit(".", 2)[1])
+
+    def attach(self, store):
+        # The store tells its observers the (old, new) rows of every tracked change
+        store.observers.append(lambda old, new: self.append(store, old, new))
+
+    def append(self, store, old, new):
+        # Written through the file buffer, the sync timer makes a burst of changes durable with one fsync
+        if self.replaying:
+            return
+        file = self.files.get(store.table_name)
+        if file is None:
+            path = os.path.join(self.directory, f"{self.prefix}.{store.table_name}.{self.segment:08d}.jsonl")
+            file = self.files[store.table_name] = open(path, "a")
+        self.seq += 1
+        key = old[store.key] if old is not None else None
+        # The version the row was loaded at, so the replayed change still conflicts with someone else's write
+        record = {'seq': self.seq, 'table': store.table_name, 'key': key, 'row': new,
+                  'version': store.row_versions.get(key) if key is not None else None}
+        file.write(json.dumps(record) + "\n")
+        if not self.syncTimer.isActive():
+            self.syncTimer.start()
+
+    def sync(self):
+        self.syncTimer.stop()
+        for file in self.files.values():
+            file.flush()
+            os.fsync(file.fileno())
+
+    def keep(self, store):
+        # A save left changes of the store out, its unsaved changes are written again as the rows are now so
+        # releasing the segments the save covered keeps them
+        tracker = store.tracker
+        for key in tracker.deleted - set(tracker.renamed.values()):
+            self.append(store, {store.key: key}, None)
+        for key in tracker.upserts():
+            if key in store.index:
+                origin = tracker.renamed.get(key, None if key in tracker.inserted else key)
+                self.append(store, {store.key: origin} if origin is not None else None, store.get(key))
+
+    def rotate(self):
+        # A save is starting, changes made from now on go to new segments. Returns the last segment it covers
+        self.sync()
+        for file in self.files.values():
+            file.close()
+        self.files = {}
+        self.segment += 1
+        return self.segment - 1
+
+    def release(self, table_names, mark):
+        # A save of these tables committed, their changes up to the mark are in the database now
+        for table_name in table_names:
+            for path in self.segments(table_name):
+                number = self.segmentNumber(path)
+                if number <= mark and (number >= self.first or self.recovered):
+                    os.remove(path)
+
+    def hasRecords(self):
+        return bool(self.segments())
+
+    def records(self):
+        # Changes left by the last session in the order they were made. A line cut off by a crash ends its file
+        records = []
+        for path in self.segments():
+            with open(path) as file:
+                for line in file:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        self.cut.append(path)
+                        break
+        records.sort(key=lambda record: record['seq'])
+        self.seq = max([self.seq] + [record['seq'] for record in records])
+        return records
+
+    def replay(self, records, stores):
+        # Apply the records to the stores as tracked changes again, the rows they touch must already be loaded.
+        # They are still in their segments, so they are not journaled twice
+        self.replaying = True
+        try:
+            replayed = set()
+            for record in records:
+                store = stores[record['table']]
+                key, row = record['key'], record['row']
+                if key is not None and (store.table_name, key) not in replayed:
+                    replayed.add((store.table_name, key))
+                    if record['version'] is not None:
+                        store.row_versions[key] = record['version']
+                if key is not None and store.isLoaded(key):
+                    if row is None:
+                        store.delete(key)
+                    else:
+                        store.update(key, row)
+                elif row is not None:
+                    if store.isLoaded(row[store.key]):
+                        store.update(row[store.key], row)
+                    else:
+                        store.add(row)
+                self.cascade(store, stores, key, row)
+            self.recovered = True
+        finally:
+            self.replaying = False
+
+    def cascade(self, store, stores, key, row):
+        # Loaded children follow a renamed or deleted parent like the windows make them, the save does it in
+        # the database
+        if store.table_name not in REFERENCES or key is None:
+            return
+        child_table, column, values = REFERENCES[store.table_name]
+        if row is not None:
+            if row[store.key] == key:
+                return
+            values = {column: row[store.key]}
+        child = stores[child_table]
+        child.updateMany(child.find(column, key), values, track=False)
+
+    def close(self):
+        self.sync()
+        for file in self.files.values():
+            file.close()
+        self.files = {}
+        self.lock.close()
@@ -1,600 +1,1308 @@
-"""Import required modules."""
-import mysql.connector
-from mysql.connector import Error
-
-import pandas as pd
-from PyQt5.QtWidgets import QApplication, QMainWindow, QMessageBox, QTableWidgetItem, QHeaderView
-from PyQt5.QtCore import pyqtSignal, QObject
-from PyQt5 import uic
-
-class Communicate(QObject):
-    """Communicate with signal to update dataframe"""
-    updateDataframe = pyqtSignal(pd.DataFrame)
-    updateCourseDataframe = pyqtSignal(pd.DataFrame)
-    deletedCourse = pyqtSignal(str)
-
-class mainWindow(QMainWindow):
-    """Main window"""
-
-    def __init__(self):
-        # Load Main Window UI
-        super(mainWindow, self).__init__()
-        uic.loadUi("mainWindow.ui", self)
-        self.show()
-
-        # Trigger event for buttons in main window
-        self.addButton.clicked.connect(self.addClicked)
-        self.deleteButton.clicked.connect(self.deleteClicked)
-        self.editButton.clicked.connect(self.editClicked)
-        self.saveButton.clicked.connect(self.saveClicked)
-        self.courseViewButton.clicked.connect(self.courseViewClicked)
-
-        # Store future references to child windows
-        self.courseWindow = None
-        self.addWindow = None
-        self.deleteWindow = None
-        self.updateWindow = None
-
-        # Create an object to communicate
-        self.communicate = Communicate()
-
-        # Initialize dataframes
-        self.dataframe = self.fetchStudents()
-        self.course_dataframe = self.fetchCourses()
-
-        # Update text browser
-        self.read()
-
-    def fetchStudents(self):
-        # Fetch students from database
-        try:
-            connection = mysql.connector.connect(host='localhost',
-                                                 database='database',
-                                                 user='root',
-                                                 password='password')
-            cursor = connection.cursor()
-            cursor.execute("SELECT * FROM students")
-            rows = cursor.fetchall()
-            df = pd.DataFrame(rows, columns=['name', 'id_number', 'course', 'year', 'sex', 'status'])
-            return df
-        except Error as e:
-            print(e)
-        finally:
-            if (connection.is_connected()):
-                cursor.close()
-                connection.close()
-
-    def fetchCourses(self):
-        # Fetch courses from database
-        try:
-            connection = mysql.connector.connect(host='localhost',
-                                                 database='database',
-                                                 user='root',
-                                                 password='password')
-            cursor = connection.cursor()
-            cursor.execute("SELECT * FROM courses")
-            rows = cursor.fetchall()
-            df = pd.DataFrame(rows, columns=['course_code', 'course_description'])
-            return df
-        except Error as e:
-            print(e)
-        finally:
-            if (connection.is_connected()):
-                cursor.close()
-                connection.close()
-
-    def saveDataframe(self, dataframe, students):
-        try:
-            connection = mysql.connector.connect(host='localhost',
-                                                 database='database',
-                                                 user='root',
-                                                 password='password')
-            cursor = connection.cursor()
-            # Set foreign key off before altering values in table
-            cursor.execute("SET FOREIGN_KEY_CHECKS = 0;")
-
-            cursor.execute(f"DELETE FROM {students};")
-            for index, row in dataframe.iterrows():
-                values = ', '.join(['%s'] * len(row))
-                sql = (f"INSERT INTO {students} VALUES ({values})")
-                cursor.execute(sql, tuple(row.values))
-
-            # Set the foreign key on after altering values in table
-            cursor.execute("SET FOREIGN_KEY_CHECKS = 1;")
-            connection.commit()
-            print(f"{students} saved successfully.")
-        except Error as e:
-            print(f"Error saving {students}: {e}")
-        finally:
-            if (connection.is_connected()):
-                cursor.close()
-                connection.close()
-
-    def courseViewClicked(self):
-        #Open course window
-        self.courseWindow = courseWindow(self.dataframe, self.course_dataframe)
-        #Update dataframe
-        self.courseWindow.communicate.updateDataframe.connect(self.updateDataframeSlot)
-        self.courseWindow.communicate.updateCourseDataframe.connect(self.updateCourseDataframeSlot)
-
-    def read(self):
-        # Clear QTableWidget textOutput
-        self.textOutput.setRowCount(0)
-        self.textOutput.setColumnCount(len(self.dataframe.columns))
-
-        # Populate QTableWidget with data
-        for index, row in self.dataframe.iterrows():
-            row_position = self.textOutput.rowCount()
-            self.textOutput.insertRow(row_position)
-
-            for i, data in enumerate(row):
-                item = QTableWidgetItem(str(data))
-                self.textOutput.setItem(row_position, i, item)
-
-        # Adjust column widths to content
-        self.textOutput.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-
-    def addClicked(self):
-        #Opens add window
-        self.addWindow = addWindow(self.dataframe, self.course_dataframe)
-        #Updates dataframe
-        self.addWindow.communicate.updateDataframe.connect(self.updateDataframeSlot)
-
-    def deleteClicked(self):
-        #Opens delete window
-        self.deleteWindow = deleteWindow(self.dataframe)
-        #Updates dataframe
-        self.deleteWindow.communicate.updateDataframe.connect(self.updateDataframeSlot)
-
-    def editClicked(self):
-        #Opens edit window
-        self.editWindow = editWindow(self.dataframe, self.course_dataframe)
-        #Updates dataframe
-        self.editWindow.communicate.updateDataframe.connect(self.updateDataframeSlot)
-
-    def saveClicked(self):
-        #Save current dataframe to csv
-        self.saveDataframe(self.dataframe, "students")
-
-    def updateDataframeSlot(self, new_dataframe):
-        #Update dataframe through signal and slot
-        self.dataframe = new_dataframe
-        self.read()
-
-    def updateCourseDataframeSlot(self, new_course_dataframe):
-        #Update course dataframe through signal and slot
-        self.course_dataframe = new_course_dataframe
-        self.read()
-
-class addWindow(QMainWindow):
-    """Add Student Window"""
-
-    def __init__(self, dataframe, course_dataframe):
-        #Load Add Window UI
-        super(addWindow, self).__init__()
-        uic.loadUi("addWindow.ui", self)
-
-        #Adds the course codes from the course dataframe to the drop down combo box
-        for index, row in course_dataframe.iterrows():
-            value = row['course_code']
-            self.courseInput.addItem(value)
-        self.show()
-
-        #Button trigger event for add window
-        self.submitButton.clicked.connect(self.submitClicked)
-
-        #Store dataframes to local class
-        self.dataframe = dataframe
-        self.course_dataframe = course_dataframe
-
-        #Communicate object
-        self.communicate = Communicate()
-
-    def submitClicked(self):
-        # Logic to check for duplicate ID number
-        id_number = self.idNumberInput.text()
-        existing_student = self.dataframe[self.dataframe["id_number"] == id_number]
-
-        if not existing_student.empty:
-            # Display error message if duplicate ID number
-            message = QMessageBox()
-            message.setWindowTitle("Error")
-            message.setText("Duplicate ID Number: " + id_number)
-            message.exec()
-        else:
-            # Logic to add new student to dataframe
-            name = self.nameInput.text()
-            course = self.courseInput.currentText()
-            year = self.yearInput.currentText()
-            sex = self.sexInput.currentText()
-            if course == "No Course":
-                status = "No"
-            else:
-                status = "Yes"
-            student_data = [name, id_number, course, year, sex, status]
-            column_names = ["name", "id_number", "course", "year", "sex", "status"]
-            new_row = pd.DataFrame(columns=column_names)
-            new_row.loc[0] = student_data
-            self.dataframe = pd.concat([self.dataframe, new_row], ignore_index=True)
-
-            # Emit signal
-            self.communicate.updateDataframe.emit(self.dataframe)
-            # Close window
-            self.close()
-
-class deleteWindow(QMainWindow):
-    """Delete Student Window"""
-
-    def __init__(self, dataframe):
-        #Initialize Student Window UI
-        super(deleteWindow, self).__init__()
-        uic.loadUi("deleteWindow.ui", self)
-        self.show()
-
-        #Button trigger event for delete window
-        self.submitButton.clicked.connect(self.submitClicked)
-
-        #Store dataframe to local class
-        self.dataframe = dataframe
-        #Communication object
-        self.communicate = Communicate()
-
-    def submitClicked(self):
-        # Logic to delete chosen student from dataframe
-        student_to_delete = self.deleteInput.text()
-
-        # Confirmation dialog for deleting a student
-        reply = QMessageBox.question(self, 'Confirmation', f"Are you sure you want to delete {student_to_delete}?", QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
-        if reply == QMessageBox.Yes:
-            # Proceed with deletion if yes
-            self.dataframe = self.dataframe.drop(self.dataframe[self.dataframe["id_number"] == student_to_delete].index)
-            self.dataframe = self.dataframe.reset_index(drop=True)
-            # Emit signal and close window
-            self.communicate.updateDataframe.emit(self.dataframe)
-            self.close()
-        else:
-            # Cancel deletion if not confirmed
-            return
-
-class editWindow(QMainWindow):
-    """Edit Student Window"""
-
-    def __init__(self, dataframe, course_dataframe):
-        #Initialize Student Window UI
-        super(editWindow, self).__init__()
-        uic.loadUi("editWindow.ui", self)
-
-        # Adds the course codes from the course dataframe to the drop down combo box
-        for index, row in course_dataframe.iterrows():
-            value = row['course_code']
-            self.courseInput.addItem(value)
-        self.show()
-
-        #Button trigger event for edit window
-        self.submitButton.clicked.connect(self.submitClicked)
-        self.editSubmitButton.clicked.connect(self.editSubmitClicked)
-
-        #Store dataframe to local class
-        self.dataframe = dataframe
-        self.course_dataframe = course_dataframe
-
-        #Communicate object
-        self.communicate = Communicate()
-
-        #Initialize row index for function use
-        self.row_index = None
-
-    def submitClicked(self):
-        # Logic to output current values of a given student
-        try:
-            #Set disabled submit button to true if student is found
-            self.editSubmitButton.setEnabled(True)
-            student_to_edit = self.editInput.text()
-            self.row_index = self.dataframe[self.dataframe["id_number"] == student_to_edit].index
-            self.nameInput.setText(str(self.dataframe.loc[self.row_index, "name"].item()))
-            self.idNumberInput.setText(str(self.dataframe.loc[self.row_index, "id_number"].item()))
-            self.courseInput.setCurrentText(str(self.dataframe.loc[self.row_index, "course"].item()))
-            self.yearInput.setCurrentText(str(self.dataframe.loc[self.row_index, "year"].item()))
-            self.sexInput.setCurrentText(str(self.dataframe.loc[self.row_index, "sex"].item()))
-            self.enrolledInput.setCurrentText(str(self.dataframe.loc[self.row_index, "status"].item()))
-        except:
-            #Set submit button to false if student is not found
-            self.editSubmitButton.setEnabled(False)
-            #Show error
-            message = QMessageBox()
-            message.setWindowTitle("Error")
-            message.setText("Student not found")
-            message.exec()
-
-    def editSubmitClicked(self):
-        # Logic to check for duplicate ID number
-        id_number = self.idNumberInput.text()
-        # Exclude the current row from the duplicate check
-        modified_dataframe = self.dataframe.drop(self.row_index)
-        existing_student = modified_dataframe[modified_dataframe["id_number"] == id_number]
-
-        if not existing_student.empty:
-            # Display error message if duplicate ID number is found
-            message = QMessageBox()
-            message.setWindowTitle("Error")
-            message.setText("Duplicate ID Number: " + id_number)
-            message.exec()
-        else:
-            # Logic to edit the values of a given student
-            name = self.nameInput.text()
-            course = self.courseInput.currentText()
-            year = int(self.yearInput.currentText())
-            sex = self.sexInput.currentText()
-            if course == "No Course":
-                status = "No"
-            else:
-                status = "Yes"
-
-            # Update dataframe with edited values
-            self.dataframe.loc[self.row_index, "name"] = name
-            self.dataframe.loc[self.row_index, "id_number"] = id_number
-            self.dataframe.loc[self.row_index, "course"] = course
-            self.dataframe.loc[self.row_index, "year"] = year
-            self.dataframe.loc[self.row_index, "sex"] = sex
-            self.dataframe.loc[self.row_index, "status"] = status
-            # Emit signal and close window
-            self.communicate.updateDataframe.emit(self.dataframe)
-            self.close()
-
-class courseWindow(QMainWindow):
-    """Course View Window"""
-    def __init__(self, dataframe, course_dataframe):
-        #Initialize Course Window UI
-        super(courseWindow, self).__init__()
-        uic.loadUi("courseWindow.ui", self)
-        self.show()
-
-        #Button trigger events
-        self.addButton.clicked.connect(self.addClicked)
-        self.deleteButton.clicked.connect(self.deleteClicked)
-        self.editButton.clicked.connect(self.editClicked)
-        self.saveButton.clicked.connect(self.saveClicked)
-        self.course_dataframe = course_dataframe
-        self.dataframe = dataframe
-
-        #Initialize child windows
-        self.courseAddWindow = None
-        self.courseDeleteWindow = None
-        self.courseEditWindow = None
-        #Communicate object
-        self.communicate = Communicate()
-        #Output initial course data
-        self.read()
-
-    def saveCourseDataFrameToDB(self, course_dataframe, table_name):
-        try:
-            connection = mysql.connector.connect(host='localhost',
-                                                 database='database',
-                                                 user='root',
-                                                 password='password')
-            cursor = connection.cursor()
-            #Set foreign key off before altering values in table
-            cursor.execute("SET FOREIGN_KEY_CHECKS = 0;")
-
-            cursor.execute(f"DELETE FROM {table_name};")
-            for index, row in course_dataframe.iterrows():
-                values = ', '.join(['%s'] * len(row))
-                sql = (f"INSERT INTO {table_name} VALUES ({values})")
-                cursor.execute(sql, tuple(row.values))
-
-            #Set the foreign key on after altering values in table
-            cursor.execute("SET FOREIGN_KEY_CHECKS = 1;")
-            connection.commit()
-            print(f"{table_name} saved successfully.")
-        except Error as e:
-            print(f"Error saving {table_name}: {e}")
-        finally:
-            if (connection.is_connected()):
-                cursor.close()
-                connection.close()
-
-    def read(self):
-        # Clears the QTableWidget
-        self.textOutput.setRowCount(0)
-        self.textOutput.setColumnCount(len(self.course_dataframe.columns))
-
-        # Populates QTableWidget with data
-        for index, row in self.course_dataframe.iterrows():
-            row_position = self.textOutput.rowCount()
-            self.textOutput.insertRow(row_position)
-
-            for i, data in enumerate(row):
-                item = QTableWidgetItem(str(data))
-                self.textOutput.setItem(row_position, i, item)
-
-        # Adjust column widths to content
-        self.textOutput.resizeColumnsToContents()
-        self.textOutput.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-
-    def addClicked(self):
-        #Opens Add Course Window
-        self.courseAddWindow = courseAddWindow(self.course_dataframe)
-        #Update course dataframe
-        self.courseAddWindow.communicate.updateCourseDataframe.connect(self.updateCourseDataframeSlot)
-
-    def deleteClicked(self):
-        #Opens Delete Course Window
-        self.courseDeleteWindow = courseDeleteWindow(self.course_dataframe)
-        #Update course dataframe
-        self.courseDeleteWindow.communicate.updateCourseDataframe.connect(self.updateCourseDataframeSlot)
-        self.courseDeleteWindow.communicate.deletedCourse.connect(self.handleCourseDeletion)
-
-    def editClicked(self):
-        #Opens Edit Course Window
-        self.courseEditWindow = courseEditWindow(self.dataframe, self.course_dataframe)
-        #Update course dataframe
-        self.courseEditWindow.communicate.updateDataframe.connect(self.updateDataframeSlot)
-        self.courseEditWindow.communicate.updateCourseDataframe.connect(self.updateCourseDataframeSlot)
-
-    def saveClicked(self):
-        #Save course dataframe to csv
-        self.saveCourseDataFrameToDB(self.course_dataframe, "courses")
-
-    def updateCourseDataframeSlot(self, new_course_dataframe):
-        # Update dataframe
-        self.course_dataframe = new_course_dataframe
-        #Updates text browser with new course dataframe
-        self.read()
-        #Emit signal to update course dataframe in Main Window
-        self.communicate.updateCourseDataframe.emit(self.course_dataframe)
-
-    def updateDataframeSlot(self, new_dataframe):
-        # Update dataframe
-        self.dataframe = new_dataframe
-        #Updates text browser with new course dataframe
-        self.read()
-        #Emit signal to update course dataframe in Main Window
-        self.communicate.updateDataframe.emit(self.dataframe)
-
-    def handleCourseDeletion(self, deleted_course_code):
-        # Iterate over all rows in the dataframe
-        for index, row in self.dataframe.iterrows():
-            if row['course'] == deleted_course_code:
-                # Set the course field to "No Course" for all matching rows
-                self.dataframe.at[index, 'course'] = "No Course"
-                self.dataframe.at[index, 'status'] = "No"
-        # Emit signal to update the dataframe in the main window
-        self.communicate.updateDataframe.emit(self.dataframe)
-
-class courseAddWindow(QMainWindow):
-    """Add Course Window"""
-    def __init__(self, course_dataframe):
-        #Initialize Add Course Window UI
-        super(courseAddWindow, self).__init__()
-        uic.loadUi("courseAddWindow.ui", self)
-        self.show()
-
-        #Store dataframe to local class
-        self.course_dataframe = course_dataframe
-        #Button trigger event
-        self.submitButton.clicked.connect(self.submitClicked)
-        #Communicate object
-        self.communicate = Communicate()
-
-    def submitClicked(self):
-        #Logic to add new course to course datafrmae
-        course_code = self.courseCodeInput.text()
-        course_description = self.courseDescriptInput.text()
-        course_data = [course_code, course_description]
-        column_names = ["course_code", "course_description"]
-        new_row = pd.DataFrame(columns=column_names)
-        new_row.loc[0] = course_data
-        self.course_dataframe = pd.concat([self.course_dataframe, new_row], ignore_index=True)
-
-        #Emit signal and close window
-        self.communicate.updateCourseDataframe.emit(self.course_dataframe)
-        self.close()
-
-class courseDeleteWindow(QMainWindow):
-    """Delete Course Window"""
-    def __init__(self, course_dataframe):
-        #Initialize Delete Course Window
-        super(courseDeleteWindow, self).__init__()
-        uic.loadUi("courseDeleteWindow.ui", self)
-        #Adds the course codes from the course dataframe to the drop down combo box
-        for index, row in course_dataframe.iterrows():
-            value = row['course_code']
-            self.courseCodeInput.addItem(value)
-        self.show()
-
-        #Store course dataframe to local
-        self.course_dataframe = course_dataframe
-        #Button trigger event
-        self.submitButton.clicked.connect(self.submitClicked)
-        #Communicate object
-        self.communicate = Communicate()
-
-    def submitClicked(self):
-        # Logic to delete a given course
-        course_to_delete = self.courseCodeInput.currentText()
-        # Confirmation dialog for deleting a course
-        reply = QMessageBox.question(self, 'Confirmation', f"Are you sure you want to delete {course_to_delete}?",
-                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
-        if reply == QMessageBox.Yes:
-            # Proceed with deletion if yes
-            self.course_dataframe = self.course_dataframe.drop(
-                self.course_dataframe[self.course_dataframe["course_code"] == course_to_delete].index)
-            self.course_dataframe = self.course_dataframe.reset_index(drop=True)
-            # Emit signal and close window
-            self.communicate.updateCourseDataframe.emit(self.course_dataframe)
-            self.communicate.deletedCourse.emit(course_to_delete)
-            self.close()
-        else:
-            # Cancel deletion if no
-            return
-
-class courseEditWindow(QMainWindow):
-    """Edit Course Window"""
-
-    def __init__(self, dataframe,  course_dataframe):
-        #Initialize Edit Course Window UI
-        super(courseEditWindow, self).__init__()
-        uic.loadUi("courseEditWindow.ui", self)
-        self.show()
-
-        #Button trigger event
-        self.submitButton.clicked.connect(self.submitClicked)
-        self.editButton.clicked.connect(self.editClicked)
-
-        #Store course dataframe to local
-        self.course_dataframe = course_dataframe
-        self.dataframe = dataframe
-        #Communicate object
-        self.communicate = Communicate()
-        #Initialize row index
-        self.row_index = None
-
-    def submitClicked(self):
-        #Logic to edit course row
-        try:
-            #Set edit button to true if course is found
-            self.editButton.setEnabled(True)
-            course_to_edit = self.editCourseInput.text()
-            self.row_index = self.course_dataframe[self.course_dataframe["course_code"] == course_to_edit].index
-            self.courseCodeInput.setText(str(self.course_dataframe.loc[self.row_index, "course_code"].item()))
-            self.courseDescriptInput.setText(str(self.course_dataframe.loc[self.row_index, "course_description"].item()))
-        except:
-            #Set edit button to false if course is not found
-            self.editButton.setEnabled(False)
-            #Show error
-            message = QMessageBox()
-            message.setWindowTitle("Error")
-            message.setText("Course not found")
-            message.exec()
-
-    def editClicked(self):
-        #Logic to edit given course
-        course_code = self.courseCodeInput.text()
-        course_description = self.courseDescriptInput.text()
-
-        old_course_code = str(self.course_dataframe.loc[self.row_index, "course_code"].item())
-        new_course_code = self.courseCodeInput.text()
-        course_description = self.courseDescriptInput.text()
-
-        self.course_dataframe.loc[self.row_index, "course_code"] = course_code
-        self.course_dataframe.loc[self.row_index, "course_description"] = course_description
-
-        # Update course_dataframe
-        self.course_dataframe.loc[self.row_index, "course_code"] = new_course_code
-        self.course_dataframe.loc[self.row_index, "course_description"] = course_description
-
-        # Update references in dataframe
-        self.dataframe['course'] = self.dataframe['course'].replace(old_course_code, new_course_code)
-        # Emit signal and close window
-        self.communicate.updateDataframe.emit(self.dataframe)
-        self.communicate.updateCourseDataframe.emit(self.course_dataframe)
-        self.close()
-
-def main():
-    #Run application event loop
-    app = QApplication([])
-    window = mainWindow()
-    app.exec_()
-
-if __name__ == "__main__":
-    main()
+"""Import required modules."""
+import os
+
+from PyQt5.QtWidgets import QApplication, QMainWindow, QMessageBox, QHeaderView, QFileDialog, QComboBox, QAction, \
+    QAbstractItemView, QInputDialog, QCompleter, QLabel
+from PyQt5.QtCore import Qt, QTimer, QStringListModel
+from PyQt5.QtGui import QKeySequence
+from PyQt5 import uic
+
+from changefeed import ChangeFeed
+from communicate import Communicate
+from constraints import Constraints
+from diagnostics import diagnostics, timePaints
+from enrollment import EnrollmentStats
+from history import History
+from journal import Journal
+from models import StoreModel, PagedStoreModel, RowsModel, ChoiceModel
+from pager import StudentPager
+from repository import Repository, StudentQuery, TableChanges, STUDENT_COLUMNS, COURSE_COLUMNS, STUDENT_DTYPES, \
+    STUDENT_SCHEMA, SYNC_OVERLAP, YEARS
+from snapshot import SnapshotCache, fetchSnapshotChanges, queryState, stateQuery
+from store import TableStore
+from tracker import ChangeTracker
+from transfer import TransferReport, importStudents, importCourses, exportTable
+from workers import DatabaseTask
+
+# Folder of the .ui files, found the same way whatever the working directory
+FORM_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+# Characters a course drop down is sized for
+COURSE_CODE_LENGTH = 12
+# Milliseconds between two redraws of the open diagnostics window
+DIAGNOSTICS_REFRESH_MS = 1000
+# Matches listed while typing a student's name or ID number
+SEARCH_RESULTS = 20
+# Milliseconds between two background saves of the journaled changes
+AUTOSAVE_MS = 5000
+
+
+def loadForm(file_name):
+    # Parsed and compiled once when the module loads, opening a window only runs the form's setupUi
+    return uic.loadUiType(os.path.join(FORM_DIRECTORY, file_name))[0]
+
+
+def showCourseList(combo, course_list):
+    # Sized for a fixed number of characters, sizing to the contents would read every course on the first show
+    combo.setSizeAdjustPolicy(QComboBox.AdjustToMinimumContentsLengthWithIcon)
+    combo.setMinimumContentsLength(COURSE_CODE_LENGTH)
+    combo.setModel(course_list)
+
+
+def studentSearch(window, line_edit, students, picked):
+    # Ranked matches from the loaded students as the user types, joined by the saved students the database
+    # finds once it answers. Those are loaded without joining the listing. Picking one calls picked with its
+    # ID number
+    matches = QStringListModel(window)
+    completer = QCompleter(matches, window)
+    completer.setWidget(line_edit)
+    completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+    found = {}
+
+    def showMatches(text, saved=()):
+        found.clear()
+        for key in students.findText(text, SEARCH_RESULTS, saved) if text.strip() else ():
+            found[f"{students.get(key)['name']} ({key})"] = key
+        matches.setStringList(list(found))
+        if found:
+            completer.complete()
+        else:
+            completer.popup().hide()
+
+    def savedFound(text, keys):
+        # An answer for text the user has typed past is dropped
+        if line_edit.text() == text:
+            showMatches(text, keys)
+
+    def textEdited(text):
+        showMatches(text)
+        if text.strip() and students.search is not None:
+            students.search(text.strip(), SEARCH_RESULTS, lambda keys: savedFound(text, keys))
+
+    line_edit.textEdited.connect(textEdited)
+    completer.activated[str].connect(lambda text: picked(found[text]))
+    return completer
+
+
+def showError(text):
+    message = QMessageBox()
+    message.setWindowTitle("Error")
+    message.setText(text)
+    message.exec()
+
+
+def raiseWindow(window):
+    # Child windows are built once and shown again, possibly from behind other windows
+    window.show()
+    window.raise_()
+    window.activateWindow()
+
+
+def startTableSave(repository, stores, followers=(), journal=None):
+    # Save a snapshot of the tracked changes in the background so editing can continue,
+    # stores are given parent table first, followers only take the versions a cascade gives their rows
+    pending = [(store, store.tracker.detach()) for store in stores]
+    # Changes made while saving are journaled apart, the ones saved are dropped from the journal once committed
+    mark = journal.rotate() if journal is not None else None
+    changes = [TableChanges(store.table_name, store.key, store.frame(tracked.upserts()), tracked.deleted,
+                            tracked.renamed, tracked.inserted,
+                            {key: store.row_versions.get(key) for key in tracked.updated | tracked.deleted},
+                            tracked.restored)
+               for store, tracked in pending]
+    task = DatabaseTask(repository.saveChanges, Communicate(), changes)
+    task.communicate.taskFinished.connect(lambda result: finishTableSave(pending, followers, result, journal, mark))
+    # Changes that did not commit are tracked again for the next save
+    restore = lambda: [store.tracker.restore(tracked) for store, tracked in pending]
+    task.communicate.taskFailed.connect(lambda error: restore())
+    task.communicate.taskCancelled.connect(restore)
+    for store, tracked in pending:
+        store.beginSave()
+        for signal in (task.communicate.taskFinished, task.communicate.taskFailed, task.communicate.taskCancelled):
+            signal.connect(lambda *args, store=store: store.endSave())
+    return task.start()
+
+def finishTableSave(pending, followers, result, journal=None, mark=None):
+    # A committed save hands back the new versions of the rows it wrote. Rows that conflicted, and the rows
+    # depending on them, were left out and are tracked again
+    for store in [store for store, tracked in pending] + list(followers):
+        store.row_versions.update(result.versions.get(store.table_name, {}))
+        # A child someone else wrote since it was read keeps its old version, so editing it still conflicts
+        for key, version in result.cascaded.get(store.table_name, {}).items():
+            if store.row_versions.get(key) == version - 1:
+                store.row_versions[key] = version
+    for store, tracked in pending:
+        conflicts = [conflict for conflict in result.conflicts if conflict.table_name == store.table_name]
+        for conflict in conflicts:
+            conflict.known = conflict.key in store.conflicts
+        store.tracker.settle(tracked, result.moved.get(store.table_name), result.left_out.get(store.table_name))
+        store.setConflicts(conflicts)
+        if journal is not None and store.table_name in result.left_out:
+            journal.keep(store)
+    if journal is not None:
+        journal.release([store.table_name for store, tracked in pending], mark)
+
+def showConflicts(window, conflicts, shown=20):
+    # List the rows a save left out, each one is settled from its edit window
+    lines = [conflict.describe() for conflict in conflicts[:shown]]
+    if len(conflicts) > shown:
+        lines.append(f"... and {len(conflicts) - shown} more")
+    text = ("These rows were not saved, they were written by someone else since they were loaded:\n"
+            + "\n".join(lines) + "\n\nOpen them in the edit window to keep your version or take theirs. "
+            "Rows you deleted that were changed are shown again.")
+    message = QMessageBox(window)
+    message.setWindowTitle("Save Conflict")
+    message.setText(text)
+    message.exec()
+
+def resolveConflict(window, store, key):
+    # Ask whether the next save overwrites the database row or the unsaved change is dropped,
+    # returns True when the local change is kept
+    conflict = store.conflictFor(key)
+    message = QMessageBox(window)
+    message.setWindowTitle("Conflict")
+    message.setText(f"{conflict.key} was {conflict.reason} since you loaded it.")
+    if conflict.row is not None:
+        message.setInformativeText("Saved version: " + ", ".join(f"{column}: {value}"
+                                                                 for column, value in conflict.row.items()))
+    keep = message.addButton("Keep Mine", QMessageBox.AcceptRole)
+    message.addButton("Take Theirs", QMessageBox.RejectRole)
+    message.exec()
+    if message.clickedButton() is keep:
+        store.keepMine(key)
+        return True
+    store.takeTheirs(key)
+    return False
+
+def startTransfer(window, function, store, report, *args):
+    # Run an import or export in the background and report the outcome when it ends
+    task = DatabaseTask(function, Communicate(), *args)
+    # Imported rows are already in the database, so they are not tracked as changes
+    task.communicate.taskPartial.connect(store.extend)
+    task.communicate.taskProgress.connect(
+        lambda done, total: window.statusBar().showMessage(f"{report.table_name}: {done} rows processed"))
+    task.communicate.taskFinished.connect(lambda result: showTransferReport(window, report))
+    task.communicate.taskFailed.connect(lambda error: showTransferReport(window, report, error))
+    task.communicate.taskCancelled.connect(lambda: showTransferReport(window, report, "Cancelled"))
+    return task.start()
+
+def showTransferReport(window, report, error=None):
+    # Show rows per second and where the rejected rows were written
+    report.finish()
+    text = report.summary()
+    rejected_path = report.writeRejected()
+    if rejected_path:
+        text += f"\nRejected rows written to {rejected_path}"
+    if error:
+        text += f"\nStopped early: {error}"
+    window.statusBar().showMessage(report.summary(), 5000)
+    message = QMessageBox()
+    message.setWindowTitle("Transfer")
+    message.setText(text)
+    message.exec()
+
+mainForm = loadForm("mainWindow.ui")
+
+class mainWindow(QMainWindow, mainForm):
+    """Main window"""
+
+    def __init__(self, repository=None):
+        # Load Main Window UI
+        super(mainWindow, self).__init__()
+        self.setupUi(self)
+        self.show()
+
+        # Trigger event for buttons in main window
+        self.addButton.clicked.connect(self.addClicked)
+        self.deleteButton.clicked.connect(self.deleteClicked)
+        self.editButton.clicked.connect(self.editClicked)
+        self.saveButton.clicked.connect(self.saveClicked)
+        self.courseViewButton.clicked.connect(self.courseViewClicked)
+        self.statsButton.clicked.connect(self.statsClicked)
+        self.importButton.clicked.connect(self.importClicked)
+        self.exportButton.clicked.connect(self.exportClicked)
+
+        # Child windows, each is built on its first open and reused after that
+        self.courseWindow = None
+        self.statsWindow = None
+        self.diagnosticsWindow = None
+        self.addWindow = None
+        self.deleteWindow = None
+        self.editWindow = None
+
+        # Shared data access layer for every window, the benchmark passes an in-process one
+        self.repository = repository or Repository()
+
+        # In-memory tables, every window pushes its changes into these
+        self.students = TableStore("students", STUDENT_COLUMNS, "id_number", ChangeTracker(), indexed=("course",),
+                                   schema=STUDENT_SCHEMA, searchable=("name", "id_number"))
+        self.courses = TableStore("courses", COURSE_COLUMNS, "course_code", ChangeTracker())
+        # Unique keys, required values and course references are checked before a change is made
+        self.constraints = Constraints({store.table_name: store for store in (self.courses, self.students)})
+        # One model of the course table for the course view and every course combo box, it follows the
+        # store's changes row by row instead of the combo boxes being refilled
+        self.courseList = StoreModel(self.courses, ["Course Code", "Course Description"])
+
+        # Students are paged in from the database as the view scrolls, filtered and sorted on the server
+        self.pager = StudentPager(self.repository, self.students, self.courses)
+        self.pager.communicate.taskFinished.connect(self.pageLoadedSlot)
+        self.pager.communicate.taskFailed.connect(self.pageFailedSlot)
+
+        # Rows other clients write are patched into the stores as the changelog reports them
+        self.feed = ChangeFeed(self.repository, self.students, self.courses, self.pager)
+        self.feed.communicate.taskFinished.connect(self.feedSlot)
+        self.feed.communicate.taskFailed.connect(self.feedFailedSlot)
+
+        # Enrollment counts are read once from the database and then follow every change
+        self.stats = EnrollmentStats(self.repository, self.students, self.courses)
+
+        # Student and course changes can be undone from any window, the history keeps the changed values only
+        self.history = History({store.table_name: store for store in (self.courses, self.students)})
+        self.undoAction = QAction("Undo", self)
+        self.undoAction.setShortcut(QKeySequence.Undo)
+        self.undoAction.triggered.connect(self.undoClicked)
+        self.redoAction = QAction("Redo", self)
+        self.redoAction.setShortcut(QKeySequence.Redo)
+        self.redoAction.triggered.connect(self.redoClicked)
+        for action in (self.undoAction, self.redoAction):
+            # A focused text box still undoes its own typing first
+            action.setShortcutContext(Qt.ApplicationShortcut)
+            self.addAction(action)
+        self.history.communicate.historyChanged.connect(self.historyChangedSlot)
+        self.historyChangedSlot()
+
+        # Every change is journaled on disk as it is made and saved in the background a few seconds later,
+        # what a crash leaves unsaved is applied again on the next start
+        try:
+            self.journal = Journal.forBackend(self.repository.backend)
+        except OSError as e:
+            self.journal = None
+            # Kept in view, unsaved changes of this window are lost if it crashes
+            warning = QLabel("Changes are not journaled")
+            warning.setToolTip(str(e))
+            self.statusBar().addPermanentWidget(warning)
+        self.autosaveTimer = QTimer(self)
+        self.autosaveTimer.setInterval(AUTOSAVE_MS)
+        self.autosaveTimer.timeout.connect(self.autosave)
+        if self.journal is not None:
+            self.journal.attach(self.courses)
+            self.journal.attach(self.students)
+            self.autosaveTimer.start()
+
+        # Table view only renders the rows that are visible
+        self.model = PagedStoreModel(self.students, ["Name", "ID Number", "Course", "Year", "Sex", "Enrollment Status"],
+                                     self.pager)
+        self.textOutput.setModel(self.model)
+        self.textOutput.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.textOutput.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        timePaints(self.textOutput, "students table")
+
+        # Rows are selected whole, the table's context menu applies one change to every selected row
+        self.textOutput.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.textOutput.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.textOutput.setContextMenuPolicy(Qt.ActionsContextMenu)
+        self.batchActions = []
+        for text, slot in (("Delete Selected", self.deleteSelectedClicked),
+                           ("Change Course of Selected...", self.changeCourseClicked),
+                           ("Promote Selected to Next Year", self.promoteClicked)):
+            action = QAction(text, self.textOutput)
+            action.triggered.connect(slot)
+            self.textOutput.addAction(action)
+            self.batchActions.append(action)
+        # The Delete key only deletes rows while the table has the focus
+        self.batchActions[0].setShortcut(QKeySequence.Delete)
+        self.batchActions[0].setShortcutContext(Qt.WidgetShortcut)
+        # Undo and redo are listed below them
+        separator = QAction(self.textOutput)
+        separator.setSeparator(True)
+        self.textOutput.addActions([separator, self.undoAction, self.redoAction])
+
+        # Timing spans and the profiler, opened with Ctrl+Shift+D when a session is slow
+        diagnosticsAction = QAction("Diagnostics", self)
+        diagnosticsAction.setShortcut(QKeySequence("Ctrl+Shift+D"))
+        diagnosticsAction.triggered.connect(self.diagnosticsClicked)
+        self.addAction(diagnosticsAction)
+
+        # The course filter shows the shared course model, it keeps the chosen course as courses change
+        self.courseFilter.setModel(ChoiceModel(self.courseList, "All Courses", self))
+        self.courseFilter.model().dataChanged.connect(self.courseRenamedSlot)
+        self.courseFilter.model().rowsAboutToBeRemoved.connect(self.courseRemovedSlot)
+        # Filter bar, typing in the name box waits for a pause before querying
+        self.filterTimer = QTimer(self)
+        self.filterTimer.setSingleShot(True)
+        self.filterTimer.setInterval(300)
+        self.filterTimer.timeout.connect(self.filterChanged)
+        self.nameFilter.textChanged.connect(lambda text: self.filterTimer.start())
+        for combo in (self.courseFilter, self.yearFilter, self.sexFilter, self.statusFilter):
+            combo.currentIndexChanged.connect(self.filterChanged)
+
+        self.saveTask = None
+        self.transferTask = None
+        # Server databases are mirrored to a local snapshot when the window closes
+        self.cache = SnapshotCache.forBackend(self.repository.backend)
+        # Server time the loaded courses are at least as new as
+        self.courses_synced_at = None
+        self.textOutput.horizontalHeader().setSortIndicator(STUDENT_COLUMNS.index("id_number"), Qt.AscendingOrder)
+        self.loadTables()
+
+    def loadTables(self):
+        # A snapshot from the last run shows at once, the server is then only asked for what changed since.
+        # Unsaved changes left in the journal are replayed onto rows read fresh instead
+        recovering = self.journal is not None and self.journal.hasRecords()
+        snapshot = self.cache.load() if self.cache is not None and not recovering else None
+        if snapshot is not None:
+            self.restoreSnapshot(*snapshot)
+            return
+        # Courses are small and loaded whole on the thread pool, editing waits until they arrive
+        self.setEditingEnabled(False)
+        if self.cache is not None and self.cache.ignored:
+            self.statusBar().showMessage(f"Loading courses, the last snapshot was not used: {self.cache.ignored}")
+        else:
+            self.statusBar().showMessage("Loading courses...")
+        self.loadTask = DatabaseTask(self.readCourses, Communicate())
+        self.loadTask.communicate.taskFinished.connect(self.tablesLoadedSlot)
+        self.loadTask.communicate.taskFailed.connect(self.tablesLoadFailedSlot)
+        self.loadTask.start()
+
+    def readCourses(self, progress, cancelled):
+        # Runs on the thread pool, an embedded database gets its tables on first start.
+        # The changelog position is read first so the feed covers every write after the rows
+        self.repository.ensureSchema()
+        seq = self.repository.latestChange()
+        courses = self.repository.fetchCourses()
+        # Students the journaled changes touch are read along, the changes are replayed onto them
+        records = self.journal.records() if self.journal is not None else []
+        keys = {key for record in records if record['table'] == "students"
+                for key in (record['key'], (record['row'] or {}).get('id_number')) if key is not None}
+        students = self.repository.fetchStudentsByKey(keys) if keys else None
+        return courses, self.repository.serverTime(SYNC_OVERLAP), seq, records, students
+
+    def tablesLoadedSlot(self, result):
+        if result is not None:
+            courses, self.courses_synced_at, seq, records, students = result
+            self.courses.load(courses)
+            if records:
+                self.recoverChanges(records, students)
+            self.feed.start(seq)
+            self.stats.refresh()
+        # Enabling sorting queries the first page in id_number order, once the schema is known to exist
+        self.textOutput.setSortingEnabled(True)
+        self.setEditingEnabled(True)
+        # A recovery shows its own message instead
+        if self.journal is None or not self.journal.recovered:
+            self.statusBar().showMessage(f"Loaded {len(self.courses)} courses", 5000)
+        # Recovered changes are saved right away
+        self.autosave()
+
+    def recoverChanges(self, records, students):
+        # Changes the last session journaled but never saved become unsaved changes of this one
+        if students is not None:
+            self.students.extend(students)
+        self.journal.replay(records, {store.table_name: store for store in (self.courses, self.students)})
+        # The last session's actions are not this one's to undo
+        self.history.clear()
+        cut = f", the end of {len(self.journal.cut)} journal files was cut off" if self.journal.cut else ""
+        self.statusBar().showMessage(f"Recovered {len(records)} unsaved changes from the journal{cut}")
+
+    def tablesLoadFailedSlot(self, error):
+        # Editing still works, only the course choices are missing
+        self.tablesLoadedSlot(None)
+        self.statusBar().showMessage(f"Error loading tables: {error}")
+
+    def restoreSnapshot(self, courses, students, state):
+        # Show the snapshot's rows right away and sync the changes made on the server since in the background
+        self.courses.load(courses)
+        self.courses_synced_at = state['synced_at']
+        self.students.load(students)
+        after = tuple(state['after']) if state['after'] is not None else None
+        self.pager.resume(stateQuery(state['query']), after, state['exhausted'], state['synced_at'])
+        self.stats.refresh()
+        self.showQuery(self.pager.query)
+        self.textOutput.setSortingEnabled(True)
+        self.setEditingEnabled(True)
+        self.statusBar().showMessage(f"Showing {len(self.students)} students from the last session, syncing...")
+        self.syncTask = DatabaseTask(fetchSnapshotChanges, Communicate(), self.repository, state, self.courses.keys(),
+                                     self.students.keys())
+        self.syncTask.communicate.taskFinished.connect(self.snapshotSyncedSlot)
+        self.syncTask.communicate.taskFailed.connect(self.snapshotSyncFailedSlot)
+        self.syncTask.start()
+
+    def snapshotSyncedSlot(self, changes):
+        self.courses.merge(changes['courses'], changes['removed_courses'])
+        self.courses_synced_at = changes['synced_at']
+        self.feed.start(changes['seq'])
+        # A listing started over since then already has fresh rows
+        if self.pager.resumed:
+            self.students.merge(self.pager.applyCourseChanges(changes['students']), changes['removed_students'])
+            self.pager.synced_at = changes['synced_at']
+        self.statusBar().showMessage(f"Synced {len(changes['students'])} changed students", 5000)
+
+    def snapshotSyncFailedSlot(self, error):
+        self.statusBar().showMessage(f"Showing the last session's students, sync failed: {error}")
+
+    def saveSnapshot(self):
+        # A session with unsaved changes keeps the older snapshot, its rows would not match the database
+        if self.cache is None or self.courses_synced_at is None or self.pager.synced_at is None:
+            return
+        if self.saveTask is not None or self.students.tracker.hasChanges() or self.courses.tracker.hasChanges():
+            return
+        state = {
+            'synced_at': min(self.courses_synced_at, self.pager.synced_at),
+            'query': queryState(self.pager.query),
+            'after': self.pager.after,
+            'exhausted': self.pager.exhausted,
+        }
+        try:
+            self.cache.save(self.courses.versionedSnapshot(), self.students.versionedSnapshot(), state)
+        except (OSError, ValueError, ImportError) as e:
+            self.statusBar().showMessage(f"Could not save the snapshot: {e}")
+
+    def closeEvent(self, event):
+        self.feed.stop()
+        self.saveSnapshot()
+        # Changes not saved yet stay in the journal for the next start
+        if self.journal is not None:
+            self.journal.close()
+        super(mainWindow, self).closeEvent(event)
+
+    def showQuery(self, query):
+        # Put a restored listing's filters and order back in the filter bar without querying again
+        widgets = (self.nameFilter, self.courseFilter, self.yearFilter, self.sexFilter, self.statusFilter)
+        for widget in widgets:
+            widget.blockSignals(True)
+        self.nameFilter.setText(query.name_prefix)
+        for combo, column in ((self.courseFilter, 'course'), (self.yearFilter, 'year'), (self.sexFilter, 'sex'),
+                              (self.statusFilter, 'status')):
+            value = query.filters.get(column)
+            combo.setCurrentIndex(max(combo.findText(str(value)), 0) if value is not None else 0)
+        for widget in widgets:
+            widget.blockSignals(False)
+        order = Qt.DescendingOrder if query.descending else Qt.AscendingOrder
+        self.textOutput.horizontalHeader().setSortIndicator(STUDENT_COLUMNS.index(query.sort_column), order)
+
+    def filterChanged(self):
+        # Any filter change starts the listing over from the first page
+        self.filterTimer.stop()
+        filters = {}
+        if self.courseFilter.currentIndex() > 0:
+            filters['course'] = self.courseFilter.currentText()
+        if self.yearFilter.currentIndex() > 0:
+            filters['year'] = int(self.yearFilter.currentText())
+        if self.sexFilter.currentIndex() > 0:
+            filters['sex'] = self.sexFilter.currentText()
+        if self.statusFilter.currentIndex() > 0:
+            filters['status'] = self.statusFilter.currentText()
+        query = self.pager.query
+        self.pager.setQuery(StudentQuery(self.nameFilter.text().strip(), filters, query.sort_column, query.descending))
+
+    def courseRemovedSlot(self, parent, first, last):
+        # The listing of a course that is gone goes back to every course, the combo box signals the change
+        # once the row is removed
+        if first <= self.courseFilter.currentIndex() <= last:
+            self.courseFilter.blockSignals(True)
+            self.courseFilter.setCurrentIndex(0)
+            self.courseFilter.blockSignals(False)
+
+    def courseRenamedSlot(self, *args):
+        # A renamed course stays chosen, the listing is queried again under its new code
+        if self.courseFilter.currentIndex() > 0 \
+                and self.courseFilter.currentText() != self.pager.query.filters.get('course'):
+            self.filterChanged()
+
+    def pageLoadedSlot(self, count):
+        more = ", scroll for more" if self.pager.canFetchMore() else ""
+        self.statusBar().showMessage(f"Showing {count} students{more}")
+
+    def pageFailedSlot(self, error):
+        self.statusBar().showMessage(f"Error loading students: {error}")
+
+    def feedSlot(self, count):
+        self.statusBar().showMessage(f"{count} rows changed in the database", 5000)
+        # Rows other clients wrote reach the counts through the database, read again while they are shown
+        self.stats.stale = True
+        if self.statsWindow is not None and self.statsWindow.isVisible():
+            self.stats.refresh()
+
+    def feedFailedSlot(self, error):
+        self.statusBar().showMessage(f"Error reading changes: {error}")
+
+    def setEditingEnabled(self, enabled):
+        # Edits made before every row has arrived could collide with rows still loading
+        for button in (self.addButton, self.deleteButton, self.editButton, self.saveButton, self.courseViewButton,
+                       self.importButton, self.exportButton):
+            button.setEnabled(enabled)
+        for action in self.batchActions:
+            action.setEnabled(enabled)
+
+    def historyChangedSlot(self):
+        self.undoAction.setEnabled(self.history.canUndo())
+        self.redoAction.setEnabled(self.history.canRedo())
+
+    def undoClicked(self):
+        #Put back the rows the last action changed, saved with the next save like any edit
+        changed = self.history.undo()
+        self.statusBar().showMessage(f"Undid changes to {changed} rows" if changed else "Nothing to undo", 5000)
+
+    def redoClicked(self):
+        #Make the last undone action again
+        changed = self.history.redo()
+        self.statusBar().showMessage(f"Redid changes to {changed} rows" if changed else "Nothing to redo", 5000)
+
+    def saveDataframe(self):
+        if not (self.students.tracker.hasChanges() or self.courses.tracker.hasChanges()):
+            self.statusBar().showMessage("No changes to save", 5000)
+            return
+        # The database would refuse the whole save over one of these
+        orphans = self.constraints.orphans(self.students)
+        if orphans:
+            showError(f"Nothing was saved, these students are in a course that no longer exists: "
+                      f"{', '.join(orphans[:20])}\n\nChoose another course for them and save again.")
+            return
+        # Unsaved courses go in the same transaction since students may reference them
+        self.saveTask = startTableSave(self.repository, [self.courses, self.students], journal=self.journal)
+        self.saveTask.communicate.taskProgress.connect(self.saveProgressSlot)
+        self.saveTask.communicate.taskFinished.connect(self.saveFinishedSlot)
+        self.saveTask.communicate.taskFailed.connect(lambda error: self.saveDoneSlot(f"Error saving students: {error}"))
+        self.saveTask.communicate.taskCancelled.connect(lambda: self.saveDoneSlot("Save cancelled"))
+        # Save button cancels the save while it is running
+        self.saveButton.setText("Cancel Save")
+
+    def autosave(self):
+        # Save the journaled changes in the background, not over a running save or rows still loading.
+        # Rows in conflict are left out by every save until the user settles them
+        stores = (self.courses, self.students)
+        if not self.saveButton.isEnabled() or any(store.saving for store in stores):
+            return
+        if any(store.tracker.hasChanges() for store in stores):
+            orphans = self.constraints.orphans(self.students)
+            if orphans:
+                self.statusBar().showMessage(f"Not saved, {len(orphans)} students are in a deleted course", 5000)
+                return
+            self.saveDataframe()
+
+    def saveProgressSlot(self, done, total):
+        self.statusBar().showMessage(f"Saving students: {done}/{total}")
+
+    def saveFinishedSlot(self, result):
+        # Conflicts an earlier save reported are left out again without asking
+        fresh = [conflict for conflict in result.conflicts if not conflict.known]
+        if fresh:
+            showConflicts(self, fresh)
+        if result.conflicts:
+            self.saveDoneSlot(f"Students saved, {len(result.conflicts)} conflicting rows left out")
+        else:
+            self.saveDoneSlot("Students saved")
+
+    def saveDoneSlot(self, message):
+        self.saveTask = None
+        self.saveButton.setText("Save")
+        self.statusBar().showMessage(message, 5000)
+
+    def courseViewClicked(self):
+        #Open course window
+        if self.courseWindow is None:
+            self.courseWindow = courseWindow(self.students, self.courses, self.repository, self.courseList,
+                                             self.constraints, self.journal)
+        raiseWindow(self.courseWindow)
+
+    def statsClicked(self):
+        #Open enrollment statistics window
+        if self.statsWindow is None:
+            self.statsWindow = statsWindow(self.stats)
+        self.statsWindow.reset()
+        raiseWindow(self.statsWindow)
+
+    def diagnosticsClicked(self):
+        #Open diagnostics window
+        if self.diagnosticsWindow is None:
+            self.diagnosticsWindow = diagnosticsWindow()
+        raiseWindow(self.diagnosticsWindow)
+
+    def addClicked(self):
+        #Opens add window
+        if self.addWindow is None:
+            self.addWindow = addWindow(self.students, self.courseList, self.constraints)
+        self.addWindow.reset()
+        raiseWindow(self.addWindow)
+
+    def deleteClicked(self):
+        #Opens delete window
+        if self.deleteWindow is None:
+            self.deleteWindow = deleteWindow(self.students)
+        self.deleteWindow.reset()
+        raiseWindow(self.deleteWindow)
+
+    def editClicked(self):
+        #Opens edit window
+        if self.editWindow is None:
+            self.editWindow = editWindow(self.students, self.courseList, self.constraints)
+        self.editWindow.reset()
+        raiseWindow(self.editWindow)
+
+    def selectedPositions(self):
+        #Store positions of the selected rows, read from the selected ranges rather than index by index
+        rows = set()
+        for selected in self.textOutput.selectionModel().selection():
+            rows.update(range(selected.top(), selected.bottom() + 1))
+        return [self.model.positionAt(row) for row in sorted(rows)]
+
+    def selectedKeys(self):
+        return [self.students.value(position, "id_number") for position in self.selectedPositions()]
+
+    def deleteSelectedClicked(self):
+        #Delete every selected student in one change, saved together with the next save
+        keys = self.selectedKeys()
+        if not keys:
+            return
+        reply = QMessageBox.question(self, 'Confirmation', f"Are you sure you want to delete {len(keys)} students?",
+                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply == QMessageBox.Yes:
+            self.students.deleteMany(keys)
+            self.statusBar().showMessage(f"Deleted {len(keys)} students", 5000)
+
+    def changeCourseClicked(self):
+        #Move every selected student to one course
+        keys = self.selectedKeys()
+        if not keys:
+            return
+        course, chosen = QInputDialog.getItem(self, "Change Course", f"Course for {len(keys)} students:",
+                                              self.courses.values("course_code"), 0, False)
+        if chosen:
+            self.students.updateMany(keys, {'course': course, 'status': "No" if course == "No Course" else "Yes"})
+            self.statusBar().showMessage(f"Moved {len(keys)} students to {course}", 5000)
+
+    def promoteClicked(self):
+        #Move every selected student up a year, one change per year they are in, the last year stays
+        by_year = {}
+        for position in self.selectedPositions():
+            by_year.setdefault(self.students.value(position, "year"), []).append(
+                self.students.value(position, "id_number"))
+        if not by_year:
+            return
+        promoted = 0
+        for year in sorted(by_year, reverse=True):
+            if year < YEARS[-1]:
+                self.students.updateMany(by_year[year], {'year': year + 1})
+                promoted += len(by_year[year])
+        staying = len(by_year.get(YEARS[-1], ()))
+        self.statusBar().showMessage(f"Promoted {promoted} students, {staying} already in the last year", 5000)
+
+    def saveClicked(self):
+        #Save changes in current dataframe to database, or cancel the running save
+        if self.saveTask is not None:
+            self.saveTask.cancel()
+        else:
+            self.saveDataframe()
+
+    def importClicked(self):
+        #Import students from a CSV or Excel file straight into the database
+        path, _ = QFileDialog.getOpenFileName(self, "Import Students", "", "Data files (*.csv *.xlsx *.xls)")
+        if not path:
+            return
+        # Unsaved deletes are still in the database and unsaved courses are not yet
+        existing_ids = set(self.students.keys()) | self.students.tracker.deleted
+        course_codes = (set(self.courses.keys()) - self.courses.tracker.inserted) | {"No Course"}
+        report = TransferReport("students", path)
+        self.transferTask = startTransfer(self, importStudents, self.students, report,
+                                          self.repository, path, existing_ids, course_codes, report)
+
+    def exportClicked(self):
+        #Export the saved students to CSV or Parquet
+        path, _ = QFileDialog.getSaveFileName(self, "Export Students", "students.csv", "CSV (*.csv);;Parquet (*.parquet)")
+        if not path:
+            return
+        report = TransferReport("students", path)
+        self.transferTask = startTransfer(self, exportTable, self.students, report,
+                                          self.repository, "students", STUDENT_COLUMNS, STUDENT_DTYPES, path, report)
+
+addForm = loadForm("addWindow.ui")
+
+class addWindow(QMainWindow, addForm):
+    """Add Student Window"""
+
+    def __init__(self, students, course_list, constraints):
+        #Load Add Window UI
+        super(addWindow, self).__init__()
+        self.setupUi(self)
+
+        #The course drop down shows the shared course model, it stays current without refilling
+        showCourseList(self.courseInput, course_list)
+
+        #Button trigger event for add window
+        self.submitButton.clicked.connect(self.submitClicked)
+
+        #Store student table and its rules to local class
+        self.students = students
+        self.constraints = constraints
+
+    def reset(self):
+        #Every open starts from empty inputs
+        self.nameInput.clear()
+        self.idNumberInput.clear()
+        self.courseInput.setCurrentIndex(max(self.courseInput.findText("No Course"), 0))
+        self.yearInput.setCurrentIndex(0)
+        self.sexInput.setCurrentIndex(0)
+
+    def submitClicked(self):
+        # Logic to add new student to the student table
+        course = self.courseInput.currentText()
+        if course == "No Course":
+            status = "No"
+        else:
+            status = "Yes"
+        record = {"name": self.nameInput.text().strip(), "id_number": self.idNumberInput.text().strip(),
+                  "course": course, "year": int(self.yearInput.currentText()), "sex": self.sexInput.currentText(),
+                  "status": status}
+        # A saved student with the ID number that is not paged in yet is looked up first
+        self.students.fetch([record["id_number"]], lambda: self.addChecked(record))
+
+    def addChecked(self, record):
+        # Blank or duplicate ID numbers and unknown courses are refused before the row is added
+        error = self.constraints.checkRow(self.students, record)
+        if error:
+            showError(error)
+        else:
+            self.students.add(record)
+
+            # Close window
+            self.close()
+
+deleteForm = loadForm("deleteWindow.ui")
+
+class deleteWindow(QMainWindow, deleteForm):
+    """Delete Student Window"""
+
+    def __init__(self, students):
+        #Initialize Student Window UI
+        super(deleteWindow, self).__init__()
+        self.setupUi(self)
+
+        #Button trigger event for delete window
+        self.submitButton.clicked.connect(self.submitClicked)
+
+        #Store student table to local class
+        self.students = students
+        #Typing part of a name or ID number lists the matching students
+        self.completer = studentSearch(self, self.deleteInput, students, self.studentPicked)
+
+    def reset(self):
+        self.deleteInput.clear()
+
+    def studentPicked(self, key):
+        #A picked match goes straight to the delete confirmation
+        self.deleteInput.setText(key)
+        self.submitClicked()
+
+    def submitClicked(self):
+        # A student that is not paged in yet is looked up first
+        key = self.deleteInput.text()
+        self.students.fetch([key], lambda: self.confirmDelete(key))
+
+    def confirmDelete(self, student_to_delete):
+        # Logic to delete chosen student from the student table
+        if not self.students.isLoaded(student_to_delete):
+            message = QMessageBox()
+            message.setWindowTitle("Error")
+            message.setText("Student not found")
+            message.exec()
+            return
+
+        # Confirmation dialog for deleting a student
+        reply = QMessageBox.question(self, 'Confirmation', f"Are you sure you want to delete {student_to_delete}?", QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply == QMessageBox.Yes:
+            # Proceed with deletion if yes and close window
+            self.students.delete(student_to_delete)
+            self.close()
+        else:
+            # Cancel deletion if not confirmed
+            return
+
+editForm = loadForm("editWindow.ui")
+
+class editWindow(QMainWindow, editForm):
+    """Edit Student Window"""
+
+    def __init__(self, students, course_list, constraints):
+        #Initialize Student Window UI
+        super(editWindow, self).__init__()
+        self.setupUi(self)
+
+        # The course drop down shows the shared course model
+        showCourseList(self.courseInput, course_list)
+
+        #Button trigger event for edit window
+        self.submitButton.clicked.connect(self.submitClicked)
+        self.editSubmitButton.clicked.connect(self.editSubmitClicked)
+
+        #Store student table and its rules to local class
+        self.students = students
+        self.constraints = constraints
+
+        #Initialize the ID number of the student being edited
+        self.student_to_edit = None
+
+        #Typing part of a name or ID number lists the matching students
+        self.completer = studentSearch(self, self.editInput, students, self.studentPicked)
+
+    def reset(self):
+        #Every open starts with no student chosen
+        self.student_to_edit = None
+        self.editSubmitButton.setEnabled(False)
+        for line_edit in (self.editInput, self.nameInput, self.idNumberInput):
+            line_edit.clear()
+        for combo in (self.courseInput, self.yearInput, self.sexInput, self.enrolledInput):
+            combo.setCurrentIndex(0)
+
+    def studentPicked(self, key):
+        #A picked match is loaded into the form right away
+        self.editInput.setText(key)
+        self.submitClicked()
+
+    def submitClicked(self):
+        # A student that is not paged in yet is looked up first
+        key = self.editInput.text()
+        self.students.fetch([key], lambda: self.showStudent(key))
+
+    def showStudent(self, key):
+        # Logic to output current values of a given student
+        # A row the last save stopped on is settled before it is edited again
+        if self.students.conflictFor(key) is not None:
+            resolveConflict(self, self.students, key)
+        student = self.students.get(key)
+        if student is not None:
+            #Set disabled submit button to true if student is found
+            self.editSubmitButton.setEnabled(True)
+            self.student_to_edit = student["id_number"]
+            self.nameInput.setText(str(student["name"]))
+            self.idNumberInput.setText(str(student["id_number"]))
+            self.courseInput.setCurrentText(str(student["course"]))
+            self.yearInput.setCurrentText(str(student["year"]))
+            self.sexInput.setCurrentText(str(student["sex"]))
+            self.enrolledInput.setCurrentText(str(student["status"]))
+        else:
+            #Set submit button to false if student is not found
+            self.editSubmitButton.setEnabled(False)
+            #Show error
+            message = QMessageBox()
+            message.setWindowTitle("Error")
+            message.setText("Student not found")
+            message.exec()
+
+    def editSubmitClicked(self):
+        # Logic to edit the values of a given student
+        course = self.courseInput.currentText()
+        if course == "No Course":
+            status = "No"
+        else:
+            status = "Yes"
+        record = {"name": self.nameInput.text().strip(), "id_number": self.idNumberInput.text().strip(),
+                  "course": course, "year": int(self.yearInput.currentText()), "sex": self.sexInput.currentText(),
+                  "status": status}
+        # A saved student with the new ID number that is not paged in yet is looked up first
+        key = self.student_to_edit
+        self.students.fetch([record["id_number"]], lambda: self.editChecked(key, record))
+
+    def editChecked(self, key, record):
+        # The current row keeping its own ID number is not a duplicate
+        error = self.constraints.checkRow(self.students, record, key)
+        if error:
+            showError(error)
+        elif self.students.isLoaded(key):
+            # Update student table with edited values and close window
+            self.students.update(key, record)
+            self.close()
+
+courseForm = loadForm("courseWindow.ui")
+
+class courseWindow(QMainWindow, courseForm):
+    """Course View Window"""
+    def __init__(self, students, courses, repository, course_list, constraints, journal=None):
+        #Initialize Course Window UI
+        super(courseWindow, self).__init__()
+        self.setupUi(self)
+
+        #Button trigger events
+        self.addButton.clicked.connect(self.addClicked)
+        self.deleteButton.clicked.connect(self.deleteClicked)
+        self.editButton.clicked.connect(self.editClicked)
+        self.saveButton.clicked.connect(self.saveClicked)
+        self.importButton.clicked.connect(self.importClicked)
+        self.exportButton.clicked.connect(self.exportClicked)
+        self.courses = courses
+        self.students = students
+        self.repository = repository
+        self.course_list = course_list
+        self.constraints = constraints
+        self.journal = journal
+        self.saveTask = None
+        self.transferTask = None
+
+        #Initialize child windows
+        self.courseAddWindow = None
+        self.courseDeleteWindow = None
+        self.courseEditWindow = None
+        #Table view only renders the rows that are visible, the model is shared with the course drop downs
+        self.model = course_list
+        self.textOutput.setModel(self.model)
+        self.textOutput.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        timePaints(self.textOutput, "courses table")
+
+    def saveCourseDataFrameToDB(self):
+        if not self.courses.tracker.hasChanges():
+            self.statusBar().showMessage("No changes to save", 5000)
+            return
+        # Students moved by a course rename or delete get new versions from the cascade
+        self.saveTask = startTableSave(self.repository, [self.courses], [self.students], self.journal)
+        self.saveTask.communicate.taskProgress.connect(self.saveProgressSlot)
+        self.saveTask.communicate.taskFinished.connect(self.saveFinishedSlot)
+        self.saveTask.communicate.taskFailed.connect(lambda error: self.saveDoneSlot(f"Error saving courses: {error}"))
+        self.saveTask.communicate.taskCancelled.connect(lambda: self.saveDoneSlot("Save cancelled"))
+        #Save button cancels the save while it is running
+        self.saveButton.setText("Cancel Save")
+
+    def saveProgressSlot(self, done, total):
+        self.statusBar().showMessage(f"Saving courses: {done}/{total}")
+
+    def saveFinishedSlot(self, result):
+        fresh = [conflict for conflict in result.conflicts if not conflict.known]
+        if fresh:
+            showConflicts(self, fresh)
+        if result.conflicts:
+            self.saveDoneSlot(f"Courses saved, {len(result.conflicts)} conflicting rows left out")
+        else:
+            self.saveDoneSlot("Courses saved")
+
+    def saveDoneSlot(self, message):
+        self.saveTask = None
+        self.saveButton.setText("Save")
+        self.statusBar().showMessage(message, 5000)
+
+    def addClicked(self):
+        #Opens Add Course Window
+        if self.courseAddWindow is None:
+            self.courseAddWindow = courseAddWindow(self.courses, self.constraints)
+        self.courseAddWindow.reset()
+        raiseWindow(self.courseAddWindow)
+
+    def deleteClicked(self):
+        #Opens Delete Course Window
+        if self.courseDeleteWindow is None:
+            self.courseDeleteWindow = courseDeleteWindow(self.courses, self.course_list, self.constraints)
+            #Update students that referenced the deleted course
+            self.courseDeleteWindow.communicate.deletedCourse.connect(self.handleCourseDeletion)
+        self.courseDeleteWindow.reset()
+        raiseWindow(self.courseDeleteWindow)
+
+    def editClicked(self):
+        #Opens Edit Course Window
+        if self.courseEditWindow is None:
+            self.courseEditWindow = courseEditWindow(self.students, self.courses, self.constraints)
+        self.courseEditWindow.reset()
+        raiseWindow(self.courseEditWindow)
+
+    def saveClicked(self):
+        #Save course table changes to database, or cancel the running save
+        if self.saveTask is not None:
+            self.saveTask.cancel()
+        else:
+            self.saveCourseDataFrameToDB()
+
+    def importClicked(self):
+        #Import courses from a CSV or Excel file straight into the database
+        path, _ = QFileDialog.getOpenFileName(self, "Import Courses", "", "Data files (*.csv *.xlsx *.xls)")
+        if not path:
+            return
+        existing_codes = set(self.courses.keys()) | self.courses.tracker.deleted
+        report = TransferReport("courses", path)
+        self.transferTask = startTransfer(self, importCourses, self.courses, report,
+                                          self.repository, path, existing_codes, report)
+
+    def exportClicked(self):
+        #Export the saved courses to CSV or Parquet
+        path, _ = QFileDialog.getSaveFileName(self, "Export Courses", "courses.csv", "CSV (*.csv);;Parquet (*.parquet)")
+        if not path:
+            return
+        report = TransferReport("courses", path)
+        self.transferTask = startTransfer(self, exportTable, self.courses, report,
+                                          self.repository, "courses", COURSE_COLUMNS, {}, path, report)
+
+    def handleCourseDeletion(self, deleted_course_code):
+        # Set the course field to "No Course" for all matching rows found through the course index,
+        # the course save clears them in the database with one UPDATE
+        self.students.updateMany(self.students.find('course', deleted_course_code),
+                                 {'course': "No Course", 'status': "No"}, track=False)
+
+statsForm = loadForm("statsWindow.ui")
+
+class statsWindow(QMainWindow, statsForm):
+    """Enrollment Statistics Window"""
+    def __init__(self, stats):
+        #Initialize Statistics Window UI
+        super(statsWindow, self).__init__()
+        self.setupUi(self)
+
+        self.stats = stats
+        #One count table per column
+        self.models = {}
+        for column, view, header in (('course', self.courseStats, "Course"), ('year', self.yearStats, "Year"),
+                                     ('sex', self.sexStats, "Sex"), ('status', self.statusStats, "Enrollment Status")):
+            self.models[column] = RowsModel([header, "Students"])
+            view.setModel(self.models[column])
+            view.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+
+        #A burst of changes, like a course cascade or a batch of deletes, redraws the tables once
+        self.updateTimer = QTimer(self)
+        self.updateTimer.setSingleShot(True)
+        self.updateTimer.timeout.connect(self.showCounts)
+        self.stats.communicate.statsChanged.connect(self.updateTimer.start)
+        self.stats.communicate.taskFailed.connect(self.countFailedSlot)
+        self.refreshButton.clicked.connect(self.refreshClicked)
+
+    def reset(self):
+        #Every open shows the counts kept so far and reads them again if they went stale
+        if self.stats.loaded:
+            self.showCounts()
+        if self.stats.stale or not self.stats.loaded:
+            self.refreshClicked()
+
+    def showCounts(self):
+        for column, model in self.models.items():
+            model.setRows(self.stats.counts(column))
+        self.totalLabel.setText(f"{self.stats.total()} students")
+
+    def refreshClicked(self):
+        #Count again in the database, deferred until unsaved changes are saved
+        self.stats.refresh()
+        if self.stats.task is None:
+            self.statusBar().showMessage("Counts are read again after the next save", 5000)
+
+    def countFailedSlot(self, error):
+        self.statusBar().showMessage(f"Error counting students: {error}")
+
+diagnosticsForm = loadForm("diagnosticsWindow.ui")
+
+class diagnosticsWindow(QMainWindow, diagnosticsForm):
+    """Diagnostics Window"""
+    def __init__(self):
+        #Initialize Diagnostics Window UI
+        super(diagnosticsWindow, self).__init__()
+        self.setupUi(self)
+
+        #One row per kind of span, the ones that took the most time in total first
+        self.model = RowsModel(["Span", "Count", "Total ms", "p50 ms", "p90 ms", "p99 ms", "Max ms"])
+        self.spanTable.setModel(self.model)
+        self.spanTable.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.spanTable.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+
+        #The table follows the session while the window is shown
+        self.refreshTimer = QTimer(self)
+        self.refreshTimer.setInterval(DIAGNOSTICS_REFRESH_MS)
+        self.refreshTimer.timeout.connect(self.showSpans)
+        self.refreshButton.clicked.connect(self.showSpans)
+        self.resetButton.clicked.connect(self.resetClicked)
+        self.profileButton.clicked.connect(self.profileClicked)
+
+    def showEvent(self, event):
+        self.showSpans()
+        self.showProfiler()
+        self.refreshTimer.start()
+        super(diagnosticsWindow, self).showEvent(event)
+
+    def hideEvent(self, event):
+        self.refreshTimer.stop()
+        super(diagnosticsWindow, self).hideEvent(event)
+
+    def showSpans(self):
+        self.model.setRows((name, span['count'], span['total_ms'], span['p50_ms'], span['p90_ms'], span['p99_ms'],
+                            span['max_ms']) for name, span in diagnostics.summary().items())
+
+    def showProfiler(self):
+        if diagnostics.profiling():
+            self.profileButton.setText("Stop Profile")
+            self.profileLabel.setText(f"Profiling to {diagnostics.profile_path}")
+        else:
+            self.profileButton.setText("Start Profile")
+            self.profileLabel.setText("Profiler off")
+
+    def resetClicked(self):
+        #Start the percentiles over, for timing one action on its own
+        diagnostics.reset()
+        self.showSpans()
+
+    def profileClicked(self):
+        #Profile the event loop until stopped, the file opens in pstats or snakeviz
+        if diagnostics.profiling():
+            path = diagnostics.stopProfile()
+            self.statusBar().showMessage(f"Profile written to {path}", 5000)
+        else:
+            path, _ = QFileDialog.getSaveFileName(self, "Save Profile", "student_manager.prof", "Profile (*.prof)")
+            if path:
+                diagnostics.startProfile(path)
+        self.showProfiler()
+
+courseAddForm = loadForm("courseAddWindow.ui")
+
+class courseAddWindow(QMainWindow, courseAddForm):
+    """Add Course Window"""
+    def __init__(self, courses, constraints):
+        #Initialize Add Course Window UI
+        super(courseAddWindow, self).__init__()
+        self.setupUi(self)
+
+        #Store course table and its rules to local class
+        self.courses = courses
+        self.constraints = constraints
+        #Button trigger event
+        self.submitButton.clicked.connect(self.submitClicked)
+
+    def reset(self):
+        self.courseCodeInput.clear()
+        self.courseDescriptInput.clear()
+
+    def submitClicked(self):
+        #Logic to add new course to course table
+        record = {"course_code": self.courseCodeInput.text().strip(),
+                  "course_description": self.courseDescriptInput.text()}
+        #Blank and duplicate course codes are refused
+        error = self.constraints.checkRow(self.courses, record)
+        if error:
+            showError(error)
+            return
+        self.courses.add(record)
+
+        #Close window
+        self.close()
+
+courseDeleteForm = loadForm("courseDeleteWindow.ui")
+
+class courseDeleteWindow(QMainWindow, courseDeleteForm):
+    """Delete Course Window"""
+    def __init__(self, courses, course_list, constraints):
+        #Initialize Delete Course Window
+        super(courseDeleteWindow, self).__init__()
+        self.setupUi(self)
+        #The course drop down shows the shared course model
+        showCourseList(self.courseCodeInput, course_list)
+
+        #Store course table and its rules to local
+        self.courses = courses
+        self.constraints = constraints
+        #Button trigger event
+        self.submitButton.clicked.connect(self.submitClicked)
+        #Communicate object
+        self.communicate = Communicate()
+
+    def reset(self):
+        self.courseCodeInput.setCurrentIndex(0)
+
+    def submitClicked(self):
+        # Logic to delete a given course
+        course_to_delete = self.courseCodeInput.currentText()
+        # The course students of deleted courses move to stays
+        error = self.constraints.checkDelete(self.courses, course_to_delete)
+        if error:
+            showError(error)
+            return
+        # Confirmation dialog for deleting a course
+        reply = QMessageBox.question(self, 'Confirmation', f"Are you sure you want to delete {course_to_delete}?",
+                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply == QMessageBox.Yes:
+            # Proceed with deletion if yes
+            self.courses.delete(course_to_delete)
+            # Emit signal and close window
+            self.communicate.deletedCourse.emit(course_to_delete)
+            self.close()
+        else:
+            # Cancel deletion if no
+            return
+
+courseEditForm = loadForm("courseEditWindow.ui")
+
+class courseEditWindow(QMainWindow, courseEditForm):
+    """Edit Course Window"""
+
+    def __init__(self, students, courses, constraints):
+        #Initialize Edit Course Window UI
+        super(courseEditWindow, self).__init__()
+        self.setupUi(self)
+
+        #Button trigger event
+        self.submitButton.clicked.connect(self.submitClicked)
+        self.editButton.clicked.connect(self.editClicked)
+
+        #Store tables and their rules to local
+        self.courses = courses
+        self.students = students
+        self.constraints = constraints
+        #Initialize the code of the course being edited
+        self.course_to_edit = None
+
+    def reset(self):
+        #Every open starts with no course chosen
+        self.course_to_edit = None
+        self.editButton.setEnabled(False)
+        for line_edit in (self.editCourseInput, self.courseCodeInput, self.courseDescriptInput):
+            line_edit.clear()
+
+    def submitClicked(self):
+        #Logic to edit course row
+        key = self.editCourseInput.text()
+        #A course the last save stopped on is settled before it is edited again
+        conflict = self.courses.conflictFor(key)
+        if conflict is not None and not resolveConflict(self, self.courses, key):
+            #Students follow the course back to its saved code, or let go of it if it is gone
+            if conflict.row is None:
+                self.students.updateMany(self.students.find('course', key), {'course': "No Course", 'status': "No"},
+                                         track=False)
+            elif conflict.key != key:
+                self.students.updateMany(self.students.find('course', key), {'course': conflict.key}, track=False)
+        course = self.courses.get(key)
+        if course is not None:
+            #Set edit button to true if course is found
+            self.editButton.setEnabled(True)
+            self.course_to_edit = course["course_code"]
+            self.courseCodeInput.setText(str(course["course_code"]))
+            self.courseDescriptInput.setText(str(course["course_description"]))
+        else:
+            #Set edit button to false if course is not found
+            self.editButton.setEnabled(False)
+            #Show error
+            message = QMessageBox()
+            message.setWindowTitle("Error")
+            message.setText("Course not found")
+            message.exec()
+
+    def editClicked(self):
+        #Logic to edit given course
+        old_course_code = self.course_to_edit
+        new_course_code = self.courseCodeInput.text().strip()
+        course_description = self.courseDescriptInput.text()
+        record = {"course_code": new_course_code, "course_description": course_description}
+
+        # A blank code, or one another course has, would break the course's students
+        error = self.constraints.checkRow(self.courses, record, old_course_code)
+        if error:
+            showError(error)
+            return
+
+        # Update course table
+        self.courses.update(old_course_code, record)
+
+        # Update references in student table, the course save renames them in the database with one UPDATE
+        if old_course_code != new_course_code:
+            self.students.updateMany(self.students.find('course', old_course_code),
+                                     {'course': new_course_code}, track=False)
+        # Close window
+        self.close()
+
+def main():
+    #Run application event loop
+    app = QApplication([])
+    # STUDENT_PROFILE names a file the whole session is profiled into
+    if os.environ.get('STUDENT_PROFILE'):
+        diagnostics.startProfile(os.environ['STUDENT_PROFILE'])
+    window = mainWindow()
+    app.exec_()
+    if diagnostics.profiling():
+        diagnostics.stopProfile()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""Table models that render stores without creating an item per cell."""
+import numpy as np
+from PyQt5.QtCore import Qt, QAbstractTableModel, QAbstractListModel, QModelIndex
+
+# Batch removals spread over more separate ranges than this reset the model, every range is one round of signals
+REMOVE_RANGES = 64
+
+
+class StoreModel(QAbstractTableModel):
+    """Virtualized table model over the columns of a TableStore"""
+
+    def __init__(self, store, headers, parent=None):
+        super(StoreModel, self).__init__(parent)
+        self.store = store
+        self.headers = headers
+        # Physical store position of every displayed row, rows the store has loaded without listing them are left out
+        self.rows = store.listedPositions()
+
+        store.communicate.rowsAppended.connect(self.rowsAppendedSlot)
+        store.communicate.rowUpdated.connect(self.rowUpdatedSlot)
+        store.communicate.rowRemoved.connect(self.rowRemovedSlot)
+        store.communicate.rowsUpdated.connect(self.rowsUpdatedSlot)
+        store.communicate.rowsRemoved.connect(self.rowsRemovedSlot)
+        store.communicate.storeCompacted.connect(self.storeCompactedSlot)
+        store.communicate.storeReset.connect(self.storeResetSlot)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.headers)
+
+    def data(self, index, role=Qt.DisplayRole):
+        # Only visible cells are ever asked for, so values are formatted on demand
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        return str(self.store.value(self.rows[index.row()], self.store.column_names[index.column()]))
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.headers[section]
+        return str(section + 1)
+
+    def viewRow(self, position):
+        # Displayed row of a physical store position, None if the row is not displayed
+        row = int(np.searchsorted(self.rows, position))
+        if row == len(self.rows) or self.rows[row] != position:
+            return None
+        return row
+
+    def viewRows(self, positions):
+        # Displayed rows of the physical store positions that are displayed, in ascending order
+        rows = np.searchsorted(self.rows, positions)
+        shown = rows < len(self.rows)
+        rows = rows[shown]
+        return np.unique(rows[self.rows[rows] == np.asarray(positions)[shown]])
+
+    def positionAt(self, row):
+        # Physical store position of a displayed row
+        return int(self.rows[row])
+
+    def rowsAppendedSlot(self, first, count):
+        positions = first + np.flatnonzero(np.frombuffer(self.store.listed, dtype=bool)[first:first + count])
+        if not len(positions):
+            return
+        row = len(self.rows)
+        self.beginInsertRows(QModelIndex(), row, row + len(positions) - 1)
+        self.rows = np.concatenate((self.rows, positions))
+        self.endInsertRows()
+
+    def rowUpdatedSlot(self, position):
+        row = self.viewRow(position)
+        if row is not None:
+            self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.headers) - 1))
+
+    def rowRemovedSlot(self, position):
+        # Tombstoned values stay readable until the rows below have moved up
+        row = self.viewRow(position)
+        if row is None:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        self.rows = np.delete(self.rows, row)
+        self.endRemoveRows()
+
+    def rowsUpdatedSlot(self, positions):
+        # One notification spanning the whole batch, the view only repaints the rows it shows
+        rows = self.viewRows(positions)
+        if len(rows):
+            self.dataChanged.emit(self.index(int(rows[0]), 0), self.index(int(rows[-1]), len(self.headers) - 1))
+
+    def rowsRemovedSlot(self, positions):
+        # Each run of adjacent rows is removed as one range, bottom up so the rows above keep their numbers.
+        # A batch scattered over many runs is listed again in one reset
+        rows = self.viewRows(positions)
+        if not len(rows):
+            return
+        breaks = np.flatnonzero(np.diff(rows) != 1) + 1
+        starts, ends = rows[np.r_[0, breaks]], rows[np.r_[breaks - 1, len(rows) - 1]]
+        if len(starts) > REMOVE_RANGES:
+            self.beginResetModel()
+            self.rows = self.store.listedPositions()
+            self.endResetModel()
+            return
+        for start, end in zip(starts[::-1].tolist(), ends[::-1].tolist()):
+            self.beginRemoveRows(QModelIndex(), start, end)
+            self.rows = np.delete(self.rows, slice(start, end + 1))
+            self.endRemoveRows()
+
+    def storeCompactedSlot(self):
+        # Live rows keep their order, only their positions change
+        self.rows = self.store.listedPositions()
+
+    def storeResetSlot(self):
+        self.beginResetModel()
+        self.rows = self.store.listedPositions()
+        self.endResetModel()
+
+
+class PagedStoreModel(StoreModel):
+    """Store model that pages rows in from the database as the view scrolls and sorts on the server"""
+
+    def __init__(self, store, headers, pager, parent=None):
+        super(PagedStoreModel, self).__init__(store, headers, parent)
+        self.pager = pager
+
+    def canFetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return False
+        return self.pager.canFetchMore()
+
+    def fetchMore(self, parent=QModelIndex()):
+        # The page arrives later through the store's rowsAppended signal
+        self.pager.fetchMore()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.pager.setSort(self.store.column_names[column], order == Qt.DescendingOrder)
+
+
+class ChoiceModel(QAbstractListModel):
+    """First column of another model under one extra choice, like "All Courses" over the course list"""
+
+    def __init__(self, source, first, parent=None):
+        super(ChoiceModel, self).__init__(parent)
+        self.source = source
+        self.first = first
+        # Changes of the source are passed on one row down, so a combo box keeps its choice through them
+        source.rowsAboutToBeInserted.connect(
+            lambda parent, first, last: self.beginInsertRows(QModelIndex(), first + 1, last + 1))
+        source.rowsInserted.connect(lambda *args: self.endInsertRows())
+        source.rowsAboutToBeRemoved.connect(
+            lambda parent, first, last: self.beginRemoveRows(QModelIndex(), first + 1, last + 1))
+        source.rowsRemoved.connect(lambda *args: self.endRemoveRows())
+        source.modelAboutToBeReset.connect(self.beginResetModel)
+        source.modelReset.connect(self.endResetModel)
+        source.dataChanged.connect(
+            lambda top, bottom, *args: self.dataChanged.emit(self.index(top.row() + 1), self.index(bottom.row() + 1)))
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self.source.rowCount() + 1
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.EditRole):
+            return None
+        if index.row() == 0:
+            return self.first
+        return self.source.data(self.source.index(index.row() - 1, 0), Qt.DisplayRole)
+
+
+class RowsModel(QAbstractTableModel):
+    """Table of a few tuples, like (value, count) pairs, replaced whole on every change"""
+
+    def __init__(self, headers, parent=None):
+        super(RowsModel, self).__init__(parent)
+        self.headers = headers
+        self.rows = []
+
+    def setRows(self, rows):
+        self.beginResetModel()
+        self.rows = list(rows)
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.headers)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        value = self.rows[index.row()][index.column()]
+        return f"{value:.2f}" if isinstance(value, float) else str(value)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or orientation != Qt.Horizontal:
+            return None
+        return self.headers[section]
@@ -0,0 +1,201 @@
+"""Keyset paging of the students table into the in-memory store as the view scrolls."""
+import pandas as pd
+
+from communicate import Communicate
+from repository import StudentQuery, PAGE_SIZE, SYNC_OVERLAP
+from workers import DatabaseTask
+
+
+class StudentPager:
+    """Fetch the filtered and sorted students listing one page at a time"""
+
+    def __init__(self, repository, students, courses, page_size=PAGE_SIZE):
+        self.repository = repository
+        self.students = students
+        self.courses = courses
+        self.page_size = page_size
+        self.query = StudentQuery()
+        # (sort value, id_number) of the last row fetched, the next page starts after it
+        self.after = None
+        self.exhausted = True
+        # Whether a listing was started, and whether it was restored from a snapshot rather than queried
+        self.started = False
+        self.resumed = False
+        # Server time the current listing's rows are at least as new as, for the next snapshot
+        self.synced_at = None
+        # Task fetching the next page of the current query
+        self.task = None
+        # Every task still running, pages of an older query are dropped when they arrive
+        self.running = set()
+        # Signals taskFinished with the number of listed rows and taskFailed with the error of a page, lookup or search
+        self.communicate = Communicate()
+        # Students that are not paged in yet are looked up by id_number on demand, and by name or id_number
+        # for type-ahead search
+        students.lookup = self.lookupRows
+        students.search = self.search
+
+    def setQuery(self, query):
+        # Start the listing over, unsaved rows stay loaded so their changes are kept. Rows of a running save
+        # stay too, it may still fail and hand them back
+        self.task = None
+        self.query = query
+        self.after = None
+        self.exhausted = False
+        self.started = True
+        self.resumed = False
+        self.synced_at = None
+        # Rows only looked up stay out of the listing
+        unsaved = [key for key in self.students.tracker.unsavedUpserts() if key in self.students.index]
+        listed = self.students.frame([key for key in unsaved if self.students.isListed(key)])
+        hidden = self.students.frame([key for key in unsaved if not self.students.isListed(key)])
+        self.students.load(listed)
+        self.students.extend(hidden, listed=False)
+        self.fetchMore()
+
+    def resume(self, query, after, exhausted, synced_at):
+        # Continue a listing restored from a snapshot without querying its loaded pages again
+        self.task = None
+        self.query = query
+        self.after = after
+        self.exhausted = exhausted
+        self.started = True
+        self.resumed = True
+        self.synced_at = synced_at
+
+    def setSort(self, sort_column, descending):
+        # The view asks for its current order again when sorting is switched on
+        if self.started and (sort_column, descending) == (self.query.sort_column, self.query.descending):
+            return
+        self.setQuery(self.query.sortedBy(sort_column, descending))
+
+    def canFetchMore(self):
+        return not self.exhausted
+
+    def fetchMore(self):
+        # Only one page is in flight at a time
+        if self.task is not None or self.exhausted:
+            return
+        task = DatabaseTask(self.readPage, Communicate(), self.databaseQuery(), self.after)
+        task.communicate.taskFinished.connect(lambda page: self.pageSlot(task, page))
+        task.communicate.taskFailed.connect(lambda error: self.pageFailedSlot(task, error))
+        # The thread pool does not own tasks, so they are kept until they report back
+        self.running.add(task)
+        self.task = task.start()
+
+    def readPage(self, query, after, progress, cancelled):
+        # Runs on the thread pool, the first page of a listing also notes the server time it was read at
+        synced_at = self.repository.serverTime(SYNC_OVERLAP) if after is None else None
+        return self.repository.fetchStudentPage(query, after, self.page_size), synced_at
+
+    def databaseQuery(self):
+        # A course renamed since the last save still has its old code in the database
+        course = self.query.filters.get('course')
+        origin = self.courses.tracker.renamed.get(course)
+        if origin is None:
+            return self.query
+        return StudentQuery(self.query.name_prefix, dict(self.query.filters, course=origin),
+                            self.query.sort_column, self.query.descending)
+
+    def pageSlot(self, task, result):
+        self.running.discard(task)
+        if task is not self.task:
+            return
+        self.task = None
+        page, synced_at = result
+        if synced_at is not None:
+            self.synced_at = synced_at
+        self.exhausted = len(page) < self.page_size
+        if len(page):
+            # tolist gives plain Python values the connector can send back as parameters
+            self.after = (page[self.query.sort_column].iloc[-1:].tolist()[0], page['id_number'].iloc[-1])
+        self.listRows(page)
+        # Rows looked up or found by search are loaded too, only the listed ones are counted
+        self.communicate.taskFinished.emit(len(self.students.listedPositions()))
+
+    def pageFailedSlot(self, task, error):
+        self.running.discard(task)
+        if task is not self.task:
+            return
+        self.task = None
+        # Stop asking for pages until the query changes, a failing server would be asked on every scroll
+        self.exhausted = True
+        self.communicate.taskFailed.emit(error)
+
+    def search(self, text, limit, found):
+        # Saved students whose ID number is text or whose name starts with it, read in the background
+        task = DatabaseTask(self.repository.searchStudents, Communicate(), text, limit)
+        task.communicate.taskFinished.connect(lambda rows: self.searchSlot(task, rows, found))
+        task.communicate.taskFailed.connect(lambda error: self.searchFailedSlot(task, error))
+        self.running.add(task)
+        task.start()
+
+    def searchSlot(self, task, rows, found):
+        # Rows found are loaded for the completer and the windows, the listing keeps showing the current query
+        self.running.discard(task)
+        self.pageIn(rows)
+        found([key for key in rows['id_number'] if self.students.isLoaded(key)])
+
+    def searchFailedSlot(self, task, error):
+        # The completer keeps the matches among the loaded rows
+        self.running.discard(task)
+        self.communicate.taskFailed.emit(error)
+
+    def lookupRows(self, keys, done):
+        # Saved students that are not paged in yet, read by id_number in one batched lookup in the background
+        task = DatabaseTask(self.readRows, Communicate(), keys)
+        task.communicate.taskFinished.connect(lambda rows: self.lookupSlot(task, rows, done))
+        task.communicate.taskFailed.connect(lambda error: self.lookupFailedSlot(task, error, done))
+        self.running.add(task)
+        task.start()
+
+    def readRows(self, keys, progress, cancelled):
+        return self.repository.fetchStudentsByKey(keys)
+
+    def lookupSlot(self, task, rows, done):
+        self.running.discard(task)
+        self.pageIn(rows)
+        done()
+
+    def lookupFailedSlot(self, task, error, done):
+        # A failed lookup still calls back, its rows are then taken as not there
+        self.running.discard(task)
+        self.communicate.taskFailed.emit(error)
+        done()
+
+    def pageIn(self, rows):
+        # Rows read outside the listing are loaded without being listed, so a window can check and edit them
+        # while the view keeps showing the current query. Rows changed or deleted since stay as they are
+        fresh = [not self.students.isLoaded(key) and not self.students.tracker.isDeleted(key)
+                 for key in rows['id_number']]
+        self.students.extend(self.applyCourseChanges(rows[fresh]), listed=False)
+
+    def listRows(self, page):
+        # Rows of a page are listed in the order they came, rows changed or deleted since the last save are shown
+        # as they are in memory. Rows looked up before they were paged in move to the end of the listing
+        students = self.students
+        hidden = {key for key in page['id_number'] if students.isLoaded(key) and not students.isListed(key)}
+        fresh = [key in hidden or not (students.isLoaded(key) or students.tracker.isDeleted(key))
+                 for key in page['id_number']]
+        rows = self.applyCourseChanges(page[fresh])
+        changed = hidden & students.tracker.unsavedUpserts()
+        if changed:
+            # Their unsaved values and the version they were read at are kept
+            rows = pd.DataFrame([dict(students.get(record['id_number']),
+                                      version=students.row_versions.get(record['id_number']))
+                                 if record['id_number'] in changed else record
+                                 for record in rows.to_dict("records")], columns=rows.columns)
+        students.deleteMany(hidden, track=False)
+        students.extend(rows)
+
+    def applyCourseChanges(self, rows):
+        # Rows from the database do not have the unsaved course renames and deletes applied yet
+        tracker = self.courses.tracker
+        renamed = {origin: key for key, origin in tracker.renamed.items()}
+        if rows.empty or not (renamed or tracker.deleted):
+            return rows
+        rows = rows.copy()
+        rows['course'] = rows['course'].replace(renamed)
+        deleted = rows['course'].isin(tracker.deleted)
+        rows.loc[deleted, 'course'] = "No Course"
+        rows.loc[deleted, 'status'] = "No"
+        return rows
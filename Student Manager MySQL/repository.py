@@ -0,0 +1,662 @@
+"""Shared data access for every window on top of a pluggable database backend."""
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from backends import createBackend
+from diagnostics import diagnostics
+from workers import TaskCancelled
+
+STUDENT_COLUMNS = ['name', 'id_number', 'course', 'year', 'sex', 'status']
+COURSE_COLUMNS = ['course_code', 'course_description']
+# Column types applied to every fetched chunk, anything not listed stays object
+STUDENT_DTYPES = {'year': 'int8'}
+# Values the year, sex and status columns hold
+YEARS = [1, 2, 3, 4]
+SEXES = ['Male', 'Female']
+STATUSES = ['Yes', 'No']
+# How the students store keeps its columns in memory: course, sex and status as codes into their distinct
+# values and the year in a byte, only name and id_number stay one Python string per row
+STUDENT_SCHEMA = {'course': 'category', 'year': 'int8', 'sex': pd.CategoricalDtype(SEXES),
+                  'status': pd.CategoricalDtype(STATUSES)}
+# Every write bumps a row's version, a save only overwrites rows still at the version it loaded
+VERSION_COLUMN = 'version'
+# Columns read into the stores, the data columns followed by the version
+STUDENT_FETCH_COLUMNS = STUDENT_COLUMNS + [VERSION_COLUMN]
+COURSE_FETCH_COLUMNS = COURSE_COLUMNS + [VERSION_COLUMN]
+STUDENT_FETCH_DTYPES = dict(STUDENT_DTYPES, version='int64')
+FETCH_COLUMNS = {'students': STUDENT_FETCH_COLUMNS, 'courses': COURSE_FETCH_COLUMNS}
+TABLE_KEYS = {'students': 'id_number', 'courses': 'course_code'}
+
+# Columns the enrollment statistics count students by
+ENROLLMENT_COLUMNS = ['course', 'year', 'sex', 'status']
+
+# Parent table -> (child table, referencing column, values children get when the parent is deleted)
+REFERENCES = {'courses': ('students', 'course', {'course': 'No Course', 'status': 'No'})}
+# Columns every row needs a non-blank value in, the key first
+REQUIRED_COLUMNS = {'students': ('name', 'id_number'), 'courses': ('course_code',)}
+
+# Number of rows pulled per fetchmany call when streaming a table
+FETCH_CHUNK_SIZE = 5000
+# Number of students fetched per page of the main window listing
+PAGE_SIZE = 200
+# Number of keys sent per SELECT ... WHERE key IN (...) lookup
+LOOKUP_BATCH_SIZE = 1000
+# Seconds subtracted from every sync point, rows stamped by a transaction that committed late are fetched again
+SYNC_OVERLAP = 60.0
+# Number of changelog rows read per poll of the change feed
+CHANGE_BATCH_SIZE = 1000
+
+# Number of keys sent per DELETE ... WHERE key IN (...) statement
+DELETE_BATCH_SIZE = 1000
+# Number of rows sent per INSERT or UPDATE executemany call
+UPSERT_BATCH_SIZE = 1000
+
+# Why a row could not be saved
+CHANGED = "changed by someone else"
+DELETED = "deleted by someone else"
+ADDED = "added by someone else"
+
+
+def chunkFrame(rows, columns, dtypes):
+    # Build typed columns straight from the fetched tuples
+    data = {column: np.array(values, dtype=dtypes.get(column, object))
+            for column, values in zip(columns, zip(*rows))}
+    return pd.DataFrame(data, columns=columns)
+
+
+class TableChanges:
+    """Rows one table needs written by a save"""
+
+    def __init__(self, table_name, key, upsert_rows, deleted_keys, renamed=None, inserted_keys=(), versions=None,
+                 restored=None):
+        self.table_name = table_name
+        self.key = key
+        self.upsert_rows = upsert_rows
+        self.deleted_keys = list(deleted_keys)
+        self.renamed = dict(renamed or {})
+        # Upserted keys that are new, the rest update rows already in the database
+        self.inserted_keys = set(inserted_keys)
+        # Key -> version the row had when it was loaded, for every updated and deleted key
+        self.versions = dict(versions or {})
+        # Parent key -> {child key: cleared values} of the children an earlier delete of the parent moved off it,
+        # they are moved back unless changed since
+        self.restored = dict(restored or {})
+
+    def without(self, keys):
+        # The same changes less those of the given keys
+        if not keys:
+            return self
+        rows = self.upsert_rows
+        return TableChanges(self.table_name, self.key, rows[~rows[self.key].isin(keys)],
+                            [key for key in self.deleted_keys if key not in keys],
+                            {key: origin for key, origin in self.renamed.items() if key not in keys},
+                            self.inserted_keys - keys,
+                            {key: version for key, version in self.versions.items() if key not in keys},
+                            {key: children for key, children in self.restored.items() if key not in keys})
+
+
+class Conflict:
+    """A row another client wrote since this one loaded it"""
+
+    def __init__(self, table_name, key, reason, row=None):
+        self.table_name = table_name
+        self.key = key
+        self.reason = reason
+        # The row as it is in the database, None if it is not there
+        self.row = row
+        # Whether an earlier save already reported it, autosave saves around it until it is settled
+        self.known = False
+
+    def describe(self):
+        return f"{self.table_name} {self.key}: {self.reason}"
+
+
+class SaveResult:
+    """New versions of the rows a save wrote, and the conflicts it left out"""
+
+    def __init__(self, versions=None, conflicts=None, cascaded=None, moved=None, left_out=None):
+        # Table name -> {key: version} of every row written
+        self.versions = versions or {}
+        self.conflicts = conflicts or []
+        # Table name -> keys whose changes were not written, the conflicting rows and the rows that depend on them
+        self.left_out = left_out or {}
+        # Table name -> {key: version} of the children a cascade moved, each one is one version newer
+        self.cascaded = cascaded or {}
+        # Parent table name -> {deleted key: {child key: values before they were cleared}}, so an undo of the
+        # delete can move them back
+        self.moved = moved or {}
+
+
+def leaveOut(changes, conflicts):
+    # Changes of every table without the conflicting rows. A renamed row's delete and insert stay together, and
+    # children pointing at a new parent key left out stay out too, the parent is not written.
+    # Returns the changes and table name -> keys left out
+    left_out = {}
+    for conflict in conflicts:
+        left_out.setdefault(conflict.table_name, set()).add(conflict.key)
+    tables = {table.table_name: table for table in changes}
+    for table in changes:
+        keys = left_out.get(table.table_name)
+        if not keys:
+            continue
+        for key, origin in table.renamed.items():
+            if key in keys or origin in keys:
+                keys.update((key, origin))
+        if table.table_name in REFERENCES and REFERENCES[table.table_name][0] in tables:
+            child_table, column, cleared = REFERENCES[table.table_name]
+            rows = tables[child_table].upsert_rows
+            children = rows.loc[rows[column].isin(keys & table.inserted_keys), tables[child_table].key]
+            if len(children):
+                left_out.setdefault(child_table, set()).update(children.tolist())
+    return [table.without(left_out.get(table.table_name)) for table in changes], left_out
+
+
+class StudentQuery:
+    """Filters and sort order of one students listing, paged by keyset"""
+
+    def __init__(self, name_prefix="", filters=None, sort_column="id_number", descending=False):
+        if sort_column not in STUDENT_COLUMNS:
+            raise ValueError(f"Unknown sort column: {sort_column}")
+        self.name_prefix = name_prefix
+        # Column -> value the column has to equal
+        self.filters = dict(filters or {})
+        self.sort_column = sort_column
+        self.descending = descending
+
+    def where(self, after=None, until=None, since=None, keys=None):
+        # WHERE clause and parameters for the filters, the rows past after and up to until, both
+        # (sort value, id_number) positions, the rows written at or after the server time since
+        # and the rows among the given id_numbers
+        clauses, params = [], []
+        if self.name_prefix:
+            # '!' escapes the wildcards the same way on every backend, plain prefixes keep LIKE index friendly
+            if any(character in self.name_prefix for character in '!%_'):
+                prefix = self.name_prefix.replace('!', '!!').replace('%', '!%').replace('_', '!_')
+                clauses.append("name LIKE %s ESCAPE '!'")
+            else:
+                prefix = self.name_prefix
+                clauses.append("name LIKE %s")
+            params.append(prefix + '%')
+        for column, value in self.filters.items():
+            if column not in STUDENT_COLUMNS:
+                raise ValueError(f"Unknown filter column: {column}")
+            clauses.append(f"{column} = %s")
+            params.append(value)
+        if after is not None:
+            self.keyset(clauses, params, after, '<' if self.descending else '>', '<' if self.descending else '>')
+        if until is not None:
+            self.keyset(clauses, params, until, '>' if self.descending else '<', '>=' if self.descending else '<=')
+        if since is not None:
+            clauses.append("updated_at >= %s")
+            params.append(since)
+        if keys is not None:
+            clauses.append(f"id_number IN ({', '.join(['%s'] * len(keys))})")
+            params.extend(keys)
+        if not clauses:
+            return "", params
+        return " WHERE " + " AND ".join(clauses), params
+
+    def keyset(self, clauses, params, position, operator, key_operator):
+        # id_number breaks ties so every row has a unique position in the order
+        sort_value, key = position
+        if self.sort_column == 'id_number':
+            clauses.append(f"id_number {key_operator} %s")
+            params.append(key)
+        else:
+            column = self.sort_column
+            clauses.append(f"({column} {operator} %s OR ({column} = %s AND id_number {key_operator} %s))")
+            params.extend([sort_value, sort_value, key])
+
+    def orderBy(self):
+        direction = "DESC" if self.descending else "ASC"
+        if self.sort_column == 'id_number':
+            return f" ORDER BY id_number {direction}"
+        return f" ORDER BY {self.sort_column} {direction}, id_number {direction}"
+
+    def sortedBy(self, sort_column, descending):
+        return StudentQuery(self.name_prefix, self.filters, sort_column, descending)
+
+
+class CallMetrics:
+    """Latency and pool wait totals for one kind of database call"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, latency, wait):
+        self.count += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+    def summary(self):
+        # Averages and maximums in milliseconds
+        count = max(self.count, 1)
+        return {
+            'count': self.count,
+            'avg_latency_ms': self.total_latency / count * 1000,
+            'max_latency_ms': self.max_latency * 1000,
+            'avg_wait_ms': self.total_wait / count * 1000,
+            'max_wait_ms': self.max_wait * 1000,
+        }
+
+
+class Repository:
+    """Owns every SQL statement the windows run, the backend supplies connections and dialect"""
+
+    def __init__(self, backend=None):
+        # STUDENT_DB_BACKEND picks the backend when none is given
+        self.backend = backend or createBackend()
+        self.metrics = {}
+
+    @contextmanager
+    def connection(self, operation):
+        # Borrow a connection from the backend, timing the wait and the call
+        start = time.perf_counter()
+        connection = self.backend.connect()
+        acquired = time.perf_counter()
+        try:
+            yield connection
+        finally:
+            self.backend.release(connection)
+            latency = time.perf_counter() - acquired
+            self.metrics.setdefault(operation, CallMetrics()).record(latency, acquired - start)
+            diagnostics.record(f"db: {operation}", latency)
+
+    @contextmanager
+    def transaction(self, operation):
+        # Cursor whose statements commit together, or roll back together on any error
+        with self.connection(operation) as connection:
+            cursor = self.backend.cursor(connection)
+            try:
+                yield cursor
+                connection.commit()
+            except BaseException:
+                connection.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def bootstrap(self):
+        # Create missing tables and indexes, every statement is safe to run again
+        with self.transaction("bootstrap") as cursor:
+            for statement in self.backend.schema():
+                cursor.execute(statement)
+
+    def ensureSchema(self):
+        # Embedded databases start out empty, server databases are set up by their administrator
+        if self.backend.embedded:
+            self.bootstrap()
+
+    def stats(self):
+        # Per-call latency and pool wait summaries keyed by operation
+        return {operation: metrics.summary() for operation, metrics in self.metrics.items()}
+
+    def fetchTable(self, table_name, columns):
+        # Fetch a whole table into a dataframe with a fixed column order, raises the backend's Error if it fails
+        with self.connection(f"fetch {table_name}") as connection:
+            cursor = self.backend.cursor(connection, prepared=True)
+            try:
+                cursor.execute(f"SELECT {', '.join(columns)} FROM {table_name}")
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+        return pd.DataFrame(rows, columns=columns)
+
+    def streamTable(self, table_name, columns, dtypes, chunk_size=FETCH_CHUNK_SIZE):
+        # Yield typed dataframe chunks as rows arrive from a streaming cursor
+        with self.connection(f"stream {table_name}") as connection:
+            cursor = self.backend.cursor(connection, streaming=True)
+            try:
+                cursor.execute(f"SELECT {', '.join(columns)} FROM {table_name}")
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield chunkFrame(rows, columns, dtypes)
+            finally:
+                self.backend.finishStream(connection)
+                cursor.close()
+
+    def streamStudents(self, chunk_size=FETCH_CHUNK_SIZE):
+        return self.streamTable("students", STUDENT_COLUMNS, STUDENT_DTYPES, chunk_size)
+
+    def fetchStudents(self):
+        chunks = list(self.streamStudents())
+        if not chunks:
+            return pd.DataFrame(columns=STUDENT_COLUMNS)
+        return pd.concat(chunks, ignore_index=True)
+
+    def fetchStudentPage(self, query, after=None, limit=PAGE_SIZE):
+        # One page of the filtered listing, after is the (sort value, id_number) of the previous page's last row
+        where, params = query.where(after)
+        sql = f"SELECT {', '.join(STUDENT_FETCH_COLUMNS)} FROM students{where}{query.orderBy()} LIMIT %s"
+        return self.select("page students", sql, tuple(params) + (limit,), STUDENT_FETCH_COLUMNS,
+                           STUDENT_FETCH_DTYPES)
+
+    def fetchRows(self, table_name, key, columns, dtypes, keys):
+        # Rows for the given keys, looked up through the primary key in batches
+        keys = list(keys)
+        chunks = []
+        if keys:
+            with self.connection(f"lookup {table_name}") as connection:
+                cursor = self.backend.cursor(connection)
+                try:
+                    for start in range(0, len(keys), LOOKUP_BATCH_SIZE):
+                        batch = keys[start:start + LOOKUP_BATCH_SIZE]
+                        values = ', '.join(['%s'] * len(batch))
+                        sql = f"SELECT {', '.join(columns)} FROM {table_name} WHERE {key} IN ({values})"
+                        cursor.execute(self.backend.sql(sql), tuple(batch))
+                        rows = cursor.fetchall()
+                        if rows:
+                            chunks.append(chunkFrame(rows, columns, dtypes))
+                finally:
+                    cursor.close()
+        if not chunks:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(chunks, ignore_index=True)
+
+    def searchStudents(self, text, limit, progress=None, cancelled=None):
+        # The student whose ID number is the text, then the students whose name starts with it in name order,
+        # both read through an index
+        exact = self.fetchStudentsByKey([text])
+        names = self.fetchStudentPage(StudentQuery(text, sort_column='name'), limit=limit)
+        if not len(exact):
+            return names
+        return pd.concat([exact, names], ignore_index=True).drop_duplicates('id_number', ignore_index=True)
+
+    def fetchStudentsByKey(self, keys):
+        return self.fetchRows("students", "id_number", STUDENT_FETCH_COLUMNS, STUDENT_FETCH_DTYPES, keys)
+
+    def fetchCourses(self):
+        return self.fetchTable("courses", COURSE_FETCH_COLUMNS)
+
+    def serverTime(self, overlap=0.0):
+        # Database clock minus overlap seconds, as text that compares correctly with updated_at.
+        # The overlap covers rows stamped by transactions that had not committed yet
+        with self.connection("server time") as connection:
+            cursor = self.backend.cursor(connection)
+            try:
+                cursor.execute(f"SELECT {self.backend.now}")
+                now = cursor.fetchall()[0][0]
+            finally:
+                cursor.close()
+        return (pd.Timestamp(now) - pd.Timedelta(seconds=overlap)).strftime('%Y-%m-%d %H:%M:%S.%f')
+
+    def select(self, operation, sql, params, columns, dtypes):
+        # Typed dataframe of a query's rows
+        with self.connection(operation) as connection:
+            cursor = self.backend.cursor(connection)
+            try:
+                cursor.execute(self.backend.sql(sql), tuple(params))
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+        if not rows:
+            return pd.DataFrame(columns=columns)
+        return chunkFrame(rows, columns, dtypes)
+
+    def fetchKeys(self, table_name, key, where="", params=()):
+        # Only the key column, answered from the index
+        return set(self.select(f"keys {table_name}", f"SELECT {key} FROM {table_name}{where}", params,
+                               [key], {})[key])
+
+    def fetchListingKeys(self, query, until=None, keys=None):
+        where, params = query.where(until=until, keys=keys)
+        return self.fetchKeys("students", "id_number", where, params)
+
+    def fetchListingChanges(self, query, since, until=None):
+        # Rows of a listing, up to the until position, written since the given server time
+        where, params = query.where(until=until, since=since)
+        sql = f"SELECT {', '.join(STUDENT_FETCH_COLUMNS)} FROM students{where}"
+        return self.select("changes students", sql, params, STUDENT_FETCH_COLUMNS, STUDENT_FETCH_DTYPES)
+
+    def fetchCourseChanges(self, since):
+        sql = f"SELECT {', '.join(COURSE_FETCH_COLUMNS)} FROM courses WHERE updated_at >= %s"
+        return self.select("changes courses", sql, (since,), COURSE_FETCH_COLUMNS, {})
+
+    def fetchEnrollmentCounts(self, progress=None, cancelled=None):
+        # Students per (course, year, sex, status), one GROUP BY in the database however many rows there are
+        columns = ENROLLMENT_COLUMNS + ['count']
+        sql = f"SELECT {', '.join(ENROLLMENT_COLUMNS)}, COUNT(*) FROM students GROUP BY {', '.join(ENROLLMENT_COLUMNS)}"
+        return self.select("count students", sql, (), columns, dict(STUDENT_DTYPES, count='int64'))
+
+    def latestChange(self):
+        # Sequence number of the newest changelog row, a feed starting from it sees every later write
+        latest = self.select("latest change", "SELECT MAX(seq) FROM changelog", (), ['seq'], {})['seq'][0]
+        return int(latest) if latest is not None else 0
+
+    def fetchChanges(self, after, missing=(), limit=CHANGE_BATCH_SIZE):
+        # (seq, table name, key) of the changelog rows past after in order, and of the missing
+        # sequence numbers below it whose transactions committed since
+        where, params = "seq > %s", [after]
+        if missing:
+            where = f"(seq > %s OR seq IN ({', '.join(['%s'] * len(missing))}))"
+            params.extend(missing)
+        sql = f"SELECT seq, table_name, row_key FROM changelog WHERE {where} ORDER BY seq LIMIT %s"
+        columns = ['seq', 'table_name', 'row_key']
+        rows = self.select("changes feed", sql, params + [limit], columns, {})
+        return list(rows.itertuples(index=False, name=None))
+
+    def pruneChanges(self, retention):
+        # Drop changelog rows older than retention seconds, every open client has read them long ago
+        before = self.serverTime(retention)
+        with self.transaction("prune changes") as cursor:
+            cursor.execute(self.backend.sql("DELETE FROM changelog WHERE changed_at < %s"), (before,))
+
+    def insertRows(self, table_name, dataframe):
+        # Bulk load new rows inside one transaction, in batches only where the backend needs them
+        columns = list(dataframe.columns)
+        values = ', '.join(['%s'] * len(columns))
+        sql = self.backend.sql(f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({values})")
+        rows = list(dataframe.itertuples(index=False, name=None))
+        batch_size = self.backend.insert_batch_size or max(len(rows), 1)
+        with self.transaction(f"insert {table_name}") as cursor:
+            for start in range(0, len(rows), batch_size):
+                cursor.executemany(sql, rows[start:start + batch_size])
+
+    def saveChanges(self, changes, progress=None, cancelled=None):
+        # Write a list of TableChanges, parents first, in one transaction with foreign key checks on.
+        # The rows are locked and their versions checked first, rows that conflict are left out and the rest
+        # is written. Returns a SaveResult, raises the backend's Error if it fails and TaskCancelled if cancelled
+        total = sum(len(table.upsert_rows) + len(table.deleted_keys) for table in changes)
+        done = 0
+
+        def step(count):
+            nonlocal done
+            done += count
+            if progress:
+                progress(done, total)
+            if cancelled and cancelled():
+                raise TaskCancelled()
+
+        table_names = ', '.join(table.table_name for table in changes)
+        with self.connection(f"save {table_names}") as connection:
+            cursor = self.backend.cursor(connection)
+            # Deletes reuse one prepared statement for every full batch
+            delete_cursor = self.backend.cursor(connection, prepared=True)
+            try:
+                self.backend.beginWrite(cursor)
+                conflicts, current = [], {}
+                for table in changes:
+                    current[table.table_name] = self.checkVersions(cursor, table, conflicts)
+                changes, left_out = leaveOut(changes, conflicts)
+                # New and renamed parent rows exist before any child points at them
+                for table in changes:
+                    self.writeInserts(cursor, table, step)
+                    self.writeUpdates(cursor, table, current[table.table_name], step)
+                # Children follow renamed parents and let go of deleted ones
+                cascaded, moved = {}, {}
+                for table in changes:
+                    if table.table_name in REFERENCES:
+                        child_table = REFERENCES[table.table_name][0]
+                        changed, moved[table.table_name] = self.writeCascades(cursor, table)
+                        changed.update(self.writeRestores(cursor, table))
+                        cascaded.setdefault(child_table, set()).update(changed)
+                # Children are deleted before their parents
+                for table in reversed(changes):
+                    self.writeDeletes(delete_cursor, table, step)
+                versions = {table.table_name: self.readVersions(cursor, table.table_name, table.upsert_rows[table.key])
+                            for table in changes}
+                cascaded = {table_name: self.readVersions(cursor, table_name, keys)
+                            for table_name, keys in cascaded.items()}
+                connection.commit()
+            except BaseException:
+                connection.rollback()
+                raise
+            finally:
+                delete_cursor.close()
+                cursor.close()
+        return SaveResult(versions, conflicts, cascaded, moved, left_out)
+
+    def lockRows(self, cursor, table_name, key, keys):
+        # Key -> row of the keys found, locked until the transaction ends where the backend locks rows
+        columns = FETCH_COLUMNS[table_name]
+        keys = list(keys)
+        rows = {}
+        for start in range(0, len(keys), LOOKUP_BATCH_SIZE):
+            batch = keys[start:start + LOOKUP_BATCH_SIZE]
+            values = ', '.join(['%s'] * len(batch))
+            sql = f"SELECT {', '.join(columns)} FROM {table_name} WHERE {key} IN ({values}){self.backend.lock}"
+            cursor.execute(self.backend.sql(sql), tuple(batch))
+            for row in cursor.fetchall():
+                row = dict(zip(columns, row))
+                rows[row[key]] = row
+        return rows
+
+    def checkVersions(self, cursor, table, conflicts):
+        # Add a Conflict for every row written elsewhere since it was loaded, returns key -> current version
+        rows = self.lockRows(cursor, table.table_name, table.key, table.inserted_keys | set(table.versions))
+        for key in table.inserted_keys:
+            if key in rows:
+                conflicts.append(Conflict(table.table_name, key, ADDED, rows[key]))
+        deleted = set(table.deleted_keys)
+        for key, version in table.versions.items():
+            row = rows.get(key)
+            if row is None:
+                # Deleting a row someone else deleted already is no conflict
+                if key not in deleted:
+                    conflicts.append(Conflict(table.table_name, key, DELETED))
+            elif version is not None and row[VERSION_COLUMN] != version:
+                conflicts.append(Conflict(table.table_name, key, CHANGED, row))
+        return {key: row[VERSION_COLUMN] for key, row in rows.items()}
+
+    def writeInserts(self, cursor, table, step):
+        rows = table.upsert_rows[table.upsert_rows[table.key].isin(table.inserted_keys)]
+        if rows.empty:
+            return
+        columns = list(rows.columns)
+        values = ', '.join(['%s'] * len(columns))
+        sql = self.backend.sql(f"INSERT INTO {table.table_name} ({', '.join(columns)}) VALUES ({values})")
+        rows = list(rows.itertuples(index=False, name=None))
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            # executemany sends each batch as a multi-row INSERT on MySQL
+            batch = rows[start:start + UPSERT_BATCH_SIZE]
+            cursor.executemany(sql, batch)
+            step(len(batch))
+
+    def writeUpdates(self, cursor, table, current, step):
+        # One small conditional UPDATE per row, it only matches the version that was checked
+        rows = table.upsert_rows[~table.upsert_rows[table.key].isin(table.inserted_keys)]
+        if rows.empty:
+            return
+        columns = [column for column in rows.columns if column != table.key]
+        assignments = ', '.join([f"{column} = %s" for column in columns]
+                                + [f"{VERSION_COLUMN} = {VERSION_COLUMN} + 1", f"updated_at = {self.backend.now}"])
+        sql = self.backend.sql(f"UPDATE {table.table_name} SET {assignments} "
+                               f"WHERE {table.key} = %s AND {VERSION_COLUMN} = %s")
+        rows = [tuple(values) + (key, current.get(key))
+                for key, values in zip(rows[table.key].tolist(), rows[columns].itertuples(index=False, name=None))]
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[start:start + UPSERT_BATCH_SIZE]
+            cursor.executemany(sql, batch)
+            if cursor.rowcount >= 0 and cursor.rowcount != len(batch):
+                raise RuntimeError(f"{table.table_name} changed while saving, save again")
+            step(len(batch))
+
+    def writeCascades(self, cursor, table):
+        # One set-based UPDATE per renamed key and per batch of deleted keys. Returns the child keys changed
+        # and, per deleted key, the values its children had before they were cleared
+        child_table, column, cleared = REFERENCES[table.table_name]
+        child_key = TABLE_KEYS[child_table]
+        # Children changed here are stamped and versioned too, so snapshots and other clients see them
+        touched = f"{VERSION_COLUMN} = {VERSION_COLUMN} + 1, updated_at = {self.backend.now}"
+        changed = set()
+        for new_key, old_key in table.renamed.items():
+            cursor.execute(self.backend.sql(f"SELECT {child_key} FROM {child_table} WHERE {column} = %s"
+                                            f"{self.backend.lock}"), (old_key,))
+            changed.update(row[0] for row in cursor.fetchall())
+            sql = f"UPDATE {child_table} SET {column} = %s, {touched} WHERE {column} = %s"
+            cursor.execute(self.backend.sql(sql), (new_key, old_key))
+        assignments = ', '.join([f"{name} = %s" for name in cleared] + [touched])
+        # The reference column comes back as the parent key, only the other cleared columns are kept
+        kept = [name for name in cleared if name != column]
+        deleted = list(table.deleted_keys)
+        moved = {key: {} for key in deleted}
+        for start in range(0, len(deleted), DELETE_BATCH_SIZE):
+            batch = deleted[start:start + DELETE_BATCH_SIZE]
+            values = ', '.join(['%s'] * len(batch))
+            cursor.execute(self.backend.sql(f"SELECT {', '.join([child_key, column] + kept)} FROM {child_table} "
+                                            f"WHERE {column} IN ({values}){self.backend.lock}"), tuple(batch))
+            for row in cursor.fetchall():
+                changed.add(row[0])
+                moved[row[1]][row[0]] = dict(zip(kept, row[2:]))
+            cursor.execute(self.backend.sql(f"UPDATE {child_table} SET {assignments} WHERE {column} IN ({values})"),
+                           tuple(cleared.values()) + tuple(batch))
+        return changed, moved
+
+    def writeRestores(self, cursor, table):
+        # Children an earlier delete moved off a parent that is back go back to it, one UPDATE per batch of
+        # children that had the same values. Children changed since no longer have the cleared values and stay.
+        # Returns the child keys changed
+        child_table, column, cleared = REFERENCES[table.table_name]
+        child_key = TABLE_KEYS[child_table]
+        touched = f"{VERSION_COLUMN} = {VERSION_COLUMN} + 1, updated_at = {self.backend.now}"
+        unchanged = ' AND '.join(f"{name} = %s" for name in cleared)
+        changed = set()
+        for parent_key, children in table.restored.items():
+            groups = {}
+            for key, values in children.items():
+                groups.setdefault(tuple(sorted(values.items())), []).append(key)
+            for values, keys in groups.items():
+                values = dict(values, **{column: parent_key})
+                assignments = ', '.join([f"{name} = %s" for name in values] + [touched])
+                for start in range(0, len(keys), DELETE_BATCH_SIZE):
+                    batch = keys[start:start + DELETE_BATCH_SIZE]
+                    where = f"{child_key} IN ({', '.join(['%s'] * len(batch))}) AND {unchanged}"
+                    cursor.execute(self.backend.sql(f"SELECT {child_key} FROM {child_table} WHERE {where}"
+                                                    f"{self.backend.lock}"), tuple(batch) + tuple(cleared.values()))
+                    changed.update(row[0] for row in cursor.fetchall())
+                    cursor.execute(self.backend.sql(f"UPDATE {child_table} SET {assignments} WHERE {where}"),
+                                   tuple(values.values()) + tuple(batch) + tuple(cleared.values()))
+        return changed
+
+    def readVersions(self, cursor, table_name, keys):
+        # Key -> version after the writes, read back inside the transaction that made them
+        key = TABLE_KEYS[table_name]
+        keys = list(keys)
+        versions = {}
+        for start in range(0, len(keys), LOOKUP_BATCH_SIZE):
+            batch = keys[start:start + LOOKUP_BATCH_SIZE]
+            values = ', '.join(['%s'] * len(batch))
+            cursor.execute(self.backend.sql(f"SELECT {key}, {VERSION_COLUMN} FROM {table_name} "
+                                            f"WHERE {key} IN ({values})"), tuple(batch))
+            versions.update(cursor.fetchall())
+        return versions
+
+    def writeDeletes(self, cursor, table, step):
+        deleted = list(table.deleted_keys)
+        for start in range(0, len(deleted), DELETE_BATCH_SIZE):
+            batch = deleted[start:start + DELETE_BATCH_SIZE]
+            values = ', '.join(['%s'] * len(batch))
+            cursor.execute(self.backend.sql(f"DELETE FROM {table.table_name} WHERE {table.key} IN ({values})"),
+                           tuple(batch))
+            step(len(batch))
@@ -0,0 +1,91 @@
+-- Tables the Student Manager expects, with the indexes its paged listing relies on.
+-- InnoDB appends the primary key to every secondary index, so an index on (column)
+-- serves both "WHERE column = ?" and the keyset order "ORDER BY column, id_number".
+
+CREATE TABLE IF NOT EXISTS courses (
+    course_code VARCHAR(20) NOT NULL,
+    course_description VARCHAR(255) NOT NULL,
+    -- Bumped by every write, a save only overwrites the version it loaded
+    version INT NOT NULL DEFAULT 1,
+    -- Set by the app on every write, snapshots sync the rows changed since they were taken
+    updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    PRIMARY KEY (course_code),
+    INDEX courses_updated_at (updated_at)
+);
+
+-- Students without a course point at this row
+INSERT IGNORE INTO courses (course_code, course_description) VALUES ('No Course', 'Not enrolled');
+
+CREATE TABLE IF NOT EXISTS students (
+    name VARCHAR(100) NOT NULL,
+    id_number VARCHAR(20) NOT NULL,
+    course VARCHAR(20) NOT NULL,
+    year INT NOT NULL,
+    sex VARCHAR(10) NOT NULL,
+    status VARCHAR(3) NOT NULL,
+    version INT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    PRIMARY KEY (id_number),
+    -- Name prefix search and the name sort
+    INDEX students_name (name),
+    -- Course filter, course sort and the foreign key
+    INDEX students_course (course),
+    -- Course roster sorted by name, the most common filtered listing
+    INDEX students_course_name (course, name),
+    INDEX students_year (year),
+    INDEX students_sex (sex),
+    INDEX students_status (status),
+    INDEX students_updated_at (updated_at),
+    CONSTRAINT students_course_code FOREIGN KEY (course) REFERENCES courses (course_code)
+);
+
+-- Every write to students and courses appends the keys it touched, open clients poll it by seq
+-- and read back only those rows
+CREATE TABLE IF NOT EXISTS changelog (
+    seq BIGINT NOT NULL AUTO_INCREMENT,
+    table_name VARCHAR(20) NOT NULL,
+    row_key VARCHAR(20) NOT NULL,
+    changed_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    PRIMARY KEY (seq),
+    -- Old rows are pruned by age
+    INDEX changelog_changed_at (changed_at)
+);
+
+-- Triggers catch cascades and writes from other tools too. Creating them needs the TRIGGER privilege,
+-- with binary logging on also SUPER or log_bin_trust_function_creators. A changed key logs both keys
+CREATE TRIGGER IF NOT EXISTS students_log_insert AFTER INSERT ON students FOR EACH ROW
+    INSERT INTO changelog (table_name, row_key) VALUES ('students', NEW.id_number);
+CREATE TRIGGER IF NOT EXISTS students_log_update AFTER UPDATE ON students FOR EACH ROW
+    INSERT INTO changelog (table_name, row_key) SELECT 'students', NEW.id_number UNION SELECT 'students', OLD.id_number;
+CREATE TRIGGER IF NOT EXISTS students_log_delete AFTER DELETE ON students FOR EACH ROW
+    INSERT INTO changelog (table_name, row_key) VALUES ('students', OLD.id_number);
+CREATE TRIGGER IF NOT EXISTS courses_log_insert AFTER INSERT ON courses FOR EACH ROW
+    INSERT INTO changelog (table_name, row_key) VALUES ('courses', NEW.course_code);
+CREATE TRIGGER IF NOT EXISTS courses_log_update AFTER UPDATE ON courses FOR EACH ROW
+    INSERT INTO changelog (table_name, row_key) SELECT 'courses', NEW.course_code UNION SELECT 'courses', OLD.course_code;
+CREATE TRIGGER IF NOT EXISTS courses_log_delete AFTER DELETE ON courses FOR EACH ROW
+    INSERT INTO changelog (table_name, row_key) VALUES ('courses', OLD.course_code);
+
+-- For a database created before these columns and indexes existed:
+-- ALTER TABLE courses
+--     ADD COLUMN version INT NOT NULL DEFAULT 1,
+--     ADD COLUMN updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+--     ADD INDEX courses_updated_at (updated_at);
+-- ALTER TABLE students
+--     ADD COLUMN version INT NOT NULL DEFAULT 1,
+--     ADD COLUMN updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+--     ADD INDEX students_updated_at (updated_at),
+--     ADD INDEX students_name (name),
+--     ADD INDEX students_course (course),
+--     ADD INDEX students_course_name (course, name),
+--     ADD INDEX students_year (year),
+--     ADD INDEX students_sex (sex),
+--     ADD INDEX students_status (status);
+-- Saves move the students of a deleted course to 'No Course' with foreign key checks on, so the row
+-- has to exist before the first course delete. Students in a course that is gone are moved to it too,
+-- or the foreign key cannot be added:
+-- INSERT IGNORE INTO courses (course_code, course_description) VALUES ('No Course', 'Not enrolled');
+-- UPDATE students SET course = 'No Course', status = 'No'
+--     WHERE course NOT IN (SELECT course_code FROM courses);
+-- ALTER TABLE students
+--     ADD CONSTRAINT students_course_code FOREIGN KEY (course) REFERENCES courses (course_code);
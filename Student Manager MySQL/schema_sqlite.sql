@@ -0,0 +1,83 @@
+-- SQLite version of schema.sql for the embedded backend.
+-- WITHOUT ROWID tables are clustered on the primary key like InnoDB, so an index on
+-- (column) also serves the keyset order "ORDER BY column, id_number".
+
+CREATE TABLE IF NOT EXISTS courses (
+    course_code TEXT NOT NULL PRIMARY KEY,
+    course_description TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    updated_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+) WITHOUT ROWID;
+
+-- Students without a course point at this row
+INSERT OR IGNORE INTO courses (course_code, course_description) VALUES ('No Course', 'Not enrolled');
+
+-- NOCASE matches MySQL's default collation and lets LIKE use the name index
+CREATE TABLE IF NOT EXISTS students (
+    name TEXT NOT NULL COLLATE NOCASE,
+    id_number TEXT NOT NULL PRIMARY KEY,
+    course TEXT NOT NULL REFERENCES courses (course_code),
+    year INTEGER NOT NULL,
+    sex TEXT NOT NULL,
+    status TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    updated_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS students_name ON students (name);
+CREATE INDEX IF NOT EXISTS students_course ON students (course);
+CREATE INDEX IF NOT EXISTS students_course_name ON students (course, name);
+CREATE INDEX IF NOT EXISTS students_year ON students (year);
+CREATE INDEX IF NOT EXISTS students_sex ON students (sex);
+CREATE INDEX IF NOT EXISTS students_status ON students (status);
+CREATE INDEX IF NOT EXISTS students_updated_at ON students (updated_at);
+CREATE INDEX IF NOT EXISTS courses_updated_at ON courses (updated_at);
+
+-- Every write to students and courses appends the keys it touched, open clients poll it by seq
+-- and read back only those rows. AUTOINCREMENT never hands out a number twice
+CREATE TABLE IF NOT EXISTS changelog (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    row_key TEXT NOT NULL,
+    changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+);
+CREATE INDEX IF NOT EXISTS changelog_changed_at ON changelog (changed_at);
+
+CREATE TRIGGER IF NOT EXISTS students_log_insert AFTER INSERT ON students
+BEGIN
+    INSERT INTO changelog (table_name, row_key) VALUES ('students', NEW.id_number);
+END;
+CREATE TRIGGER IF NOT EXISTS students_log_update AFTER UPDATE ON students
+BEGIN
+    INSERT INTO changelog (table_name, row_key) SELECT 'students', NEW.id_number UNION SELECT 'students', OLD.id_number;
+END;
+CREATE TRIGGER IF NOT EXISTS students_log_delete AFTER DELETE ON students
+BEGIN
+    INSERT INTO changelog (table_name, row_key) VALUES ('students', OLD.id_number);
+END;
+
+CREATE TRIGGER IF NOT EXISTS courses_log_insert AFTER INSERT ON courses
+BEGIN
+    INSERT INTO changelog (table_name, row_key) VALUES ('courses', NEW.course_code);
+END;
+CREATE TRIGGER IF NOT EXISTS courses_log_update AFTER UPDATE ON courses
+BEGIN
+    INSERT INTO changelog (table_name, row_key) SELECT 'courses', NEW.course_code UNION SELECT 'courses', OLD.course_code;
+END;
+CREATE TRIGGER IF NOT EXISTS courses_log_delete AFTER DELETE ON courses
+BEGIN
+    INSERT INTO changelog (table_name, row_key) VALUES ('courses', OLD.course_code);
+END;
+
+-- For a database file created before the version columns existed, SQLite only adds columns with a
+-- constant default. Indexes above on the new columns are created on the next start:
+-- ALTER TABLE courses ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+-- ALTER TABLE courses ADD COLUMN updated_at TEXT NOT NULL DEFAULT '1970-01-01 00:00:00.000';
+-- ALTER TABLE students ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+-- ALTER TABLE students ADD COLUMN updated_at TEXT NOT NULL DEFAULT '1970-01-01 00:00:00.000';
+-- Saves move the students of a deleted course to 'No Course' with foreign key checks on. Every start
+-- runs the INSERT OR IGNORE above, but students in a course that is gone fail the next save that
+-- touches them until they are moved to it:
+-- INSERT OR IGNORE INTO courses (course_code, course_description) VALUES ('No Course', 'Not enrolled');
+-- UPDATE students SET course = 'No Course', status = 'No'
+--     WHERE course NOT IN (SELECT course_code FROM courses);
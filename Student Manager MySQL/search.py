@@ -0,0 +1,138 @@
+"""Trigram index over text columns of a store, for ranked type-ahead search of the loaded rows."""
+from array import array
+
+import numpy as np
+from PyQt5.QtCore import QTimer
+
+# Trigrams more than this share of the rows have, like "  s" of ids that all start with S, are left out of a
+# search while the query has rarer ones, they would cost the most and tell the least
+COMMON_SHARE = 0.5
+# Share of the query's trigrams a row needs to be listed at all
+MIN_MATCH = 0.5
+# Rows indexed per pass of the event loop, a large load is indexed in the background without stalling the window
+INDEX_CHUNK_ROWS = 2000
+
+
+def trigrams(text, prefix=False):
+    # Trigrams of every word padded like pg_trgm, two spaces in front so one or two typed letters match too.
+    # With prefix the last word is taken as still being typed and gets no end of word trigram
+    grams = set()
+    words = str(text).lower().split()
+    for number, word in enumerate(words):
+        padded = f"  {word}" if prefix and number == len(words) - 1 else f"  {word} "
+        grams.update(padded[start:start + 3] for start in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """Trigram -> store positions index, extended in chunks as rows are loaded and kept current by the store"""
+
+    def __init__(self, store, columns):
+        self.store = store
+        self.columns = tuple(columns)
+        self.indexTimer = QTimer()
+        self.indexTimer.setInterval(0)
+        self.indexTimer.timeout.connect(self.catchUp)
+        self.clear()
+
+    def clear(self):
+        # Trigram -> positions of the rows whose text has it, packed so a large table stays small
+        self.postings = {}
+        # Number of distinct trigrams of every indexed row, for the similarity score
+        self.sizes = array('h')
+        # Rows below this position are indexed, rows loaded since are indexed by the timer
+        self.indexed = 0
+
+    def covers(self, record):
+        return any(column in record for column in self.columns)
+
+    def grams(self, position):
+        grams = set()
+        for column in self.columns:
+            grams |= trigrams(self.store.columns[column][position])
+        return grams
+
+    def extended(self):
+        # The store appended rows, they are found once the timer has indexed them
+        if not self.indexTimer.isActive():
+            self.indexTimer.start()
+
+    def catchUp(self):
+        # Index the next chunk of the rows loaded since, repeated names are split into trigrams once
+        end = min(len(self.store.alive), self.indexed + INDEX_CHUNK_ROWS)
+        if end == len(self.store.alive):
+            self.indexTimer.stop()
+        columns = [self.store.columns[column] for column in self.columns]
+        split = {}
+        added = {}
+        for position in range(self.indexed, end):
+            grams = set()
+            for values in columns:
+                text = values[position]
+                found = split.get(text)
+                if found is None:
+                    found = split[text] = trigrams(text)
+                grams |= found
+            for gram in grams:
+                added.setdefault(gram, []).append(position)
+            self.sizes.append(len(grams))
+        for gram, positions in added.items():
+            self.postings.setdefault(gram, array('i')).extend(positions)
+        self.indexed = end
+
+    def forget(self, position):
+        # Called before a row's text changes, deleted rows are left in place and skipped by find
+        if position >= self.indexed:
+            return
+        for gram in self.grams(position):
+            positions = self.postings[gram]
+            positions.remove(position)
+            if not positions:
+                del self.postings[gram]
+
+    def remember(self, position):
+        # Called after a row's text changed
+        if position >= self.indexed:
+            return
+        grams = self.grams(position)
+        for gram in grams:
+            self.postings.setdefault(gram, array('i')).append(position)
+        self.sizes[position] = len(grams)
+
+    def compacted(self, live):
+        # The store dropped its tombstoned rows, positions are renumbered without reading any text again
+        live = np.asarray(live)
+        kept = live[live < self.indexed]
+        moved = np.full(self.indexed, -1, dtype=np.int64)
+        moved[kept] = np.arange(len(kept))
+        postings = {}
+        for gram, positions in self.postings.items():
+            renumbered = moved[np.frombuffer(positions, dtype=np.int32)]
+            renumbered = renumbered[renumbered >= 0]
+            if len(renumbered):
+                postings[gram] = array('i', renumbered.astype(np.int32).tobytes())
+        self.postings = postings
+        self.sizes = array('h', np.frombuffer(self.sizes, dtype=np.int16)[kept].tobytes())
+        self.indexed = len(kept)
+
+    def find(self, query, limit):
+        # Positions of the indexed live rows sharing the most of the query's trigrams, best first
+        grams = trigrams(query, prefix=not query[-1:].isspace())
+        postings = sorted((self.postings.get(gram, ()) for gram in grams), key=len)
+        if not postings:
+            return []
+        postings = [positions for positions in postings if len(positions) <= COMMON_SHARE * self.indexed] \
+            or postings[:1]
+        found = [np.frombuffer(positions, dtype=np.int32) for positions in postings if len(positions)]
+        if not found:
+            return []
+        shared = np.bincount(np.concatenate(found), minlength=self.indexed)
+        candidates = np.flatnonzero(shared >= max(MIN_MATCH * len(postings), 1))
+        candidates = candidates[np.frombuffer(self.store.alive, dtype=bool)[candidates]]
+        # Most trigrams shared first, then the row with the least other text, so an exact match wins
+        scores = shared[candidates] - np.frombuffer(self.sizes, dtype=np.int16)[candidates] / 1000
+        if len(candidates) > limit:
+            best = np.argpartition(-scores, limit)[:limit]
+            candidates, scores = candidates[best], scores[best]
+        # Equal scores keep the table's order
+        return candidates[np.lexsort((candidates, -scores))].tolist()
@@ -0,0 +1,111 @@
+"""On-disk snapshot of the loaded tables so a restart shows them at once and then syncs only the changes."""
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from repository import StudentQuery, STUDENT_FETCH_COLUMNS, STUDENT_FETCH_DTYPES, SYNC_OVERLAP
+
+
+def cacheDirectory():
+    return os.environ.get('STUDENT_CACHE_DIR', os.path.join(os.path.expanduser("~"), ".student_manager", "cache"))
+
+
+class SnapshotCache:
+    """Last synced courses and student pages of one database, kept as files in the cache folder"""
+
+    def __init__(self, directory, identity):
+        self.directory = directory
+        # One set of files per database so switching servers never mixes their rows
+        self.prefix = hashlib.sha1(identity.encode()).hexdigest()[:16]
+        # Why the last snapshot could not be used, for the window to show
+        self.ignored = None
+
+    @classmethod
+    def forBackend(cls, backend):
+        # Embedded databases are already on disk, only server databases get a snapshot
+        if backend is None or backend.embedded:
+            return None
+        return cls(cacheDirectory(), backend.identity())
+
+    def path(self, name):
+        return os.path.join(self.directory, f"{self.prefix}.{name}")
+
+    def writeFrame(self, name, dataframe):
+        # Arrow IPC files are memory-mapped on load, pickle is the fallback without pyarrow
+        try:
+            import pyarrow
+            import pyarrow.feather
+        except ImportError:
+            dataframe.to_pickle(self.path(name + ".pkl"))
+            return "pickle"
+        pyarrow.feather.write_feather(pyarrow.Table.from_pandas(dataframe, preserve_index=False),
+                                      self.path(name + ".arrow"), compression="uncompressed")
+        return "arrow"
+
+    def readFrame(self, name, format):
+        if format == "arrow":
+            import pyarrow.feather
+            return pyarrow.feather.read_table(self.path(name + ".arrow"), memory_map=True).to_pandas()
+        return pd.read_pickle(self.path(name + ".pkl"))
+
+    def save(self, courses, students, state):
+        # The state file is written last and replaced atomically, so a snapshot is either whole or absent
+        os.makedirs(self.directory, exist_ok=True)
+        state = dict(state, format=self.writeFrame("courses", courses))
+        self.writeFrame("students", students)
+        temporary = self.path("json.tmp")
+        with open(temporary, "w") as file:
+            json.dump(state, file)
+        os.replace(temporary, self.path("json"))
+
+    def load(self):
+        # (courses, students, state) of the last snapshot, or None if there is no usable one
+        try:
+            with open(self.path("json")) as file:
+                state = json.load(file)
+            return self.readFrame("courses", state["format"]), self.readFrame("students", state["format"]), state
+        except (OSError, ValueError, KeyError, ImportError) as e:
+            if not isinstance(e, FileNotFoundError):
+                self.ignored = str(e)
+            return None
+
+
+def queryState(query):
+    return {'name_prefix': query.name_prefix, 'filters': query.filters, 'sort_column': query.sort_column,
+            'descending': query.descending}
+
+
+def stateQuery(state):
+    return StudentQuery(state['name_prefix'], state['filters'], state['sort_column'], state['descending'])
+
+
+def fetchSnapshotChanges(repository, state, course_keys, student_keys, progress=None, cancelled=None):
+    # Runs on the thread pool. Returns the new sync point and changelog position with the rows changed and
+    # the keys removed since the snapshot, only the key columns of the snapshot's listing are read in full
+    # The change feed continues from the changelog position read before any row
+    seq = repository.latestChange()
+    synced_at = repository.serverTime(SYNC_OVERLAP)
+    since = state['synced_at']
+    courses = repository.fetchCourseChanges(since)
+    removed_courses = set(course_keys) - repository.fetchKeys("courses", "course_code")
+
+    # New and changed rows inside the part of the listing that was loaded
+    query = stateQuery(state['query'])
+    until = None if state['exhausted'] or state['after'] is None else tuple(state['after'])
+    students = [repository.fetchListingChanges(query, since, until)]
+    # Rows outside it were paged in by id_number, they are read back by key to find edits and deletes
+    outside = set(student_keys) - repository.fetchListingKeys(query, until)
+    found = repository.fetchRows("students", "id_number", STUDENT_FETCH_COLUMNS, STUDENT_FETCH_DTYPES, outside)
+    if len(found):
+        students.append(found)
+    removed_students = outside - set(found['id_number'])
+    return {
+        'seq': seq,
+        'synced_at': synced_at,
+        'courses': courses,
+        'removed_courses': removed_courses,
+        'students': pd.concat(students, ignore_index=True).drop_duplicates('id_number', keep='last'),
+        'removed_students': removed_students,
+    }
@@ -0,0 +1,407 @@
+"""Append-friendly columnar tables that keep a key index in sync with every mutation."""
+import numpy as np
+import pandas as pd
+
+from columns import createColumn
+from communicate import Communicate
+from diagnostics import diagnostics, timed
+from search import TrigramIndex
+
+# Compact once this many rows are tombstoned and they make up a quarter of the table
+COMPACT_MIN_DEAD = 1024
+COMPACT_DEAD_RATIO = 0.25
+
+
+class TableStore:
+    """Columnar table with tombstone deletes and a key -> row position index"""
+
+    def __init__(self, table_name, column_names, key, tracker, indexed=(), schema=None, searchable=()):
+        self.table_name = table_name
+        self.column_names = list(column_names)
+        # Column -> pandas dtype it is stored as, columns not listed hold Python objects
+        self.schema = dict(schema or {})
+        self.key = key
+        self.tracker = tracker
+        # Columns with a value -> set of keys reverse index
+        self.indexed = tuple(indexed)
+        # Trigram index over the searchable text columns for findText
+        self.text_index = TrigramIndex(self, searchable) if searchable else None
+        # Called with keys that are not loaded and a callback, pages their saved rows in from the database in the
+        # background and then calls back
+        self.lookup = None
+        # Called with text, a limit and a callback, looks the text up among the saved rows in the background
+        # and calls back with the keys found once their rows are loaded
+        self.search = None
+        # Called with the (old, new) row dicts of every tracked change, None where there is no row
+        self.observers = []
+        # Saves of this table still running
+        self.saving = 0
+        self.communicate = Communicate()
+        # Key -> version the row had in the database when it was last read, kept across reloads and deletes
+        # so a save can tell whether someone else wrote the row since
+        self.row_versions = {}
+        # Key -> Conflict from the last save, under the key the row has in the database
+        self.conflicts = {}
+        self.clear()
+
+    def clear(self):
+        # Empty the table without recording changes
+        self.columns = {column: createColumn(self.schema.get(column)) for column in self.column_names}
+        self.alive = bytearray()
+        # Whether each row is part of the listing the views show, rows looked up for a window are loaded
+        # without being listed
+        self.listed = bytearray()
+        self.index = {}
+        self.lookups = {column: {} for column in self.indexed}
+        self.dead = 0
+        self.version = 0
+        self.snapshot_cache = None
+        if self.text_index is not None:
+            self.text_index.clear()
+        self.emit("storeReset")
+
+    def load(self, dataframe):
+        # Replace the whole table without recording changes
+        self.clear()
+        self.extend(dataframe)
+
+    @timed("store")
+    def extend(self, dataframe, listed=True):
+        # Bulk append rows fetched from the database, no changes are recorded
+        if len(dataframe) == 0:
+            return
+        first = len(self.alive)
+        for column in self.column_names:
+            self.columns[column].extend(dataframe[column])
+        self.alive.extend(b'\x01' * len(dataframe))
+        self.listed.extend((b'\x01' if listed else b'\x00') * len(dataframe))
+        positions = range(first, len(self.alive))
+        keys = self.columns[self.key][first:]
+        self.index.update(zip(keys, positions))
+        if 'version' in dataframe.columns:
+            self.row_versions.update(zip(keys, dataframe['version'].tolist()))
+        for column in self.indexed:
+            lookup = self.lookups[column]
+            values = self.columns[column]
+            for key, position in zip(keys, positions):
+                lookup.setdefault(values[position], set()).add(key)
+        if self.text_index is not None:
+            self.text_index.extended()
+        self.changed()
+        self.emit("rowsAppended", first, len(dataframe))
+
+    def __len__(self):
+        return len(self.index)
+
+    def isLoaded(self, key):
+        return key in self.index
+
+    def isListed(self, key):
+        # Whether a loaded row is shown, rather than only looked up
+        return self.listed[self.index[key]] == 1
+
+    def fetch(self, keys, then):
+        # Page in the saved rows of the keys that are not loaded yet, then is called once they are, right away
+        # when there are none. Rows deleted since the last save stay gone
+        missing = [key for key in keys if key not in self.index and not self.tracker.isDeleted(key)]
+        if not missing or self.lookup is None:
+            then()
+            return
+        self.lookup(missing, then)
+
+    def get(self, key):
+        # Row for the key as a column -> value dict, or None if it is not loaded
+        position = self.index.get(key)
+        if position is None:
+            return None
+        return self.row(position)
+
+    def value(self, position, column):
+        # Positions are physical and include tombstoned rows until the next compaction
+        return self.columns[column][position]
+
+    @timed("store")
+    def add(self, record):
+        # Append a row given as a column -> value dict, amortized O(1)
+        key = record[self.key]
+        position = len(self.alive)
+        for column in self.column_names:
+            self.columns[column].append(record.get(column))
+        self.alive.append(1)
+        self.listed.append(1)
+        self.index[key] = position
+        for column in self.indexed:
+            self.lookups[column].setdefault(record.get(column), set()).add(key)
+        if self.text_index is not None:
+            self.text_index.extended()
+        self.tracker.recordInsert(key)
+        self.changed()
+        self.emit("rowsAppended", position, 1)
+        self.notify(None, self.row(position))
+
+    @timed("store")
+    def update(self, key, record, track=True):
+        # Overwrite the given columns of a row in place, the key itself may change.
+        # Untracked updates are for cascades the database applies on its own
+        position = self.index.pop(key)
+        old = self.row(position) if track and self.observers else None
+        new_key = record.get(self.key, key)
+        searched = self.text_index is not None and self.text_index.covers(record)
+        if searched:
+            self.text_index.forget(position)
+        for column in self.indexed:
+            self.unindex(column, self.columns[column][position], key)
+        for column, value in record.items():
+            self.columns[column][position] = value
+        if searched:
+            self.text_index.remember(position)
+        self.index[new_key] = position
+        for column in self.indexed:
+            self.lookups[column].setdefault(self.columns[column][position], set()).add(new_key)
+        if track:
+            self.tracker.recordRename(key, new_key)
+        self.changed()
+        self.emit("rowUpdated", position)
+        if track:
+            self.notify(old, self.row(position))
+
+    @timed("store")
+    def updateMany(self, keys, record, track=True):
+        # Give every given row the same values in one pass and one signal, the key column is not among them
+        keys = list(keys)
+        if not keys:
+            return
+        positions = [self.index[key] for key in keys]
+        old = [self.row(position) for position in positions] if track and self.observers else None
+        indexed = [column for column in self.indexed if column in record]
+        searched = self.text_index is not None and self.text_index.covers(record)
+        for column in indexed:
+            values = self.columns[column]
+            for key, position in zip(keys, positions):
+                self.unindex(column, values[position], key)
+        if searched:
+            for position in positions:
+                self.text_index.forget(position)
+        for column, value in record.items():
+            self.columns[column].assign(positions, value)
+        if searched:
+            for position in positions:
+                self.text_index.remember(position)
+        for column in indexed:
+            # Indexed under the value as stored, which may have been converted
+            self.lookups[column].setdefault(self.columns[column][positions[0]], set()).update(keys)
+        if track:
+            for key in keys:
+                self.tracker.recordUpdate(key)
+        self.changed()
+        self.emit("rowsUpdated", positions)
+        if old is not None:
+            for row, position in zip(old, positions):
+                self.notify(row, self.row(position))
+
+    @timed("store")
+    def delete(self, key, track=True):
+        # Tombstone the row, its values stay in place until the next compaction
+        position = self.index.pop(key)
+        for column in self.indexed:
+            self.unindex(column, self.columns[column][position], key)
+        self.alive[position] = 0
+        self.dead += 1
+        if track:
+            self.tracker.recordDelete(key)
+        self.changed()
+        self.emit("rowRemoved", position)
+        if track:
+            self.notify(self.row(position), None)
+        self.compactIfSparse()
+
+    @timed("store")
+    def deleteMany(self, keys, track=True):
+        # Tombstone every given row in one pass, the views are told once
+        keys = list(keys)
+        if not keys:
+            return
+        positions = [self.index.pop(key) for key in keys]
+        for column in self.indexed:
+            values = self.columns[column]
+            for key, position in zip(keys, positions):
+                self.unindex(column, values[position], key)
+        for position in positions:
+            self.alive[position] = 0
+        self.dead += len(positions)
+        if track:
+            for key in keys:
+                self.tracker.recordDelete(key)
+        self.changed()
+        self.emit("rowsRemoved", positions)
+        if track:
+            for position in positions:
+                self.notify(self.row(position), None)
+        self.compactIfSparse()
+
+    @timed("store")
+    def merge(self, dataframe, removed=()):
+        # Apply rows changed in the database without recording changes, rows with unsaved changes keep theirs,
+        # those of a running save included
+        changed = self.tracker.unsavedUpserts()
+        fresh = []
+        for record in dataframe.to_dict("records"):
+            key = record[self.key]
+            if key in changed or self.tracker.isDeleted(key):
+                continue
+            version = record.pop('version', None)
+            if version is not None:
+                self.row_versions[key] = version
+            if key in self.index:
+                self.update(key, record, track=False)
+            else:
+                fresh.append(record)
+        self.extend(pd.DataFrame(fresh, columns=self.column_names))
+        for key in removed:
+            if key in self.index and key not in changed and not self.tracker.isDeleted(key):
+                self.delete(key, track=False)
+
+    def conflictFor(self, key):
+        # Conflict of a row from the last save, a renamed row conflicts under its database key
+        return self.conflicts.get(key) or self.conflicts.get(self.tracker.renamed.get(key))
+
+    def setConflicts(self, conflicts):
+        self.conflicts = {conflict.key: conflict for conflict in conflicts}
+        # A row deleted here that someone else changed comes back, deleting it again is then a deliberate choice
+        origins = set(self.tracker.renamed.values())
+        for conflict in conflicts:
+            if conflict.key in self.tracker.deleted and conflict.key not in origins:
+                self.takeTheirs(conflict.key)
+
+    def keepMine(self, key):
+        # The next save overwrites the row as it is in the database now
+        conflict = self.conflictFor(key)
+        del self.conflicts[conflict.key]
+        if conflict.row is None:
+            self.tracker.recordMissing(key)
+        else:
+            self.row_versions[conflict.key] = conflict.row['version']
+            self.tracker.recordExisting(key)
+
+    def takeTheirs(self, key):
+        # Drop the unsaved change and show the row as it is in the database
+        conflict = self.conflictFor(key)
+        del self.conflicts[conflict.key]
+        self.tracker.forget(key)
+        self.tracker.forget(conflict.key)
+        old = self.row(self.index[key]) if key in self.index else None
+        if old is not None:
+            self.delete(key, track=False)
+        if conflict.row is not None:
+            self.merge(pd.DataFrame([conflict.row]))
+        # The window changed like an edit would, so observers follow it
+        self.notify(old, self.row(self.index[conflict.key]) if conflict.key in self.index else None)
+
+    def row(self, position):
+        return {column: self.columns[column][position] for column in self.column_names}
+
+    def emit(self, signal, *args):
+        # Connected slots run inside the emit, so its span is the time they take
+        with diagnostics.span(f"signal: {self.table_name}.{signal}"):
+            getattr(self.communicate, signal).emit(*args)
+
+    def notify(self, old, new):
+        for observer in self.observers:
+            observer(old, new)
+
+    def beginSave(self):
+        self.saving += 1
+
+    def endSave(self):
+        # Emitted once the save's changes are settled, committed or tracked again
+        self.saving -= 1
+        self.emit("storeSaved")
+
+    def compactIfSparse(self):
+        if self.dead >= COMPACT_MIN_DEAD and self.dead >= COMPACT_DEAD_RATIO * len(self.alive):
+            self.compact()
+
+    @timed("store")
+    def compact(self):
+        # Drop tombstoned rows, live rows keep their order
+        live = self.livePositions().tolist()
+        self.columns = {column: values.take(live) for column, values in self.columns.items()}
+        if self.text_index is not None:
+            self.text_index.compacted(live)
+        self.alive = bytearray(b'\x01' * len(live))
+        self.listed = bytearray(np.frombuffer(self.listed, dtype=np.uint8)[live].tobytes())
+        self.index = dict(zip(self.columns[self.key], range(len(live))))
+        self.dead = 0
+        self.emit("storeCompacted")
+
+    def unindex(self, column, value, key):
+        keys = self.lookups[column].get(value)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.lookups[column][value]
+
+    def changed(self):
+        self.version += 1
+        self.snapshot_cache = None
+
+    def livePositions(self):
+        # Physical positions of the live rows in display order
+        return np.flatnonzero(np.frombuffer(self.alive, dtype=np.uint8))
+
+    def listedPositions(self):
+        # Physical positions of the live rows the views show, in display order
+        return np.flatnonzero(np.frombuffer(self.alive, dtype=bool) & np.frombuffer(self.listed, dtype=bool))
+
+    def keys(self):
+        return list(self.index)
+
+    def values(self, column):
+        # Values of one column for the live rows
+        values = self.columns[column]
+        if self.dead == 0:
+            return list(values)
+        return [values[position] for position in self.livePositions()]
+
+    def find(self, column, value):
+        # Keys of the live rows whose column equals value
+        if column in self.lookups:
+            return list(self.lookups[column].get(value, ()))
+        keys = self.columns[self.key]
+        found = self.columns[column].matches(value) & np.frombuffer(self.alive, dtype=bool)
+        return [keys[position] for position in np.flatnonzero(found)]
+
+    @timed("store")
+    def findText(self, query, limit, saved=()):
+        # Keys of the loaded live rows whose searchable text is most like query, best match first.
+        # A query that is a whole key comes first, then the keys saved rows were found under by search
+        keys = self.columns[self.key]
+        found = [keys[position] for position in self.text_index.find(query, limit)]
+        exact = query.strip()
+        first = ([exact] if exact in self.index else []) + [key for key in saved if key in self.index]
+        return list(dict.fromkeys(first + found))[:limit]
+
+    def frame(self, keys):
+        # Dataframe of the rows for the given keys, in the order given
+        positions = [self.index[key] for key in keys]
+        return pd.DataFrame({column: [self.columns[column][position] for position in positions]
+                             for column in self.column_names}, columns=self.column_names)
+
+    @timed("store")
+    def snapshot(self):
+        # Dataframe of the listed live rows, cached until the next mutation
+        if self.snapshot_cache is None:
+            live = self.listedPositions()
+            self.snapshot_cache = pd.DataFrame({column: values.array(live)
+                                                for column, values in self.columns.items()},
+                                               columns=self.column_names)
+        return self.snapshot_cache
+
+    def nbytes(self):
+        # Memory the column values take, tombstoned rows included
+        return sum(values.nbytes() for values in self.columns.values())
+
+    def versionedSnapshot(self):
+        # Live rows with the version each was read at, so rows restored from it still save safely
+        frame = self.snapshot()
+        return frame.assign(version=[self.row_versions.get(key) for key in frame[self.key]])
@@ -0,0 +1,166 @@
+"""Change tracking for the in-memory tables."""
+
+
+class ChangeTracker:
+    """Record inserted, updated and deleted keys since the last save"""
+
+    def __init__(self):
+        self.inserted = set()
+        self.updated = set()
+        self.deleted = set()
+        # Renamed key -> the key the row has in the database, for cascading renames
+        self.renamed = {}
+        # Changes handed to saves that are still running, they are not in the database yet either
+        self.pending = []
+        # Parent key -> {child key: values} of children the next save moves back to a parent brought back by undo
+        self.restored = {}
+        # Parent key -> the children its last committed delete moved off it, and parents brought back while
+        # their delete was still saving
+        self.moved = {}
+        self.restoring = set()
+
+    def recordInsert(self, key):
+        # A key deleted earlier in the session already exists in the database
+        if key in self.deleted:
+            self.deleted.discard(key)
+            self.updated.add(key)
+        else:
+            self.inserted.add(key)
+
+    def recordUpdate(self, key):
+        # Unsaved inserts are written in full anyway
+        if key not in self.inserted:
+            self.updated.add(key)
+
+    def recordDelete(self, key):
+        # Rows that were never saved only need to be forgotten
+        self.renamed.pop(key, None)
+        self.restored.pop(key, None)
+        self.restoring.discard(key)
+        if key in self.inserted:
+            self.inserted.discard(key)
+        else:
+            self.updated.discard(key)
+            self.deleted.add(key)
+
+    def recordRename(self, old_key, new_key):
+        # Changing the primary key is a delete of the old row plus an insert
+        if old_key == new_key:
+            self.recordUpdate(new_key)
+        else:
+            origin = self.renamed.pop(old_key, None)
+            if origin is None and old_key not in self.inserted:
+                origin = old_key
+            restored = self.restored.pop(old_key, None)
+            self.recordDelete(old_key)
+            self.recordInsert(new_key)
+            if restored is not None:
+                self.restored[new_key] = restored
+            if origin is not None and origin != new_key:
+                self.renamed[new_key] = origin
+
+    def forget(self, key):
+        # Drop every change recorded for a key, its database row is taken as it is
+        self.inserted.discard(key)
+        self.updated.discard(key)
+        self.deleted.discard(key)
+        self.renamed.pop(key, None)
+        self.restored.pop(key, None)
+
+    def recordMissing(self, key):
+        # The database lost the row behind an update or rename, the key is saved as a new row
+        origin = self.renamed.pop(key, None)
+        if origin is not None:
+            self.deleted.discard(origin)
+        self.updated.discard(key)
+        self.inserted.add(key)
+
+    def recordExisting(self, key):
+        # The database gained a row under an inserted key, the key is saved as an update of it
+        if key in self.inserted:
+            self.inserted.discard(key)
+            self.updated.add(key)
+
+    def recordUndelete(self, key):
+        # A deleted parent came back by undo. If its delete was saved, the children the save moved off it go
+        # back with the next save, a delete that is still saving hands them over once it commits
+        if key not in self.inserted:
+            return
+        if key in self.moved:
+            self.restored[key] = self.moved.pop(key)
+        elif any(key in pending.deleted for pending in self.pending):
+            self.restoring.add(key)
+
+    def upserts(self):
+        # Keys whose rows a save writes, inserted ones as new rows and the rest as versioned updates
+        return self.inserted | self.updated
+
+    def unsavedUpserts(self):
+        # Upserts not committed yet, those of the running saves included
+        keys = self.upserts()
+        for pending in self.pending:
+            keys = keys | pending.upserts()
+        return keys
+
+    def isDeleted(self, key):
+        # Whether a delete of the key is not committed yet, one in a running save included
+        return key in self.deleted or any(key in pending.deleted for pending in self.pending)
+
+    def hasChanges(self):
+        return bool(self.inserted or self.updated or self.deleted)
+
+    def detach(self):
+        # Hand the current changes to a save and start recording afresh
+        pending = ChangeTracker()
+        pending.inserted, pending.updated, pending.deleted = self.inserted, self.updated, self.deleted
+        pending.renamed, pending.restored = self.renamed, self.restored
+        self.inserted, self.updated, self.deleted = set(), set(), set()
+        self.renamed, self.restored = {}, {}
+        self.pending.append(pending)
+        return pending
+
+    def settle(self, pending, moved=None, left_out=()):
+        # The save of these changes committed, moved has the children its deletes moved off each parent.
+        # Changes of the keys it left out are tracked again
+        self.pending.remove(pending)
+        for key, children in (moved or {}).items():
+            if key in self.restoring:
+                self.restoring.discard(key)
+                self.restored[key] = children
+            else:
+                self.moved[key] = children
+        if left_out:
+            rest = pending.only(left_out)
+            self.pending.append(rest)
+            self.restore(rest)
+
+    def only(self, keys):
+        # The changes of the given keys
+        part = ChangeTracker()
+        part.inserted, part.updated, part.deleted = self.inserted & keys, self.updated & keys, self.deleted & keys
+        part.renamed = {key: origin for key, origin in self.renamed.items() if key in keys}
+        part.restored = {key: children for key, children in self.restored.items() if key in keys}
+        return part
+
+    def restore(self, pending):
+        # Put back changes from a save that did not commit, underneath the newer ones
+        self.pending.remove(pending)
+        self.restoring -= pending.deleted
+        newer_inserted, newer_updated, newer_deleted = self.inserted, self.updated, self.deleted
+        self.inserted, self.updated, self.deleted = set(pending.inserted), set(pending.updated), set(pending.deleted)
+        # Newer renames continue from where the pending ones left the key
+        renamed = dict(pending.renamed)
+        for new_key, old_key in self.renamed.items():
+            origin = renamed.pop(old_key, old_key)
+            if origin != new_key:
+                renamed[new_key] = origin
+        self.renamed = renamed
+        restored = dict(pending.restored)
+        restored.update(self.restored)
+        self.restored = restored
+        for key in newer_deleted:
+            self.recordDelete(key)
+        for key in newer_inserted:
+            self.recordInsert(key)
+        for key in newer_updated:
+            self.recordUpdate(key)
@@ -0,0 +1,156 @@
+"""Bulk import and export of the student and course tables."""
+import os
+import time
+
+import pandas as pd
+
+from constraints import frameChecks
+from repository import STUDENT_COLUMNS, COURSE_COLUMNS, STUDENT_DTYPES, YEARS, SEXES
+from workers import TaskCancelled
+
+# Number of file rows validated and inserted per batch
+IMPORT_CHUNK_SIZE = 5000
+
+
+class TransferReport:
+    """Row counts, throughput and rejected rows of one import or export"""
+
+    def __init__(self, table_name, path):
+        self.table_name = table_name
+        self.path = path
+        self.accepted = 0
+        self.rejected = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    def rowsPerSecond(self):
+        return self.accepted / self.elapsed if self.elapsed else 0.0
+
+    def reject(self, chunk, reasons):
+        # Keep the rejected rows with their file line number and the reason
+        rejected = chunk.assign(line=chunk.index + 2, reason=reasons)
+        self.rejected.extend(rejected.to_dict("records"))
+
+    def writeRejected(self):
+        # Rejected rows go next to the imported file so they can be fixed and re-imported
+        if not self.rejected:
+            return None
+        path = os.path.splitext(self.path)[0] + ".rejected.csv"
+        pd.DataFrame(self.rejected).to_csv(path, index=False)
+        return path
+
+    def summary(self):
+        return (f"{self.table_name}: {self.accepted} rows in {self.elapsed:.1f} s "
+                f"({self.rowsPerSecond():.0f} rows/s), {len(self.rejected)} rejected")
+
+
+def readChunks(path, columns, chunk_size=IMPORT_CHUNK_SIZE):
+    # CSV files are streamed, Excel files cannot be read in chunks so they are sliced after loading
+    if os.path.splitext(path)[1].lower() in (".xlsx", ".xls"):
+        chunks = [pd.read_excel(path, dtype=str).fillna("")]
+    else:
+        chunks = pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_size)
+    for frame in chunks:
+        missing = [column for column in columns if column not in frame.columns]
+        if missing:
+            raise ValueError(f"Missing columns: {', '.join(missing)}")
+        for start in range(0, len(frame), chunk_size):
+            yield frame.iloc[start:start + chunk_size]
+
+
+def firstReason(checks, index):
+    # Reason of the first failed check for every row, empty if the row passed
+    reasons = pd.Series("", index=index)
+    for failed, reason in reversed(checks):
+        reasons[failed] = reason
+    return reasons
+
+
+def validateStudents(chunk, existing_ids, course_codes):
+    # Vectorized checks, returns the accepted rows and the reason for every rejected one
+    chunk = chunk.apply(lambda column: column.str.strip())
+    # Status follows the course like it does in the add window
+    chunk = chunk.assign(status=chunk["course"].ne("No Course").map({True: "Yes", False: "No"}))
+    reasons = firstReason(frameChecks("students", "id_number", chunk, existing_ids, course_codes) + [
+        (~chunk["year"].isin([str(year) for year in YEARS]), "invalid year"),
+        (~chunk["sex"].isin(SEXES), "invalid sex"),
+    ], chunk.index)
+    return chunk.loc[reasons.eq(""), STUDENT_COLUMNS].astype(STUDENT_DTYPES), reasons
+
+
+def validateCourses(chunk, existing_codes, course_codes=None):
+    chunk = chunk.apply(lambda column: column.str.strip())
+    reasons = firstReason(frameChecks("courses", "course_code", chunk, existing_codes), chunk.index)
+    return chunk.loc[reasons.eq(""), COURSE_COLUMNS], reasons
+
+
+def importTable(repository, table_name, key, columns, validate, path, existing_keys, course_codes, report,
+                progress=None, cancelled=None):
+    # Stream the file, validate each chunk and insert the accepted rows, yields them for the in-memory table
+    existing_keys = set(existing_keys)
+    done = 0
+    for chunk in readChunks(path, [column for column in columns if column != "status"]):
+        if cancelled and cancelled():
+            raise TaskCancelled()
+        accepted, reasons = validate(chunk, existing_keys, course_codes)
+        # Only a page of the table may be loaded, so keys are also checked against the database
+        stored = repository.fetchRows(table_name, key, [key], {}, accepted[key])[key]
+        if len(stored):
+            duplicate = accepted[key].isin(stored)
+            reasons[accepted.index[duplicate]] = f"{key} already exists"
+            accepted = accepted[~duplicate]
+        failed = reasons.ne("")
+        if failed.any():
+            report.reject(chunk[failed], reasons[failed])
+        if len(accepted):
+            repository.insertRows(table_name, accepted)
+            existing_keys.update(accepted[key])
+            report.accepted += len(accepted)
+            # Inserted rows start at the schema's first version
+            yield accepted.assign(version=1)
+        done += len(chunk)
+        if progress:
+            progress(done, 0)
+
+
+def importStudents(repository, path, existing_ids, course_codes, report, progress=None, cancelled=None):
+    return importTable(repository, "students", "id_number", STUDENT_COLUMNS, validateStudents, path,
+                       existing_ids, course_codes, report, progress, cancelled)
+
+
+def importCourses(repository, path, existing_codes, report, progress=None, cancelled=None):
+    return importTable(repository, "courses", "course_code", COURSE_COLUMNS, validateCourses, path,
+                       existing_codes, None, report, progress, cancelled)
+
+
+def exportTable(repository, table_name, columns, dtypes, path, report, progress=None, cancelled=None):
+    # Stream the saved table from the database to CSV or Parquet one chunk at a time
+    parquet = os.path.splitext(path)[1].lower() == ".parquet"
+    writer = None
+    try:
+        for chunk in repository.streamTable(table_name, columns, dtypes):
+            if cancelled and cancelled():
+                raise TaskCancelled()
+            if parquet:
+                # pyarrow is only needed for Parquet exports
+                import pyarrow
+                import pyarrow.parquet
+                table = pyarrow.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pyarrow.parquet.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+            else:
+                chunk.to_csv(path, mode="a" if report.accepted else "w", header=not report.accepted, index=False)
+            report.accepted += len(chunk)
+            if progress:
+                progress(report.accepted, 0)
+        if not report.accepted and not parquet:
+            pd.DataFrame(columns=columns).to_csv(path, index=False)
+    finally:
+        if writer is not None:
+            writer.close()
+    return report.finish()
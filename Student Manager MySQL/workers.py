@@ -0,0 +1,61 @@
+"""Background execution of database work so the event loop never blocks."""
+import threading
+import time
+import types
+
+from PyQt5.QtCore import QRunnable, QThreadPool
+
+from diagnostics import diagnostics
+
+
+class TaskCancelled(Exception):
+    """Raised by task functions that stop early because of a cancel request"""
+
+
+class DatabaseTask(QRunnable):
+    """Run a function on the thread pool and report back through Communicate signals"""
+
+    def __init__(self, function, communicate, *args):
+        super(DatabaseTask, self).__init__()
+        self.function = function
+        self.communicate = communicate
+        self.args = args
+        self.cancel_requested = threading.Event()
+        # Python keeps the task alive through the window that started it
+        self.setAutoDelete(False)
+
+    def run(self):
+        # Signals emitted here are queued to the thread that owns communicate
+        start = time.perf_counter()
+        try:
+            result = self.function(*self.args, progress=self.reportProgress, cancelled=self.isCancelled)
+            if isinstance(result, types.GeneratorType):
+                # Generators stream their items through taskPartial as they are produced
+                for item in result:
+                    if self.isCancelled():
+                        result.close()
+                        raise TaskCancelled()
+                    self.communicate.taskPartial.emit(item)
+                result = None
+        except TaskCancelled:
+            self.communicate.taskCancelled.emit()
+        except Exception as e:
+            self.communicate.taskFailed.emit(str(e))
+        else:
+            self.communicate.taskFinished.emit(result)
+        finally:
+            diagnostics.record(f"task: {getattr(self.function, '__name__', 'task')}", time.perf_counter() - start)
+
+    def reportProgress(self, done, total):
+        self.communicate.taskProgress.emit(done, total)
+
+    def isCancelled(self):
+        return self.cancel_requested.is_set()
+
+    def cancel(self):
+        # The function checks isCancelled between batches and stops at the next one
+        self.cancel_requested.set()
+
+    def start(self):
+        QThreadPool.globalInstance().start(self)
+        return self